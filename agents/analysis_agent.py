@@ -1,11 +1,12 @@
 # agents/analysis_agent.py
 from typing import TypedDict, List, Dict, Any, Optional
-from langchain_openai import ChatOpenAI
 from langchain_core.messages import SystemMessage, HumanMessage
 from langchain_core.prompts import ChatPromptTemplate
 from pydantic import BaseModel, Field
 from tools.web_search import search_and_save_tool, query_knowledge_base_tool
 from tools.vector_db import vector_db
+from tools.attention import aggregate_attention
+from agents import llm_registry
 import json
 
 class InterviewAnalysisInput(TypedDict):
@@ -35,7 +36,7 @@ class AnalysisResult(BaseModel):
 class InterviewAnalysisAgent:
     def __init__(self):
         try:
-            self.llm = ChatOpenAI(
+            self.llm = llm_registry.chat_model(
                 model="gpt-4o",
                 temperature=0.1,
                 max_tokens=4000
@@ -271,9 +272,11 @@ class InterviewAnalysisAgent:
                 "audio_segments": len(input_data["audio_summaries"]),
                 "video_segments": len(input_data["video_summaries"]),
                 "note": "使用动态评分系统（基础模式）",
+                "visual_metrics": self._collect_visual_metrics(input_data),
                 "scoring_breakdown": {
                     "qa_score": self._evaluate_qa_quality(input_data.get("qa_pairs", []), input_data.get("resume", "")),
-                    "comm_score": self._evaluate_communication(input_data.get("audio_summaries", []), input_data.get("video_summaries", [])),
+                    "comm_score": self._evaluate_communication(input_data.get("audio_summaries", []), input_data.get("video_summaries", []),
+                                                                self._collect_visual_metrics(input_data)),
                     "depth_score": self._evaluate_content_depth(input_data.get("qa_pairs", []), ""),
                     "overall_score": self._evaluate_overall_performance(input_data, "")
                 }
@@ -348,7 +351,8 @@ class InterviewAnalysisAgent:
         qa_score = self._evaluate_qa_quality(qa_pairs, resume)
         
         # 2. 沟通表现评分 (0-25分)
-        comm_score = self._evaluate_communication(audio_summaries, video_summaries)
+        comm_score = self._evaluate_communication(audio_summaries, video_summaries,
+                                                  self._collect_visual_metrics(input_data))
         
         # 3. 内容深度评分 (0-20分)
         depth_score = self._evaluate_content_depth(qa_pairs, content)
@@ -402,8 +406,33 @@ class InterviewAnalysisAgent:
         
         return min(30, score)
     
-    def _evaluate_communication(self, audio_summaries: list, video_summaries: list) -> float:
-        """评估沟通表现 (0-25分)"""
+    def _collect_visual_metrics(self, input_data: dict) -> dict:
+        """汇总各轮 structured_results 中的本地视觉指标"""
+        results = input_data.get("structured_results") or []
+        return aggregate_attention([r.get("visual_metrics") for r in results if isinstance(r, dict)])
+
+    def _score_visual_metrics(self, metrics: dict) -> float:
+        """
+        根据人脸在镜比例、视线偏离比例和头部移动评分 (0-10分)。
+        视线与头部稳定只在有脸帧上有意义，按在镜比例折算，空镜头不得分。
+        """
+        present = metrics["face_present_ratio"]
+        gaze_away = metrics.get("gaze_away_ratio")
+        score = present * 4
+        if gaze_away is not None:
+            score += (1 - gaze_away) * 4 * present
+        movement = metrics["head_movement"]
+        if movement <= 0.5:
+            score += 2 * present
+        elif movement <= 1.0:
+            score += 1 * present
+        if present < 0.5:
+            score -= 2
+        return score
+
+    def _evaluate_communication(self, audio_summaries: list, video_summaries: list,
+                                visual_metrics: dict = None) -> float:
+        """评估沟通表现 (0-25分)；有本地视觉指标时视频部分按数值评分"""
         score = 0
         
         # 音频分析评分
@@ -416,6 +445,8 @@ class InterviewAnalysisAgent:
                 score -= 2
         
         # 视频分析评分
+        if visual_metrics and visual_metrics.get("frames_sampled"):
+            return max(0, min(25, score + self._score_visual_metrics(visual_metrics)))
         for video in video_summaries:
             if "自然" in video or "得当" in video:
                 score += 3
@@ -513,7 +544,8 @@ class InterviewAnalysisAgent:
         recommendations = []
         avg_score = (
             self._evaluate_qa_quality(qa_pairs, input_data.get("resume", "")) +
-            self._evaluate_communication(input_data.get("audio_summaries", []), input_data.get("video_summaries", []))
+            self._evaluate_communication(input_data.get("audio_summaries", []), input_data.get("video_summaries", []),
+                                         self._collect_visual_metrics(input_data))
         ) / 2
         
         if avg_score > 20:
@@ -539,5 +571,14 @@ class InterviewAnalysisAgent:
             "key_insights": key_insights if key_insights else ["完成了基础面试流程"]
         }
 
-# 全局分析agent实例
-analysis_agent = InterviewAnalysisAgent()
\ No newline at end of file
+# 全局分析agent实例：由模型注册表懒加载，首次使用时才创建客户端
+llm_registry.register("analysis_agent", InterviewAnalysisAgent)
+
+def get_analysis_agent() -> InterviewAnalysisAgent:
+    return llm_registry.get("analysis_agent")
+
+def __getattr__(name):
+    # 兼容 from agents.analysis_agent import analysis_agent
+    if name == "analysis_agent":
+        return get_analysis_agent()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
\ No newline at end of file
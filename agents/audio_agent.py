@@ -1,6 +1,7 @@
 import dashscope
 from typing import Dict, Any
 from langgraph.graph import StateGraph, START, END
+from agents import llm_registry
 from dotenv import load_dotenv
 import os
 import re
@@ -20,18 +21,28 @@ def extract_json(text: str) -> str:
     # fallback：尝试从第一个 { 位置截断
     return text[text.find("{"):]
 
+FULL_PROMPT = (
+    "你是面试语音分析专家，需要完成两个任务并以结构化 JSON 格式输出：\n"
+    "1. transcript: 将音频完整转写为文字，保留自然语言风格。\n"
+    "2. audio_analysis: 对音频用中文进行分析，包括以下等维度：\n"
+    "   - 描述语速，语调，语气，情绪状态，表达风格等特征"
+)
+
+# 语速、停顿、音量、音高已由本地韵律特征给出，只需模型转写和判断情绪
+TRANSCRIPT_PROMPT = (
+    "将面试音频完整转写为文字，并用一句中文概括情绪状态，以 JSON 输出：\n"
+    '{"transcript": "...", "audio_analysis": {"情绪状态": "..."}}'
+)
+
 class AudioAnalysisAgent:
-    def __init__(self, model: str = "qwen-audio-turbo"):
+    def __init__(self, model: str = "qwen-audio-turbo", mode: str = "full"):
+        """mode: "full" 完整转写+表达分析；"transcript" 仅转写和情绪，表达指标交给本地韵律特征"""
         self.model = model
+        self.prompt = TRANSCRIPT_PROMPT if mode == "transcript" else FULL_PROMPT
 
     def __call__(self, state: Dict[str, Any]) -> Dict[str, Any]:
         audio_path = state["audio_path"]
-        prompt = (
-            "你是面试语音分析专家，需要完成两个任务并以结构化 JSON 格式输出：\n"
-            "1. transcript: 将音频完整转写为文字，保留自然语言风格。\n"
-            "2. audio_analysis: 对音频用中文进行分析，包括以下等维度：\n"
-            "   - 描述语速，语调，语气，情绪状态，表达风格等特征"
-        )
+        prompt = self.prompt
 
         messages = [
             {
@@ -82,14 +93,22 @@ class AudioState(Dict[str, Any]):
     transcript: str
     audio_analysis: Dict[str, str]
 
-def build_audio_graph():
+def build_audio_graph(mode: str = "full"):
     builder = StateGraph(AudioState)
 
     # 加入节点
-    builder.add_node("AudioAnalysis", AudioAnalysisAgent())
+    builder.add_node("AudioAnalysis", AudioAnalysisAgent(mode=mode))
 
     # 图的流程
     builder.add_edge(START, "AudioAnalysis")
     builder.add_edge("AudioAnalysis", END)
 
-    return builder.compile()
\ No newline at end of file
+    return builder.compile()
+
+
+def get_audio_graph(mode: str = "full"):
+    """按 mode 缓存编译好的音频分析图，各轮录制与并发会话共用"""
+    return llm_registry.get(f"audio_graph:{mode}", lambda: build_audio_graph(mode=mode))
+
+# 默认配置登记到注册表，warm_up() 时一并构建
+llm_registry.register("audio_graph:full", lambda: build_audio_graph(mode="full"))
@@ -0,0 +1,104 @@
+# agents/llm_registry.py
+"""
+进程级的模型客户端与链缓存：按名字懒加载、线程安全，整个进程（包括并发的多场面试）共用同一份实例。
+OpenAI 客户端共用一个 httpx 连接池，轮与轮之间复用 TCP/TLS 连接；
+DashScope SDK 自带进程级连接池，这里只缓存编译好的音频/视频分析图。
+"""
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable
+
+import httpx
+
+_lock = threading.RLock()
+_factories: Dict[str, Callable[[], Any]] = {}
+_instances: Dict[str, Any] = {}
+_http_client = None
+
+
+def shared_http_client() -> httpx.Client:
+    """所有 ChatOpenAI 实例共用的 HTTP 客户端"""
+    global _http_client
+    with _lock:
+        if _http_client is None:
+            _http_client = httpx.Client(
+                limits=httpx.Limits(max_connections=32, max_keepalive_connections=16, keepalive_expiry=120),
+                timeout=httpx.Timeout(60.0, connect=10.0),
+            )
+        return _http_client
+
+
+def register(name: str, factory: Callable[[], Any]):
+    """登记一个懒加载的实例；首次 get(name) 时才调用 factory"""
+    with _lock:
+        _factories[name] = factory
+
+
+def get(name: str, factory: Callable[[], Any] = None) -> Any:
+    """取出缓存的实例，不存在时用 factory（或登记过的 factory）构建一次"""
+    instance = _instances.get(name)
+    if instance is not None:
+        return instance
+    with _lock:
+        if name not in _instances:
+            build = factory or _factories.get(name)
+            if build is None:
+                raise KeyError(f"未登记的模型实例: {name}")
+            _factories.setdefault(name, build)
+            _instances[name] = build()
+        return _instances[name]
+
+
+def chat_model(model: str = "gpt-4o", **kwargs):
+    """相同参数的 ChatOpenAI 只创建一次，并挂在共享连接池上"""
+    from langchain_openai import ChatOpenAI
+
+    key = "chat:" + model + ":" + ",".join(f"{k}={v}" for k, v in sorted(kwargs.items()))
+    return get(key, lambda: ChatOpenAI(model=model, http_client=shared_http_client(), **kwargs))
+
+
+def warm_up(names: Iterable[str] = None, connect: bool = False) -> Dict[str, float]:
+    """
+    在第一位候选人接入前构建登记的实例，返回各自耗时（秒）。
+    connect=True 时再向每个 OpenAI 端点发一次轻量请求，提前建立连接池中的 TLS 连接。
+    """
+    with _lock:
+        names = list(names) if names is not None else list(_factories)
+    timings = {}
+    for name in names:
+        t0 = time.monotonic()
+        try:
+            get(name)
+        except Exception as e:
+            print(f"[预热] {name} 构建失败: {e}")
+            continue
+        timings[name] = round(time.monotonic() - t0, 3)
+
+    if connect:
+        with _lock:
+            chats = [v for k, v in _instances.items() if k.startswith("chat:")]
+        seen = set()
+        for llm in chats:
+            base_url = str(llm.root_client.base_url)
+            if base_url in seen:
+                continue
+            seen.add(base_url)
+            t0 = time.monotonic()
+            try:
+                llm.root_client.models.list()
+            except Exception as e:
+                print(f"[预热] 连接 {base_url} 失败: {e}")
+                continue
+            timings[f"connect:{base_url}"] = round(time.monotonic() - t0, 3)
+    print(f"[预热] 完成: {timings}")
+    return timings
+
+
+def reset():
+    """丢弃所有缓存实例并关闭共享连接池（测试或切换 API Key 后使用）"""
+    global _http_client
+    with _lock:
+        _instances.clear()
+        if _http_client is not None:
+            _http_client.close()
+            _http_client = None
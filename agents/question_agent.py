@@ -1,29 +1,188 @@
+import threading
+from difflib import SequenceMatcher
 from typing import TypedDict, List, Annotated, Optional
 from langchain_core.messages import AnyMessage, AIMessage, HumanMessage
 from langgraph.graph.message import add_messages
 from langchain_core.prompts import ChatPromptTemplate
-from langchain_openai import ChatOpenAI
+from agents import llm_registry
 from pydantic import BaseModel, Field
 
 class InterviewDecision(BaseModel):
     next_question: Optional[str] = Field(None, description="下一个面试问题")
     should_round: bool = Field(False, description="是否继续问答")
 
-def create_question_agent():
-    """创建问题生成agent"""
-    prompt = ChatPromptTemplate.from_messages([
-        ("system", """你是一名资深中文面试官。
+SYSTEM_PROMPT = """你是一名资深中文面试官。
 
-基于候选人简历和对话历史：
+基于候选人简历、此前轮次摘要和最近几轮对话：
 1. 如果上一轮回答有可深挖之处，基于该回答追问1个问题
 2. 否则，从简历中选一处尚未被问到的要点，提出1个全新问题  
 3. 若已没有可问的问题，设置should_round为False表示结束
 
-候选人简历：{resume}"""),
+候选人简历：{resume}
+
+此前轮次摘要：{history_summary}"""
+
+# 提问上下文的默认规模：保留最近几轮完整问答，总量控制在 token 预算内
+CONTEXT_LAST_K = 3
+CONTEXT_TOKEN_BUDGET = 1500
+
+def create_question_agent():
+    """创建问题生成agent；输入为 build_question_context 的结果"""
+    prompt = ChatPromptTemplate.from_messages([
+        ("system", SYSTEM_PROMPT),
         ("placeholder", "{messages}")
     ])
     
-    llm = ChatOpenAI(model='gpt-4o')
+    llm = llm_registry.chat_model('gpt-4o')
     structured_llm = llm.with_structured_output(InterviewDecision)
     return prompt | structured_llm
 
+
+llm_registry.register("question_agent", create_question_agent)
+
+def get_question_agent():
+    """进程内共用的提问链，首次使用时构建，各轮与并发面试复用同一客户端"""
+    return llm_registry.get("question_agent")
+
+
+_encoding = None
+
+def count_tokens(text: str) -> int:
+    """tiktoken 可用时精确计数；否则按中文每字约 1 token、其他字符约 4 个 1 token 估算"""
+    global _encoding
+    if _encoding is None:
+        try:
+            import tiktoken
+            _encoding = tiktoken.get_encoding("o200k_base")
+        except Exception:
+            _encoding = False  # 未安装或无法下载词表，之后不再重试
+    if _encoding:
+        return len(_encoding.encode(text))
+    cjk = sum(1 for ch in text if "\u4e00" <= ch <= "\u9fff")
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+def _compress_round(i: int, question: str, answer: str, q_chars: int = 40, a_chars: int = 80) -> str:
+    """
+    较早轮次只保留问题和回答开头，压成一行。
+    有意用截断代替模型摘要：每轮多一次模型调用正是提问延迟要省掉的；完整问答仍在 qa_pairs 中供面试分析使用。
+    """
+    def clip(text, n):
+        text = " ".join(str(text).split())
+        return text if len(text) <= n else text[:n] + "…"
+    return f"第{i}轮 问：{clip(question, q_chars)} 答：{clip(answer, a_chars)}"
+
+
+def context_tokens(context: dict) -> int:
+    """提问上下文（含系统提示）的 prompt token 数"""
+    text = SYSTEM_PROMPT.format(resume=context["resume"], history_summary=context["history_summary"])
+    return count_tokens(text) + sum(count_tokens(m.content) for m in context["messages"])
+
+
+def build_question_context(state: dict, last_k: int = CONTEXT_LAST_K, token_budget: int = CONTEXT_TOKEN_BUDGET) -> dict:
+    """
+    从面试状态构造提问模型的输入：简历、较早轮次的压缩摘要、最近 last_k 轮完整问答。
+    不再传入 state["messages"]，其中的工具调用消息和工具结果只会让 prompt 逐轮变长。
+    超出 token_budget 时依次：把最近轮次逐条并入摘要（至少保留一轮）→ 丢弃最早的摘要行 → 截断简历。
+    """
+    pairs = list(state.get("qa_pairs", []))
+    split = max(0, len(pairs) - last_k)
+    summary = [_compress_round(i, q, a) for i, (q, a) in enumerate(pairs[:split], 1)]
+    recent = pairs[split:]
+    resume = state.get("resume", "")
+
+    def build():
+        messages = []
+        for question, answer in recent:
+            messages += [AIMessage(content=question), HumanMessage(content=answer or "（未识别到回答）")]
+        return {"resume": resume, "history_summary": "\n".join(summary) or "无", "messages": messages}
+
+    context = build()
+    while context_tokens(context) > token_budget and len(recent) > 1:
+        summary.append(_compress_round(split + 1, *recent.pop(0)))
+        split += 1
+        context = build()
+    while context_tokens(context) > token_budget and summary:
+        summary.pop(0)
+        context = build()
+    overflow = context_tokens(context) - token_budget
+    if overflow > 0 and resume:
+        # 按 token 与字符的平均比例估算需要截掉的简历长度
+        ratio = max(1, count_tokens(resume)) / max(1, len(resume))
+        resume = resume[:max(0, len(resume) - int(overflow / ratio) - 1)] + "…"
+        context = build()
+    return context
+
+
+class SpeculativeQuestioner:
+    """
+    候选人作答期间，按实时转写在后台预生成下一题，省去作答结束后等待一次完整模型调用。
+    - transcript_fn: 返回当前已转写文本的函数，每 interval_s 秒检查一次，新增不足 min_new_chars 个字不重新生成
+    - 历史部分与正式提问一样由 build_question_context 按 last_k / token_budget 构造
+    - finish(final_answer)：最终回答与最近一次预生成所用转写的相似度不低于 similarity 时采用预生成结果，
+      否则返回 None，由调用方按完整状态重新生成
+    """
+
+    def __init__(self, state: dict, question: str, transcript_fn, interval_s: float = 2.0,
+                 min_new_chars: int = 20, similarity: float = 0.85, agent=None,
+                 last_k: int = CONTEXT_LAST_K, token_budget: int = CONTEXT_TOKEN_BUDGET):
+        self.agent = agent or get_question_agent()
+        self.context = build_question_context(state, last_k, token_budget)
+        self.question = question
+        self.transcript_fn = transcript_fn
+        self.interval_s = interval_s
+        self.min_new_chars = min_new_chars
+        self.similarity = similarity
+        self.calls = 0
+        self._draft = None  # (生成时的转写, InterviewDecision)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self) -> "SpeculativeQuestioner":
+        self._thread.start()
+        return self
+
+    def _inputs(self, answer: str) -> dict:
+        return {
+            **self.context,
+            "messages": self.context["messages"] + [AIMessage(content=self.question), HumanMessage(content=answer)],
+        }
+
+    def _run(self):
+        last = ""
+        while not self._stop.wait(self.interval_s):
+            try:
+                partial = self.transcript_fn()
+            except Exception as e:
+                print(f"[预生成] 读取实时转写失败: {e}")
+                continue
+            if len(partial) - len(last) < self.min_new_chars:
+                continue
+            last = partial
+            try:
+                decision = self.agent.invoke(self._inputs(partial))
+            except Exception as e:
+                print(f"[预生成] 生成失败: {e}")
+                continue
+            if self._stop.is_set():
+                break
+            with self._lock:
+                self._draft = (partial, decision)
+                self.calls += 1
+
+    def cancel(self):
+        self._stop.set()
+
+    def finish(self, final_answer: str) -> tuple[Optional[InterviewDecision], dict]:
+        """结束预生成；返回可直接采用的决策（没有则为 None）及命中情况"""
+        self._stop.set()
+        with self._lock:
+            draft, calls = self._draft, self.calls
+        info = {"speculative_calls": calls, "similarity": None}
+        if draft is None:
+            return None, info
+        info["similarity"] = round(SequenceMatcher(None, draft[0], final_answer).ratio(), 3)
+        if info["similarity"] >= self.similarity:
+            return draft[1], info
+        return None, info
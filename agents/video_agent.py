@@ -3,15 +3,28 @@ from typing import Dict, Any
 from pathlib import Path
 from dotenv import load_dotenv
 from langgraph.graph import StateGraph, START, END
+from agents import llm_registry
 import os
+import sys
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from tools.keyframes import extract_keyframes
 
 # 加载 API Key
 load_dotenv()
 dashscope.api_key = os.getenv("DASHSCOPE_API_KEY")
 
 class VideoAnalysisAgent:
-    def __init__(self, model: str = "qwen-vl-plus"):
+    def __init__(self, model: str = "qwen-vl-plus", input_mode: str = "video",
+                 keyframe_strategy: str = "uniform", num_keyframes: int = 3):
+        """
+        input_mode: "video" 上传完整片段；"keyframes" 只上传若干张压缩关键帧（一次多图请求）
+        keyframe_strategy: 关键帧采样方式 "uniform" / "motion" / "face"
+        """
         self.model = model
+        self.input_mode = input_mode
+        self.keyframe_strategy = keyframe_strategy
+        self.num_keyframes = num_keyframes
 
     def __call__(self, state: Dict[str, Any]) -> Dict[str, Any]:
         video_path = state["video_path"]
@@ -26,14 +39,23 @@ class VideoAnalysisAgent:
         if not path.exists():
             return {"error": f"找不到视频文件: {path}"}
 
-        # DashScope 支持 video 分析的模型必须支持 video 文件
+        if self.input_mode == "keyframes":
+            # 关键帧模式：同一片段按时间顺序的几张 JPEG 放进一次多模态请求
+            images = extract_keyframes(str(path), count=self.num_keyframes, strategy=self.keyframe_strategy)
+            if not images:
+                return {**state, "error": f"未能从视频中提取关键帧: {path}"}
+            content = [{"image": p} for p in images]
+            content.append({"text": "以下图片是同一段面试视频按时间顺序截取的关键帧。" + prompt})
+            upload_bytes = sum(Path(p).stat().st_size for p in images)
+        else:
+            # DashScope 支持 video 分析的模型必须支持 video 文件
+            content = [{"video": str(path)}, {"text": prompt}]
+            upload_bytes = path.stat().st_size
+
         messages = [
             {
                 "role": "user",
-                "content": [
-                    {"video": str(path)},
-                    {"text": prompt}
-                ]
+                "content": content
             }
         ]
 
@@ -55,18 +77,33 @@ class VideoAnalysisAgent:
 
         return {
             **state,
-            "video_analysis": "\n".join(description)
+            "video_analysis": "\n".join(description),
+            "upload_bytes": upload_bytes
         }
     
 class VideoState(dict):
     video_path: str
     video_analysis: str
+    upload_bytes: int
 
-def build_video_graph():
+def build_video_graph(input_mode: str = "video", keyframe_strategy: str = "uniform", num_keyframes: int = 3):
     builder = StateGraph(VideoState)
 
-    builder.add_node("VideoAnalysis", VideoAnalysisAgent())
+    builder.add_node("VideoAnalysis", VideoAnalysisAgent(
+        input_mode=input_mode, keyframe_strategy=keyframe_strategy, num_keyframes=num_keyframes
+    ))
     builder.add_edge(START, "VideoAnalysis")
     builder.add_edge("VideoAnalysis", END)
 
     return builder.compile()
+
+
+def get_video_graph(input_mode: str = "video", keyframe_strategy: str = "uniform", num_keyframes: int = 3):
+    """按参数缓存编译好的视频分析图，各轮录制与并发会话共用"""
+    return llm_registry.get(
+        f"video_graph:{input_mode}:{keyframe_strategy}:{num_keyframes}",
+        lambda: build_video_graph(input_mode, keyframe_strategy, num_keyframes),
+    )
+
+# VideoController 的默认配置登记到注册表，warm_up() 时一并构建
+llm_registry.register("video_graph:keyframes:uniform:3", lambda: build_video_graph("keyframes", "uniform", 3))
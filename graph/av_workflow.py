@@ -13,9 +13,15 @@ sys.path.append(str(Path(__file__).resolve().parent.parent))
 from langgraph.graph import StateGraph, START, END
 from langchain_core.tools import tool  # ✅ 使用 @tool 装饰器
 from langchain_core.messages import AnyMessage
+from langchain_core.runnables import RunnableConfig
 
 # 假设这些函数已实现
-from tools.analysis import start_av_recording, stop_av_recording
+from tools.analysis import start_av_recording, stop_av_recording, get_stop_channel, DEFAULT_SESSION
+
+try:
+    import keyboard  # 可选依赖；Linux 下需要 root 权限
+except Exception:
+    keyboard = None
 
 class AVState(TypedDict, total=False):
     """子图的运行状态"""
@@ -23,46 +29,55 @@ class AVState(TypedDict, total=False):
     recording_started: bool
     external_stop_signal: bool
     max_duration: int
+    silence_stop_s: float
+    stop_reason: str
+    session_id: str
 
 def start_record(state: AVState) -> AVState:
     """启动音视频录制（非阻塞）"""
-    start_av_recording()
+    start_av_recording(session_id=state.get("session_id", DEFAULT_SESSION),
+                       silence_stop_s=state.get("silence_stop_s"))
     return {"recording_started": True}
 
 def stop_record(state: AVState) -> AVState:
     """停止录制并收集结果"""
     print("🟥 停止录制并整理结果")
     print("🟥 stop_record 节点被触发")
-    result = stop_av_recording()
+    # 等音频转写完成（含停止时才写出的尾部片段）即返回，VL 视频分析在后台继续，由面试分析节点统一收集
+    result = stop_av_recording(wait_analysis=False, session_id=state.get("session_id", DEFAULT_SESSION))
+    if state.get("stop_reason"):
+        result["stop_reason"] = state["stop_reason"]
     return {"messages": [result]}
 
 def wait_for_stop(state: AVState) -> AVState:
-    """等待停止信号"""
+    """
+    阻塞在本轮的停止通道上，直到按下 Enter、外部接口调用 request_av_stop、
+    回答后静音达到 silence_stop_s，或超过 max_duration
+    """
     print("🟡 录制中，按 Enter 停止 ...")
-    t0 = time.time()
     max_duration = state.get("max_duration", 300)
-    
-    while True:
-        # 检查外部信号
-        if state.get("external_stop_signal", False):
-            print("🔴 外部停止信号")
-            return {}
-        
-        # 检查键盘（如果可用）
+    channel = get_stop_channel(state.get("session_id", DEFAULT_SESSION))
+    if channel is None:
+        return {"stop_reason": "not_recording"}
+
+    hotkey = None
+    if keyboard is not None:
         try:
-            import keyboard
-            if keyboard.is_pressed("enter"):
-                print("🔴 按键停止")
-                return {"external_stop_signal": True}
-        except:
-            pass  # keyboard 模块不可用时忽略
-        
-        # 检查超时
-        if time.time() - t0 > max_duration:
-            print("⏰ 超时自动停止")
-            return {"external_stop_signal": True}
-            
-        time.sleep(0.1)
+            hotkey = keyboard.add_hotkey("enter", channel.signal, args=("key",))
+        except Exception as e:
+            print(f"⚠️ 键盘监听不可用: {e}")
+    try:
+        reason = channel.wait(max_duration)
+    finally:
+        if hotkey is not None:
+            keyboard.remove_hotkey(hotkey)
+
+    if reason is None:
+        channel.signal("timeout")
+        reason = channel.reason
+    print({"key": "🔴 按键停止", "silence": "🔴 回答结束，静音自动停止",
+           "timeout": "⏰ 超时自动停止"}.get(reason, f"🔴 停止信号: {reason}"))
+    return {"external_stop_signal": True, "stop_reason": reason}
 
 # 构建子图
 g = StateGraph(AVState)
@@ -77,24 +92,66 @@ g.add_edge("stop_record", END)
 
 av_subgraph = g.compile()
 
-# ✅ 使用 @tool 装饰器重新定义工具
-@tool
-def av_interview_tool(question: str = "", max_duration: int = 300) -> str:
+class RoundResult(TypedDict, total=False):
+    """
+    一轮问答的结构化结果：作为 ToolMessage.artifact 原样传递，再存入 InterviewState.structured_results。
+    片段数据与采集/分析统计只保存目录和文件引用（统计写在 stats_path），不内联进状态。
+    """
+    round: int
+    question: str
+    transcript: str  # 原始转写文本，与作答期间预生成所用的实时转写同一表示
+    audio_summary: str
+    video_summary: str
+    visual_metrics: Dict[str, Any]
+    pending_id: Optional[str]  # 后台分析尚未完成时，面试分析前据此收集完整结果
+    audio_dir: str
+    video_dir: str
+    timeline_path: str
+    stats_path: str  # 本轮 audio/video 统计（stats.json），后台分析完成后才写入
+    stop_reason: str
+    ended_at: float  # 采集结束时刻（time.time()），用于统计到下一题的等待时长
+    error: str
+
+ROUND_RESULT_KEYS = ("transcript", "audio_summary", "video_summary", "visual_metrics", "pending_id",
+                     "audio_dir", "video_dir", "timeline_path", "stats_path", "stop_reason", "error")
+
+def to_round_result(question: str, av_result: dict) -> RoundResult:
+    """从采集结果中只挑出后续节点需要的字段；统计信息已写入会话目录的 stats.json，只保留其路径"""
+    result: RoundResult = {"question": question, "audio_summary": "", "video_summary": "", "visual_metrics": {}}
+    result.update({k: av_result[k] for k in ROUND_RESULT_KEYS if av_result.get(k) is not None})
+    return result
+
+def format_round_result(result: RoundResult) -> str:
+    """ToolMessage 的文本内容，供提问模型阅读"""
+    if result.get("error"):
+        return f"本轮采集失败: {result['error']}"
+    lines = [result.get("audio_summary") or "未识别到回答内容"]
+    if result.get("video_summary"):
+        lines.append(result["video_summary"])
+    return "\n".join(lines)
+
+# ✅ 使用 @tool 装饰器重新定义工具；结构化结果作为 artifact 传给下游节点，无需序列化往返
+@tool(response_format="content_and_artifact")
+def av_interview_tool(question: str = "", max_duration: int = 300, silence_stop_s: float = 0,
+                      config: RunnableConfig = None) -> tuple[str, RoundResult]:
     """
     一次性完成面试的音视频采集与分析，返回分析结果
     
     Args:
         question: 面试问题（可选）
         max_duration: 最大录制时长（秒），默认300秒
+        silence_stop_s: 回答后连续静音多少秒自动结束本轮，0 表示不启用
     
     Returns:
-        包含音视频分析结果的JSON字符串
+        回答摘要文本，以及本轮的结构化结果 RoundResult
     """
     print(f"🎬 工具被调用: question='{question}', max_duration={max_duration}")
     
-    # 设置状态
+    # 设置状态；config 由 LangGraph 注入，其中的 thread_id 决定使用哪个采集会话
     state = {
         "max_duration": max_duration,
+        "silence_stop_s": silence_stop_s,
+        "session_id": str(((config or {}).get("configurable") or {}).get("thread_id") or DEFAULT_SESSION),
         "external_stop_signal": False,
         "messages": [],
         "recording_started": False
@@ -103,39 +160,28 @@ def av_interview_tool(question: str = "", max_duration: int = 300) -> str:
     try:
         # 执行子图
         result = av_subgraph.invoke(state)
-        
-        if 'messages' in result and result['messages']:
-            actual_result = result['messages'][0]
-            import json
-            return json.dumps(actual_result, ensure_ascii=False, indent=2)
+        if result.get("messages"):
+            av_result = result["messages"][0]
         else:
-            return json.dumps({
-                "audio_summary": "音视频录制完成，但未获得分析结果",
-                "video_summary": "",
-                "audio_dir": "",
-                "video_dir": ""
-            }, ensure_ascii=False, indent=2)
+            av_result = {"audio_summary": "音视频录制完成，但未获得分析结果"}
     except Exception as e:
         print(f"❌ 录制工具执行失败: {e}")
-        import json
-        return json.dumps({
-            "error": f"录制工具执行失败: {str(e)}",
-            "audio_summary": "",
-            "video_summary": "",
-            "audio_dir": "",
-            "video_dir": ""
-        }, ensure_ascii=False, indent=2)
+        av_result = {"error": f"录制工具执行失败: {str(e)}"}
+
+    round_result = to_round_result(question, av_result)
+    round_result["ended_at"] = time.time()
+    return format_round_result(round_result), round_result
 
 # 测试代码
 if __name__ == "__main__":
     print("🧪 测试工具...")
     
-    # 模拟自动停止
-    shared_state = {"max_duration": 10}
-    
+    # 模拟自动停止：从另一个线程通过停止通道结束本轮
+    from tools.analysis import request_av_stop
+
     def stop_later(sec: int = 5):
         time.sleep(sec)
-        shared_state["external_stop_signal"] = True
+        request_av_stop()
         print(f"⛔️ {sec} 秒到，自动发送 stop 信号")
 
     threading.Thread(target=stop_later, daemon=True).start()
@@ -0,0 +1,248 @@
+# graph/checkpointer.py
+"""
+面试图的持久化检查点：SQLite 单文件存储，进程崩溃后可从最近完成的一轮继续。
+- 每个 thread 只保留最近 keep_last 个检查点，旧检查点及不再被引用的通道数据随写入一起清理
+- 通道值按版本只存一份，超过 compress_min_bytes 的序列化结果再用 zlib 压缩
+"""
+from __future__ import annotations
+
+import os
+import random
+import sqlite3
+import threading
+import zlib
+from pathlib import Path
+from typing import Any, Iterator, Optional, Sequence
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+    writes_sort_key,
+)
+from langgraph.checkpoint.memory import MemorySaver
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS checkpoints (
+    thread_id TEXT NOT NULL, checkpoint_ns TEXT NOT NULL, checkpoint_id TEXT NOT NULL,
+    parent_id TEXT, type TEXT, checkpoint BLOB, metadata_type TEXT, metadata BLOB,
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id)
+);
+CREATE TABLE IF NOT EXISTS blobs (
+    thread_id TEXT NOT NULL, checkpoint_ns TEXT NOT NULL, channel TEXT NOT NULL, version TEXT NOT NULL,
+    type TEXT, value BLOB,
+    PRIMARY KEY (thread_id, checkpoint_ns, channel, version)
+);
+CREATE TABLE IF NOT EXISTS writes (
+    thread_id TEXT NOT NULL, checkpoint_ns TEXT NOT NULL, checkpoint_id TEXT NOT NULL,
+    task_id TEXT NOT NULL, idx INTEGER NOT NULL, channel TEXT, type TEXT, value BLOB, task_path TEXT,
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx)
+);
+"""
+
+
+class SqliteCheckpointSaver(BaseCheckpointSaver[str]):
+    """基于标准库 sqlite3 的检查点存储，多线程共用一个连接，写操作串行"""
+
+    def __init__(self, path: str, keep_last: int = 10, compress_min_bytes: int = 1024, *, serde=None):
+        super().__init__(serde=serde)
+        if keep_last < 2:
+            raise ValueError("keep_last 至少为 2：运行中的任务需要把写入挂在上一个检查点上")
+        self.path = path
+        self.keep_last = keep_last
+        self.compress_min_bytes = compress_min_bytes
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(_SCHEMA)
+        self.lock = threading.Lock()
+
+    # ---- 序列化 ----
+    def _dump(self, value: Any) -> tuple[str, bytes]:
+        type_, data = self.serde.dumps_typed(value)
+        if len(data) >= self.compress_min_bytes:
+            return f"{type_}+zlib", zlib.compress(data)
+        return type_, data
+
+    def _load(self, type_: str, data: bytes) -> Any:
+        if type_.endswith("+zlib"):
+            type_, data = type_[:-len("+zlib")], zlib.decompress(data)
+        return self.serde.loads_typed((type_, data))
+
+    # ---- 读取 ----
+    def _tuple(self, thread_id: str, ns: str, row) -> CheckpointTuple:
+        checkpoint_id, parent_id, type_, data, metadata_type, metadata = row
+        checkpoint: Checkpoint = self._load(type_, data)
+        values = {}
+        for channel, version in checkpoint["channel_versions"].items():
+            blob = self.conn.execute(
+                "SELECT type, value FROM blobs WHERE thread_id=? AND checkpoint_ns=? AND channel=? AND version=?",
+                (thread_id, ns, channel, str(version))).fetchone()
+            if blob is not None and blob[0] != "empty":
+                values[channel] = self._load(*blob)
+        writes = sorted(self.conn.execute(
+            "SELECT task_id, idx, channel, type, value, task_path FROM writes "
+            "WHERE thread_id=? AND checkpoint_ns=? AND checkpoint_id=?",
+            (thread_id, ns, checkpoint_id)).fetchall(), key=lambda w: writes_sort_key(w[5], w[0], w[1]))
+        return CheckpointTuple(
+            config={"configurable": {"thread_id": thread_id, "checkpoint_ns": ns, "checkpoint_id": checkpoint_id}},
+            checkpoint={**checkpoint, "channel_values": values},
+            metadata=self._load(metadata_type, metadata),
+            parent_config=(
+                {"configurable": {"thread_id": thread_id, "checkpoint_ns": ns, "checkpoint_id": parent_id}}
+                if parent_id else None
+            ),
+            pending_writes=[(task_id, channel, self._load(t, v)) for task_id, _, channel, t, v, _ in writes],
+        )
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        thread_id = config["configurable"]["thread_id"]
+        ns = config["configurable"].get("checkpoint_ns", "")
+        columns = "checkpoint_id, parent_id, type, checkpoint, metadata_type, metadata"
+        with self.lock:
+            if checkpoint_id := get_checkpoint_id(config):
+                row = self.conn.execute(
+                    f"SELECT {columns} FROM checkpoints WHERE thread_id=? AND checkpoint_ns=? AND checkpoint_id=?",
+                    (thread_id, ns, checkpoint_id)).fetchone()
+            else:
+                row = self.conn.execute(
+                    f"SELECT {columns} FROM checkpoints WHERE thread_id=? AND checkpoint_ns=? "
+                    "ORDER BY checkpoint_id DESC LIMIT 1", (thread_id, ns)).fetchone()
+            return self._tuple(thread_id, ns, row) if row else None
+
+    def list(self, config: Optional[RunnableConfig], *, filter: dict = None,
+             before: Optional[RunnableConfig] = None, limit: int = None) -> Iterator[CheckpointTuple]:
+        query = ("SELECT thread_id, checkpoint_ns, checkpoint_id, parent_id, type, checkpoint, "
+                 "metadata_type, metadata FROM checkpoints WHERE 1=1")
+        params = []
+        if config:
+            query += " AND thread_id=?"
+            params.append(config["configurable"]["thread_id"])
+            if (ns := config["configurable"].get("checkpoint_ns")) is not None:
+                query += " AND checkpoint_ns=?"
+                params.append(ns)
+            if checkpoint_id := get_checkpoint_id(config):
+                query += " AND checkpoint_id=?"
+                params.append(checkpoint_id)
+        if before and (before_id := get_checkpoint_id(before)):
+            query += " AND checkpoint_id<?"
+            params.append(before_id)
+        query += " ORDER BY checkpoint_id DESC"
+        with self.lock:
+            rows = self.conn.execute(query, params).fetchall()
+        for thread_id, ns, *row in rows:
+            if limit is not None and limit <= 0:
+                break
+            with self.lock:
+                item = self._tuple(thread_id, ns, row)
+            if filter and not all(item.metadata.get(k) == v for k, v in filter.items()):
+                continue
+            if limit is not None:
+                limit -= 1
+            yield item
+
+    # ---- 写入 ----
+    def put(self, config: RunnableConfig, checkpoint: Checkpoint, metadata: CheckpointMetadata,
+            new_versions: ChannelVersions) -> RunnableConfig:
+        thread_id = config["configurable"]["thread_id"]
+        ns = config["configurable"]["checkpoint_ns"]
+        c = checkpoint.copy()
+        values = c.pop("channel_values")
+        blobs = [
+            (thread_id, ns, k, str(v), *(self._dump(values[k]) if k in values else ("empty", b"")))
+            for k, v in new_versions.items()
+        ]
+        row = (thread_id, ns, checkpoint["id"], config["configurable"].get("checkpoint_id"),
+               *self._dump(c), *self._dump(get_checkpoint_metadata(config, metadata)))
+        with self.lock, self.conn:
+            self.conn.executemany("INSERT OR REPLACE INTO blobs VALUES (?, ?, ?, ?, ?, ?)", blobs)
+            self.conn.execute("INSERT OR REPLACE INTO checkpoints VALUES (?, ?, ?, ?, ?, ?, ?, ?)", row)
+            self._prune(thread_id, ns, self.keep_last)
+        return {"configurable": {"thread_id": thread_id, "checkpoint_ns": ns, "checkpoint_id": checkpoint["id"]}}
+
+    def put_writes(self, config: RunnableConfig, writes: Sequence[tuple[str, Any]], task_id: str,
+                   task_path: str = "") -> None:
+        thread_id = config["configurable"]["thread_id"]
+        ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = config["configurable"]["checkpoint_id"]
+        rows = []
+        for idx, (channel, value) in enumerate(writes):
+            idx = WRITES_IDX_MAP.get(channel, idx)
+            rows.append((thread_id, ns, checkpoint_id, task_id, idx, channel, *self._dump(value), task_path))
+        # 特殊写入（错误、中断等）覆盖旧值，普通写入已存在时保留第一次的结果
+        with self.lock, self.conn:
+            for row in rows:
+                verb = "INSERT OR REPLACE" if row[4] < 0 else "INSERT OR IGNORE"
+                self.conn.execute(f"{verb} INTO writes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", row)
+
+    # ---- 清理 ----
+    def _prune(self, thread_id: str, ns: str, keep: int):
+        """删除最近 keep 个之外的检查点及其写入，再删除已无检查点引用的通道值（调用方持有锁）"""
+        stale = [r[0] for r in self.conn.execute(
+            "SELECT checkpoint_id FROM checkpoints WHERE thread_id=? AND checkpoint_ns=? "
+            "ORDER BY checkpoint_id DESC LIMIT -1 OFFSET ?", (thread_id, ns, keep))]
+        if not stale:
+            return
+        for checkpoint_id in stale:
+            self.conn.execute("DELETE FROM checkpoints WHERE thread_id=? AND checkpoint_ns=? AND checkpoint_id=?",
+                              (thread_id, ns, checkpoint_id))
+            self.conn.execute("DELETE FROM writes WHERE thread_id=? AND checkpoint_ns=? AND checkpoint_id=?",
+                              (thread_id, ns, checkpoint_id))
+        referenced = set()
+        for type_, data in self.conn.execute(
+                "SELECT type, checkpoint FROM checkpoints WHERE thread_id=? AND checkpoint_ns=?", (thread_id, ns)):
+            referenced.update((k, str(v)) for k, v in self._load(type_, data)["channel_versions"].items())
+        unused = [(thread_id, ns, channel, version) for channel, version in self.conn.execute(
+            "SELECT channel, version FROM blobs WHERE thread_id=? AND checkpoint_ns=?", (thread_id, ns))
+            if (channel, version) not in referenced]
+        self.conn.executemany(
+            "DELETE FROM blobs WHERE thread_id=? AND checkpoint_ns=? AND channel=? AND version=?", unused)
+
+    def prune(self, thread_ids: Sequence[str], *, strategy: str = "keep_latest") -> None:
+        if strategy == "delete":
+            for thread_id in thread_ids:
+                self.delete_thread(thread_id)
+            return
+        with self.lock, self.conn:
+            for thread_id in thread_ids:
+                for (ns,) in self.conn.execute(
+                        "SELECT DISTINCT checkpoint_ns FROM checkpoints WHERE thread_id=?", (thread_id,)).fetchall():
+                    self._prune(thread_id, ns, 1)
+
+    def delete_thread(self, thread_id: str) -> None:
+        with self.lock, self.conn:
+            for table in ("checkpoints", "blobs", "writes"):
+                self.conn.execute(f"DELETE FROM {table} WHERE thread_id=?", (thread_id,))
+
+    def get_next_version(self, current: Optional[str], channel: None) -> str:
+        # 与 MemorySaver 相同的版本格式：递增序号 + 随机后缀
+        current_v = 0 if current is None else (current if isinstance(current, int) else int(current.split(".")[0]))
+        return f"{current_v + 1:032}.{random.random():016}"
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+def create_checkpointer(path: str = None, keep_last: int = None):
+    """
+    按环境变量选择检查点存储：INTERVIEW_CHECKPOINT_DB 指定 SQLite 文件路径时持久化，
+    INTERVIEW_CHECKPOINT_KEEP 设置每个 thread 保留的检查点数；未配置或打开失败时退回 MemorySaver。
+    """
+    path = path or os.getenv("INTERVIEW_CHECKPOINT_DB")
+    if not path:
+        return MemorySaver()
+    keep_last = keep_last or int(os.getenv("INTERVIEW_CHECKPOINT_KEEP", "10"))
+    try:
+        saver = SqliteCheckpointSaver(path, keep_last=keep_last)
+        print(f"💾 检查点存储: {path}（每场面试保留最近 {keep_last} 个）")
+        return saver
+    except Exception as e:
+        print(f"⚠️ 检查点数据库不可用，改用内存存储: {e}")
+        return MemorySaver()
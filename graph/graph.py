@@ -1,6 +1,6 @@
 # graph/graph.py
 from __future__ import annotations
-import sys, time
+import os, sys, time
 from pathlib import Path
 from typing import TypedDict, List, Optional, Annotated
 
@@ -8,17 +8,21 @@ from typing import TypedDict, List, Optional, Annotated
 project_root = Path(__file__).resolve().parent.parent
 sys.path.insert(0, str(project_root))
 
-from tools.analysis import start_av_recording, stop_av_recording
+from tools.analysis import (start_av_recording, stop_av_recording, open_av_session, close_av_session,
+                            collect_av_analysis, get_live_transcript, DEFAULT_SESSION)
 from langchain_core.messages import AIMessage, HumanMessage, AnyMessage, ToolMessage
+from langchain_core.runnables import RunnableConfig
 
 # ==== LangGraph ====
 from langgraph.graph import StateGraph, START, END
 from langgraph.graph.message import add_messages
-from langgraph.checkpoint.memory import MemorySaver
+from graph.checkpointer import create_checkpointer
 from langgraph.prebuilt import ToolNode
-from agents.question_agent import create_question_agent
-from graph.av_workflow import av_interview_tool
-from agents.analysis_agent import analysis_agent, InterviewAnalysisInput
+from agents.question_agent import (get_question_agent, SpeculativeQuestioner, build_question_context,
+                                   context_tokens, CONTEXT_LAST_K, CONTEXT_TOKEN_BUDGET)
+from graph.av_workflow import av_interview_tool, RoundResult
+from agents.analysis_agent import get_analysis_agent, InterviewAnalysisInput
+from agents import llm_registry
 
 # 状态定义
 class InterviewState(TypedDict):
@@ -33,12 +37,67 @@ class InterviewState(TypedDict):
     # 新增字段
     interview_completed: bool
     analysis_result: dict
-    structured_results: List[dict]
+    structured_results: List[RoundResult]
+    # 作答期间按实时转写预生成下一题；question_timings 记录每题从作答结束到给出下一题的耗时
+    speculative_questions: bool
+    question_timings: List[dict]
+    # 提问上下文：保留最近几轮完整问答，整体不超过的 token 数
+    context_last_k: int
+    context_token_budget: int
+    # 候选人开口后连续静音超过该秒数即结束本轮作答，0 表示只靠超时或回车结束
+    silence_stop_s: float
 
 tools = [av_interview_tool]
 tool_node = ToolNode(tools)
 
-def assistant(state: InterviewState) -> InterviewState:
+def session_id_of(config: RunnableConfig = None) -> str:
+    """采集会话按 LangGraph 的 thread_id 隔离，同一进程中的多场面试互不干扰"""
+    return str(((config or {}).get("configurable") or {}).get("thread_id") or DEFAULT_SESSION)
+
+speculators = {}  # session_id -> 本轮作答期间的 SpeculativeQuestioner
+
+def start_speculation(state: InterviewState, config: RunnableConfig, question: str):
+    """提出问题后，在候选人作答期间后台预生成下一题"""
+    if not state.get("speculative_questions"):
+        return
+    session_id = session_id_of(config)
+    try:
+        speculators[session_id] = SpeculativeQuestioner(
+            state, question, lambda: get_live_transcript(session_id),
+            last_k=state.get("context_last_k", CONTEXT_LAST_K),
+            token_budget=state.get("context_token_budget", CONTEXT_TOKEN_BUDGET)).start()
+    except Exception as e:
+        print(f"⚠️ 预生成下一题未启动: {e}")
+
+def cancel_speculation(config: RunnableConfig):
+    speculator = speculators.pop(session_id_of(config), None)
+    if speculator is not None:
+        speculator.cancel()
+
+def next_decision(state: InterviewState, config: RunnableConfig) -> tuple:
+    """
+    得到下一题的决策：预生成结果与最终回答足够接近时直接采用，否则按完整状态重新生成。
+    同时返回耗时记录，从上一轮采集结束算起。
+    """
+    t0 = time.time()
+    last = (state.get("structured_results") or [{}])[-1]
+    timing = {"round": state.get("round", 0) + 1, "mode": "direct"}
+    decision = None
+    speculator = speculators.pop(session_id_of(config), None)
+    if speculator is not None:
+        # 预生成时读取的是原始实时转写，这里用同样不带"语音内容:"前缀和情绪分析的文本比较
+        decision, info = speculator.finish(last.get("transcript", ""))
+        timing.update(info, mode="speculative" if decision is not None else "regenerated")
+    context = build_question_context(state, state.get("context_last_k", CONTEXT_LAST_K),
+                                     state.get("context_token_budget", CONTEXT_TOKEN_BUDGET))
+    timing["prompt_tokens"] = context_tokens(context)
+    if decision is None:
+        decision = get_question_agent().invoke(context)
+    timing["seconds"] = round(time.time() - last.get("ended_at", t0), 2)
+    print(f"⏱️ 下一题就绪: {timing}")
+    return decision, timing
+
+def assistant(state: InterviewState, config: RunnableConfig = None) -> InterviewState:
     """面试官助手函数 - 提问并决定是否继续"""
     current_round = state.get("round", 0)
     max_rounds = state.get("max_rounds", 10)
@@ -46,6 +105,11 @@ def assistant(state: InterviewState) -> InterviewState:
     # 第一轮：自我介绍
     if current_round == 0:
         print(f"🎬 开始第 {current_round + 1} 轮面试")
+        # 整场面试只打开一次麦克风和摄像头，各轮复用
+        try:
+            open_av_session(session_id_of(config))
+        except Exception as e:
+            print(f"⚠️ 设备会话打开失败，各轮将单独打开设备: {e}")
         question = "请先自我介绍一下。"
         
         # ✅ 关键修改：返回工具调用消息而不是普通消息
@@ -53,12 +117,14 @@ def assistant(state: InterviewState) -> InterviewState:
             content="",
             tool_calls=[{
                 "name": "av_interview_tool", 
-                "args": {"question": question, "max_duration": 30},
+                "args": {"question": question, "max_duration": 30,
+                         "silence_stop_s": state.get("silence_stop_s", 0)},
                 "id": f"call_{current_round + 1}",
                 "type": "tool_call"
             }]
         )
         
+        start_speculation(state, config, question)
         return {
             "messages": [AIMessage(content=question), tool_call_message],
             "round": current_round + 1,
@@ -68,6 +134,7 @@ def assistant(state: InterviewState) -> InterviewState:
     # 检查是否超过最大轮次
     if current_round >= max_rounds:
         print(f"⏰ 已达到最大轮次 {max_rounds}，结束面试")
+        cancel_speculation(config)
         return {
             "messages": [AIMessage(content="感谢您的时间，面试结束。")],
             "round": current_round,
@@ -78,8 +145,7 @@ def assistant(state: InterviewState) -> InterviewState:
     # 其他轮次：调用LLM决策
     try:
         print(f"🎬 开始第 {current_round + 1} 轮面试")
-        llm = create_question_agent()
-        decision = llm.invoke(state)
+        decision, timing = next_decision(state, config)
         
         print(f"🤖 决策结果: {decision}")
         
@@ -96,13 +162,16 @@ def assistant(state: InterviewState) -> InterviewState:
                 content="",
                 tool_calls=[{
                     "name": "av_interview_tool", 
-                    "args": {"question": question, "max_duration": 60},
+                    "args": {"question": question, "max_duration": 60,
+                             "silence_stop_s": state.get("silence_stop_s", 0)},
                     "id": f"call_{current_round + 1}",
                     "type": "tool_call"
                 }]
             )
             messages.append(tool_call_message)
             should_continue = decision.should_round
+            if should_continue:
+                start_speculation(state, config, question)
         else:
             # 没有下一个问题，结束面试
             messages.append(AIMessage(content="感谢您的时间，面试结束。"))
@@ -112,22 +181,21 @@ def assistant(state: InterviewState) -> InterviewState:
             "messages": messages,
             "round": current_round + 1,
             "should_continue": should_continue,
-
-
-
-            
             "interview_completed": not should_continue,
+            "question_timings": state.get("question_timings", []) + [timing],
         }
         
     except Exception as e:
         print(f"❌ assistant函数错误: {e}")
+        cancel_speculation(config)
         # 异常情况下的兜底处理
         question = "请继续介绍您的经验。"
         tool_call_message = AIMessage(
             content="",
             tool_calls=[{
                 "name": "av_interview_tool", 
-                "args": {"question": question, "max_duration": 60},
+                "args": {"question": question, "max_duration": 60,
+                         "silence_stop_s": state.get("silence_stop_s", 0)},
                 "id": f"call_{current_round + 1}",
                 "type": "tool_call"
             }]
@@ -139,54 +207,73 @@ def assistant(state: InterviewState) -> InterviewState:
         }
 
 def process_tool_results(state: InterviewState) -> InterviewState:
-    """处理工具执行结果"""
+    """处理工具执行结果：ToolNode 刚追加的 ToolMessage 带有本轮的 RoundResult"""
     messages = state.get("messages", [])
-    qa_pairs = list(state.get("qa_pairs", []))
-    audio_summaries = list(state.get("audio_summaries", []))
-    video_summaries = list(state.get("video_summaries", []))
-    
-    # 查找最新的问题和工具结果
-    question = None
-    tool_result = None
-    
-    for msg in reversed(messages):
-        if isinstance(msg, AIMessage) and msg.content and not msg.tool_calls:
-            question = msg.content
-        elif isinstance(msg, ToolMessage):
-            tool_result = msg.content
-            break
-    
-    if question and tool_result:
-        try:
-            import json
-            result_data = json.loads(tool_result)
-            
-            # 提取音频摘要和视频摘要
-            audio_summary = result_data.get("audio_summary", "")
-            video_summary = result_data.get("video_summary", "")
-            
-            if audio_summary:
-                audio_summaries.append(audio_summary)
-            if video_summary:
-                video_summaries.append(video_summary)
-            
-            # 将问答对加入记录
-            qa_pairs.append((question, audio_summary))
-            
-            print(f"📝 本轮问答: Q: {question[:50]}... A: {audio_summary[:50]}...")
-            
-        except json.JSONDecodeError as e:
-            print(f"❌ 解析工具结果失败: {e}")
-    
+    last = messages[-1] if messages else None
+    if not isinstance(last, ToolMessage):
+        return {}  # 面试正常结束时最后一条不是工具消息，无需处理
+    round_result = last.artifact
+    if not round_result:
+        print("❌ 未找到本轮工具结果")
+        return {}
+
+    round_result = {**round_result, "round": state.get("round", 0)}
+    question = round_result.get("question", "")
+    audio_summary = round_result.get("audio_summary", "")
+    video_summary = round_result.get("video_summary", "")
+    # 回答已含本轮全部转写；视频分析仍在后台进行，面试分析前再按 pending_id 收集完整结果
+    print(f"📝 本轮问答: Q: {question[:50]}... A: {audio_summary[:50]}...")
+
+    return {
+        "qa_pairs": state.get("qa_pairs", []) + [(question, audio_summary)],
+        "audio_summaries": state.get("audio_summaries", []) + ([audio_summary] if audio_summary else []),
+        "video_summaries": state.get("video_summaries", []) + ([video_summary] if video_summary else []),
+        # 本地计算的数值指标随 RoundResult 直接进入评分，不经过文本摘要
+        "structured_results": state.get("structured_results", []) + [round_result],
+    }
+
+def collect_pending_rounds(state: InterviewState, session_id: str = DEFAULT_SESSION) -> dict:
+    """
+    收集各轮在后台完成的音视频分析，用完整结果替换提问时的临时摘要，
+    返回更新后的 qa_pairs / audio_summaries / video_summaries / structured_results
+    """
+    results = [dict(r) for r in state.get("structured_results", [])]
+    if not any(r.get("pending_id") for r in results):
+        return {}
+
+    for r in results:
+        pending_id = r.pop("pending_id", None)
+        if not pending_id:
+            continue
+        collected = collect_av_analysis(pending_id, session_id=session_id)
+        if collected.get("error"):
+            print(f"⚠️ 收集后台分析失败: {collected['error']}")
+            continue
+        r["audio_summary"] = collected.get("audio_summary", r.get("audio_summary", ""))
+        r["video_summary"] = collected.get("video_summary", r.get("video_summary", ""))
+        r["visual_metrics"] = collected.get("visual_metrics", r.get("visual_metrics", {}))
+        # 完整转写、时间轴与统计文件在后台分析完成后才有
+        for key in ("transcript", "timeline_path", "stats_path"):
+            if collected.get(key):
+                r[key] = collected[key]
+
     return {
-        "qa_pairs": qa_pairs,
-        "audio_summaries": audio_summaries,
-        "video_summaries": video_summaries,
+        "qa_pairs": [(r["question"], r.get("audio_summary", "")) for r in results],
+        "audio_summaries": [r["audio_summary"] for r in results if r.get("audio_summary")],
+        "video_summaries": [r["video_summary"] for r in results if r.get("video_summary")],
+        "structured_results": results,
     }
 
-def analyze_interview_performance(state: InterviewState) -> InterviewState:
+def analyze_interview_performance(state: InterviewState, config: RunnableConfig = None) -> InterviewState:
     """分析面试表现的节点"""
     print("开始面试分析...")
+    session_id = session_id_of(config)
+    cancel_speculation(config)
+    # 各轮的远程分析与后续轮次录制并行进行，到这里才等待它们全部完成
+    collected = collect_pending_rounds(state, session_id)
+    state = {**state, **collected}
+    # 面试已结束，释放整场共用的设备（须在收集之后，关闭会话会丢弃未收集的分析）
+    close_av_session(session_id)
     
     try:
         # 准备分析输入数据
@@ -199,7 +286,7 @@ def analyze_interview_performance(state: InterviewState) -> InterviewState:
         }
         
         # 执行分析
-        analysis_result = analysis_agent.analyze_interview(analysis_input)
+        analysis_result = get_analysis_agent().analyze_interview(analysis_input)
         
         # 格式化分析结果为字典
         result_dict = {
@@ -220,6 +307,7 @@ def analyze_interview_performance(state: InterviewState) -> InterviewState:
         print(f"主要优势: {', '.join(analysis_result.strengths[:2])}")
         
         return {
+            **collected,
             "analysis_result": result_dict,
             "messages": [AIMessage(content=f"面试分析已完成。候选人总体评分：{analysis_result.overall_score}/100")]
         }
@@ -227,6 +315,7 @@ def analyze_interview_performance(state: InterviewState) -> InterviewState:
     except Exception as e:
         print(f"面试分析失败: {e}")
         return {
+            **collected,
             "analysis_result": {
                 "error": f"分析失败: {str(e)}",
                 "overall_score": 0,
@@ -236,20 +325,24 @@ def analyze_interview_performance(state: InterviewState) -> InterviewState:
         }
 
 def route_after_tools(state: InterviewState) -> str:
-    """工具执行后的路由决策"""
+    """工具执行后的路由决策：最后一题的结果同样要经过 process_results 记入 structured_results"""
     should_continue = state.get("should_continue", False)
     interview_completed = state.get("interview_completed", False)
     
-    if should_continue:
+    if should_continue or interview_completed:
         route = "process_results"
-    elif interview_completed:
-        route = "analyze_performance"
     else:
         route = "__end__"
         
     print(f"工具后路由: should_continue={should_continue}, completed={interview_completed} -> {route}")
     return route
 
+def route_after_process(state: InterviewState) -> str:
+    """记录本轮结果后：继续提问，或在最后一题后进入面试分析"""
+    route = "assistant" if state.get("should_continue", False) else "analyze_performance"
+    print(f"结果处理后路由 -> {route}")
+    return route
+
 def route_after_analysis(state: InterviewState) -> str:
     """面试分析后的路由决策"""
     print("分析完成，结束流程")
@@ -273,12 +366,14 @@ g.add_edge("assistant", "tools")
 # ✅ tools执行完后的条件路由
 g.add_conditional_edges("tools", route_after_tools, {
     "process_results": "process_results",
-    "analyze_performance": "analyze_performance",
     "__end__": END
 })
 
-# ✅ 处理完结果后回到assistant继续下一轮
-g.add_edge("process_results", "assistant")
+# ✅ 处理完结果后回到assistant继续下一轮，最后一题处理完进入分析
+g.add_conditional_edges("process_results", route_after_process, {
+    "assistant": "assistant",
+    "analyze_performance": "analyze_performance",
+})
 
 # ✅ 分析完成后结束
 g.add_edge("analyze_performance", END)
@@ -286,13 +381,27 @@ g.add_edge("analyze_performance", END)
 print("图结构验证:")
 print(f"节点: {list(g.nodes.keys())}")
 
-memory = MemorySaver()
-interview_graph = g.compile(checkpointer=memory)
+# 设置 INTERVIEW_CHECKPOINT_DB 时检查点写入 SQLite，进程重启后可继续未完成的面试
+checkpointer = create_checkpointer()
+interview_graph = g.compile(checkpointer=checkpointer)
+
+def resume_point(config: dict):
+    """
+    返回未完成面试最近一个轮次边界（下一步是 assistant）的检查点配置，从这里继续会重新提出进行中的那一题。
+    线程不存在或面试已结束时返回 None。
+    """
+    snapshot = interview_graph.get_state(config)
+    if not snapshot.values or not snapshot.next:
+        return None
+    for past in interview_graph.get_state_history(config):
+        if past.next == ("assistant",):
+            return past.config
+    return snapshot.config
 
 print("图编译成功!")
 
 if __name__ == "__main__":
-    config = {"configurable": {"thread_id": "1"}}
+    config = {"configurable": {"thread_id": os.getenv("INTERVIEW_THREAD_ID", "1")}}
 
     sample_resume = """姓名：Alice
 学历：计算机科学本科
@@ -312,8 +421,14 @@ if __name__ == "__main__":
         "interview_completed": False,
         "analysis_result": {},
         "structured_results": [],
+        "speculative_questions": True,
+        "question_timings": [],
+        "silence_stop_s": 3.0,
     }
 
+    # 候选人接入前构建模型客户端、提问链与分析图，并预先建立到 OpenAI 的连接
+    llm_registry.warm_up(connect=True)
+
     print("🎯 开始智能面试流程...\n")
     print("📋 新流程: START → assistant → tools → process_results → assistant → ... → analyze_performance → END")
     print("🔍 增加功能: 面试分析 + 向量数据库 + 网络搜索")
@@ -321,26 +436,36 @@ if __name__ == "__main__":
     
     final = None
     step_count = 0
-    for chunk in interview_graph.stream(init_state, config=config, stream_mode="values"):
-        final = chunk
-        step_count += 1
+    try:
+        # 同一 thread 有未完成的面试时从最近完成的一轮继续；已结束的旧记录先清掉再重新开始
+        resume_config = resume_point(config)
+        if resume_config is not None:
+            print(f"♻️ 从第 {interview_graph.get_state(resume_config).values.get('round', 0)} 轮之后继续面试")
+        elif interview_graph.get_state(config).values:
+            checkpointer.delete_thread(config["configurable"]["thread_id"])
+        stream_input = None if resume_config is not None else init_state
+        for chunk in interview_graph.stream(stream_input, config=resume_config or config, stream_mode="values"):
+            final = chunk
+            step_count += 1
         
-        print(f"\n🔄 步骤 {step_count}")
+            print(f"\n🔄 步骤 {step_count}")
         
-        if chunk.get("messages"):
-            last_msg = chunk["messages"][-1]
-            if isinstance(last_msg, AIMessage) and last_msg.content:
-                print(f"🤖 面试官 [轮次{chunk.get('round', 0)}]: {last_msg.content}")
-            elif isinstance(last_msg, AIMessage) and last_msg.tool_calls:
-                print(f"🔧 调用工具: {last_msg.tool_calls[0]['name']}")
-            elif isinstance(last_msg, ToolMessage):
-                print(f"🔧 工具执行完成 [轮次{chunk.get('round', 0)}]")
-                result_preview = last_msg.content[:100] + "..." if len(last_msg.content) > 100 else last_msg.content
-                print(f"🔧 工具结果预览: {result_preview}")
+            if chunk.get("messages"):
+                last_msg = chunk["messages"][-1]
+                if isinstance(last_msg, AIMessage) and last_msg.content:
+                    print(f"🤖 面试官 [轮次{chunk.get('round', 0)}]: {last_msg.content}")
+                elif isinstance(last_msg, AIMessage) and last_msg.tool_calls:
+                    print(f"🔧 调用工具: {last_msg.tool_calls[0]['name']}")
+                elif isinstance(last_msg, ToolMessage):
+                    print(f"🔧 工具执行完成 [轮次{chunk.get('round', 0)}]")
+                    result_preview = last_msg.content[:100] + "..." if len(last_msg.content) > 100 else last_msg.content
+                    print(f"🔧 工具结果预览: {result_preview}")
         
-        should_continue = chunk.get("should_continue", False)
-        print(f"📍 继续面试: {'是' if should_continue else '否'}")
-        print("-" * 40)
+            should_continue = chunk.get("should_continue", False)
+            print(f"📍 继续面试: {'是' if should_continue else '否'}")
+            print("-" * 40)
+    finally:
+        close_av_session(session_id_of(config))
 
     print("\n=== 🎉 面试结束，完整回顾 ===")
     qa_pairs = final.get("qa_pairs", [])
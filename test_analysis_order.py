@@ -0,0 +1,207 @@
+# test_analysis_order.py
+"""测试并发分析线程池：模型耗时随机时，结果仍按片段顺序汇总，复用链指向正确的参考片段"""
+
+import json
+import random
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import cv2
+import numpy as np
+import soundfile as sf
+
+import tools.audio_analysis as audio_analysis
+import tools.video_analysis as video_analysis
+from tools.audio_analysis import RecorderController
+from tools.sources import VideoFileSource, WavFileSource
+from tools.video_analysis import VideoController
+
+FPS = 10
+SCENES = [40, 40, 200, 200, 200, 40]  # 每个 5 秒片段的画面亮度：相同亮度的相邻片段应复用结论
+
+
+class SlowGraph:
+    """随机延迟返回的假模型，后提交的片段经常先完成"""
+
+    def __init__(self, key: str, seed: int = 0):
+        self.key = key
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.calls = []
+
+    def invoke(self, state):
+        path = state[self.key]
+        with self.lock:
+            delay = self.rng.uniform(0.0, 0.3)
+            self.calls.append(Path(path).name)
+        time.sleep(delay)
+        name = Path(path).name
+        return {"video_analysis": f"结论 {name}", "transcript": f"转写 {name}",
+                "audio_analysis": {}, "upload_bytes": 0}
+
+
+def _write_video(path: Path):
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*"mp4v"), FPS, (160, 120))
+    for level in SCENES:
+        for _ in range(FPS * video_analysis.CLIP_SECONDS):
+            writer.write(np.full((120, 160, 3), level, np.uint8))
+    writer.release()
+
+
+def test_video_order_and_reuse():
+    """video_analysis.json 按片段顺序输出；复用片段指向最近一次真正分析的片段并沿用其结论"""
+    graph = SlowGraph("video_path", seed=1)
+    original = video_analysis.get_video_graph
+    video_analysis.get_video_graph = lambda **kwargs: graph
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            _write_video(Path(tmp) / "scenes.mp4")
+            controller = VideoController(source=VideoFileSource(f"{tmp}/scenes.mp4", realtime=False),
+                                         headless=True, analysis_workers=3, output_dir=f"{tmp}/video")
+            controller.start()
+            controller.source.finished.wait(10)
+            controller.stop()
+
+            items = json.loads((Path(tmp) / "video" / "video_analysis.json").read_text(encoding="utf-8"))
+            stats = controller.get_stats()
+    finally:
+        video_analysis.get_video_graph = original
+
+    names = [Path(item["video_path"]).name for item in items]
+    reused_from = [Path(item["reused_from"]).name if item["reused_from"] else None for item in items]
+    print(f"片段: {names}")
+    print(f"复用: {reused_from}")
+    assert names == [f"video_{i}.mp4" for i in range(len(SCENES))]
+    assert [item["start_s"] for item in items] == sorted(item["start_s"] for item in items)
+    assert reused_from == [None, "video_0.mp4", None, "video_2.mp4", "video_2.mp4", None]
+
+    by_name = dict(zip(names, items))
+    for item, ref in zip(items, reused_from):
+        assert item["reused"] == (ref is not None)
+        if ref:
+            assert item["video_analysis"] == by_name[ref]["video_analysis"]
+        else:
+            assert item["video_analysis"]["video_analysis"] == f"结论 {Path(item['analysis_path']).name}"
+    assert all(item["analysis_config"]["input_mode"] == "keyframes" for item in items)
+    assert sorted(graph.calls) == ["video_0_analysis.mp4", "video_2_analysis.mp4", "video_5_analysis.mp4"]
+    assert stats["segments"] == len(SCENES) and stats["reused"] == 3
+    assert stats["queue_depth"] == 0 and 1 <= stats["queue_depth_max"] <= len(SCENES)
+
+
+class FailingReferenceGraph(SlowGraph):
+    """video_2 的 VL 调用较慢且失败，video_3/4 此时已挂在它上面等待复用"""
+
+    def invoke(self, state):
+        if Path(state[self.key]).name == "video_2_analysis.mp4":
+            with self.lock:
+                self.calls.append("video_2_analysis.mp4")
+            time.sleep(0.5)
+            raise RuntimeError("VL 超时")
+        return super().invoke(state)
+
+
+def test_video_reference_failure_reanalyses_attached():
+    """参考片段分析失败时，挂在它上面的片段重新分析，而不是以复用名义发布失败结论"""
+    graph = FailingReferenceGraph("video_path", seed=4)
+    original = video_analysis.get_video_graph
+    video_analysis.get_video_graph = lambda **kwargs: graph
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            _write_video(Path(tmp) / "scenes.mp4")
+            controller = VideoController(source=VideoFileSource(f"{tmp}/scenes.mp4", realtime=False),
+                                         headless=True, analysis_workers=3, output_dir=f"{tmp}/video")
+            controller.start()
+            controller.source.finished.wait(10)
+            controller.stop()
+            items = json.loads((Path(tmp) / "video" / "video_analysis.json").read_text(encoding="utf-8"))
+            summary = controller.get_summary()
+            stats = controller.get_stats()
+    finally:
+        video_analysis.get_video_graph = original
+
+    reused_from = [Path(item["reused_from"]).name if item["reused_from"] else None for item in items]
+    print(f"复用: {reused_from}, 调用: {graph.calls}")
+    assert reused_from == [None, "video_0.mp4", None, None, None, None]
+    assert items[2]["video_analysis"].get("error")
+    for item in items[3:5]:
+        assert not item["reused"] and not item["video_analysis"].get("error")
+        assert item["video_analysis"]["video_analysis"] == f"结论 {Path(item['analysis_path']).name}"
+    assert "沿用 video_2.mp4" not in summary
+    assert stats["reused"] == 1
+
+
+def test_audio_order_with_random_delays():
+    """音频线程池乱序完成时，transcripts.json 仍与片段顺序一致"""
+    graph = SlowGraph("audio_path", seed=2)
+    original = audio_analysis.get_audio_graph
+    audio_analysis.get_audio_graph = lambda **kwargs: graph
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            sr = audio_analysis.AUDIO_SR
+            t = np.arange(sr * 32) / sr
+            sf.write(f"{tmp}/answer.wav", (0.3 * np.sin(2 * np.pi * 200 * t)).astype(np.float32), sr)
+            controller = RecorderController(analysis_workers=4, source=WavFileSource(f"{tmp}/answer.wav", realtime=False),
+                                            output_dir=f"{tmp}/audio")
+            controller.start()
+            controller.source.finished.wait(10)
+            controller.stop()
+
+            transcripts = json.loads((Path(tmp) / "audio" / "transcripts.json").read_text(encoding="utf-8"))
+    finally:
+        audio_analysis.get_audio_graph = original
+
+    names = [Path(t["audio_path"]).name for t in transcripts]
+    print(f"片段: {names}")
+    assert names == [f"audio_{i}.flac" for i in range(7)]
+    assert [t["transcript"] for t in transcripts] == [f"转写 {name}" for name in names]
+    assert len(graph.calls) == 7
+
+
+def test_audio_failed_segment_keeps_order():
+    """某个片段处理时抛出异常：该下标仍写入带 error 的空结果，后续片段照常发布"""
+    graph = SlowGraph("audio_path", seed=3)
+    original = audio_analysis.get_audio_graph
+    audio_analysis.get_audio_graph = lambda **kwargs: graph
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            sr = audio_analysis.AUDIO_SR
+            t = np.arange(sr * 15) / sr
+            sf.write(f"{tmp}/answer.wav", (0.3 * np.sin(2 * np.pi * 200 * t)).astype(np.float32), sr)
+            controller = RecorderController(analysis_workers=2, source=WavFileSource(f"{tmp}/answer.wav", realtime=False),
+                                            output_dir=f"{tmp}/audio")
+            analyze = controller._analyze_segment
+
+            def flaky(graph, audio_path):
+                if audio_path.endswith("audio_1.flac"):
+                    raise OSError("片段文件不可读")
+                return analyze(graph, audio_path)
+
+            controller._analyze_segment = flaky
+            controller.start()
+            controller.source.finished.wait(10)
+            controller.stop()
+
+            live = controller.get_live_transcript()
+            transcripts = json.loads((Path(tmp) / "audio" / "transcripts.json").read_text(encoding="utf-8"))
+            analyses = json.loads((Path(tmp) / "audio" / "audio_analysis.json").read_text(encoding="utf-8"))
+    finally:
+        audio_analysis.get_audio_graph = original
+
+    print(f"转写: {[(Path(t['audio_path']).name, t['transcript'], t.get('error')) for t in transcripts]}")
+    assert [Path(t["audio_path"]).name for t in transcripts] == ["audio_0.flac", "audio_1.flac", "audio_2.flac"]
+    assert transcripts[1]["transcript"] == "" and "不可读" in transcripts[1]["error"]
+    assert "error" in analyses[1] and "error" not in analyses[0] and "error" not in analyses[2]
+    assert live == "转写 audio_0.flac 转写 audio_2.flac"
+
+
+if __name__ == "__main__":
+    print("开始测试并发分析顺序...\n")
+    test_video_order_and_reuse()
+    test_video_reference_failure_reanalyses_attached()
+    test_audio_order_with_random_delays()
+    test_audio_failed_segment_keeps_order()
+    print("\n并发分析顺序测试通过!")
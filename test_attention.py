@@ -0,0 +1,64 @@
+# test_attention.py
+"""测试本地视觉注意力指标（不依赖摄像头和 API）"""
+
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import numpy as np
+from tools.attention import extract_attention, aggregate_attention, describe_attention
+
+
+def test_no_face_frames():
+    """空白画面：没有检测到人脸，视线偏离无从谈起（None），移动为 0"""
+    frames = [np.full((270, 480, 3), 128, dtype=np.uint8) for _ in range(10)]
+    metrics = extract_attention(frames, fps=5.0)
+    print(f"视觉指标: {metrics}")
+    if not metrics:
+        print("级联检测器不可用，跳过")
+        return
+    assert metrics["frames_sampled"] == 10
+    assert metrics["face_present_ratio"] == 0.0
+    assert metrics["gaze_away_ratio"] is None
+    assert metrics["head_movement"] == 0.0
+
+
+def test_aggregate_weighted_by_frames():
+    """多片段汇总：在镜比例按帧数加权，偏离比例按有脸帧加权"""
+    merged = aggregate_attention([
+        {"frames_sampled": 30, "face_present_ratio": 1.0, "gaze_away_ratio": 0.1,
+         "head_movement": 0.2, "head_movement_max": 0.5},
+        {"frames_sampled": 10, "face_present_ratio": 0.5, "gaze_away_ratio": 0.6,
+         "head_movement": 1.0, "head_movement_max": 2.0},
+        {},
+    ])
+    print(f"汇总: {merged}")
+    assert merged["frames_sampled"] == 40
+    assert merged["face_present_ratio"] == 0.875
+    assert merged["gaze_away_ratio"] == round((30 * 0.1 + 5 * 0.6) / 35, 3)
+    assert merged["head_movement_max"] == 2.0
+    assert set(describe_attention(merged)) == {"人脸在镜", "视线偏离", "头部移动"}
+    assert aggregate_attention([]) == {}
+
+
+def test_aggregate_without_faces():
+    """所有片段都没有人脸：汇总后视线偏离仍为 None，不会被当成一直注视镜头"""
+    empty = {"frames_sampled": 20, "face_present_ratio": 0.0, "gaze_away_ratio": None,
+             "head_movement": 0.0, "head_movement_max": 0.0}
+    merged = aggregate_attention([empty, empty])
+    print(f"汇总: {merged}")
+    assert merged["face_present_ratio"] == 0.0
+    assert merged["gaze_away_ratio"] is None
+    assert describe_attention(merged)["视线偏离"] == "未检测到人脸"
+
+    mixed = aggregate_attention([empty, {"frames_sampled": 20, "face_present_ratio": 1.0, "gaze_away_ratio": 0.2,
+                                         "head_movement": 0.3, "head_movement_max": 0.4}])
+    assert mixed["gaze_away_ratio"] == 0.2
+
+
+if __name__ == "__main__":
+    print("开始测试视觉注意力指标...\n")
+    test_no_face_frames()
+    test_aggregate_weighted_by_frames()
+    test_aggregate_without_faces()
+    print("\n视觉注意力指标测试通过!")
@@ -0,0 +1,176 @@
+# test_batch_analysis.py
+"""测试离线批量重分析的跳过/重试/沿用逻辑（片段 agent 用本地假图代替，不调用 API）"""
+
+import json
+import shutil
+import sys
+import tempfile
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import cv2
+import numpy as np
+import soundfile as sf
+
+import agents.audio_agent as audio_agent
+import agents.video_agent as video_agent
+from tools.batch_analysis import _reanalyze_audio, _reanalyze_video, ONLINE_VIDEO_CONFIG
+
+
+class FakeGraph:
+    """记录调用的片段；fail 中的文件名抛出异常"""
+
+    def __init__(self, key: str, fail=()):
+        self.key = key
+        self.fail = set(fail)
+        self.calls = []
+        self.kwargs = None
+
+    def __call__(self, *args, **kwargs):
+        self.kwargs = kwargs
+        return self
+
+    def invoke(self, state):
+        name = Path(state[self.key]).name
+        self.calls.append(name)
+        if name in self.fail:
+            raise RuntimeError("模型超时")
+        return {"transcript": f"新转写 {name}", "audio_analysis": {"情绪": "平稳"},
+                "video_analysis": f"新结论 {name}"}
+
+
+def _write_json(path: Path, data):
+    path.write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+
+
+def _audio_session(root: Path) -> Path:
+    """三个片段：0 已成功，1 在线分析失败（带 error），2 旧版本的失败记录（转写与分析都为空）"""
+    audio_dir = root / "audio"
+    audio_dir.mkdir(parents=True)
+    t = np.arange(16000) / 16000
+    for i in range(3):
+        sf.write(str(audio_dir / f"audio_{i}.flac"), (0.3 * np.sin(2 * np.pi * 200 * t)).astype(np.float32), 16000)
+    spans = [(0.0, 5.0), (5.0, 10.0), (10.0, 12.0)]
+    _write_json(audio_dir / "transcripts.json", [
+        {"audio_path": f"old/audio_{i}.flac", "start_s": s, "end_s": e,
+         "transcript": ["你好", "", ""][i], **({"error": "timeout"} if i == 1 else {})}
+        for i, (s, e) in enumerate(spans)
+    ])
+    _write_json(audio_dir / "audio_analysis.json", [
+        {"audio_path": f"old/audio_{i}.flac", "start_s": s, "end_s": e,
+         "audio_analysis": [{"情绪": "自信"}, {}, ""][i], "prosody": {}, **({"error": "timeout"} if i == 1 else {})}
+        for i, (s, e) in enumerate(spans)
+    ])
+    return audio_dir
+
+
+def _video_session(root: Path, config: dict = None) -> Path:
+    video_dir = root / "video"
+    video_dir.mkdir(parents=True)
+    for i in range(2):
+        writer = cv2.VideoWriter(str(video_dir / f"video_{i}.mp4"), cv2.VideoWriter_fourcc(*"mp4v"), 5, (64, 48))
+        for _ in range(5):
+            writer.write(np.full((48, 64, 3), 100, np.uint8))
+        writer.release()
+    _write_json(video_dir / "video_analysis.json", [
+        {"video_path": "old/video_0.mp4", "start_s": 0.0, "end_s": 5.0,
+         "video_analysis": {"video_analysis": "旧结论"}, "visual_metrics": {}},
+        {"video_path": "old/video_1.mp4", "start_s": 5.0, "end_s": 10.0,
+         "video_analysis": {"video_analysis": "", "error": "超时"}, "visual_metrics": {},
+         **({"analysis_config": config} if config else {})},
+    ])
+    return video_dir
+
+
+def _patched(module, name, fake):
+    original = getattr(module, name)
+    setattr(module, name, fake)
+    return original
+
+
+def test_audio_retry_failed_and_carry_over():
+    """只重试失败/为空的片段；重试成功的沿用时间信息，再次失败的保留旧记录"""
+    graph = FakeGraph("audio_path", fail={"audio_2.flac"})
+    original = _patched(audio_agent, "get_audio_graph", graph)
+    tmp = Path(tempfile.mkdtemp())
+    try:
+        audio_dir = _audio_session(tmp)
+        done, skipped, _ = _reanalyze_audio(audio_dir)
+        transcripts = json.loads((audio_dir / "transcripts.json").read_text(encoding="utf-8"))
+        analyses = json.loads((audio_dir / "audio_analysis.json").read_text(encoding="utf-8"))
+    finally:
+        audio_agent.get_audio_graph = original
+        shutil.rmtree(tmp)
+
+    print(f"调用: {graph.calls}, 新分析 {done}, 跳过 {skipped}")
+    assert graph.calls == ["audio_1.flac", "audio_2.flac"]
+    assert (done, skipped) == (1, 1)
+    assert [t["transcript"] for t in transcripts] == ["你好", "新转写 audio_1.flac", ""]
+    assert (transcripts[1]["start_s"], transcripts[1]["end_s"]) == (5.0, 10.0)
+    assert "error" not in transcripts[1] and "error" not in analyses[1]
+    assert analyses[1]["audio_analysis"] == {"情绪": "平稳"} and analyses[1]["end_s"] == 10.0
+    assert transcripts[2]["audio_path"] == "old/audio_2.flac"  # 再次失败：旧记录原样保留
+
+
+def test_audio_force_keeps_old_on_failure():
+    """--force 全部重跑，失败的片段不会从结果中消失"""
+    graph = FakeGraph("audio_path", fail={"audio_0.flac"})
+    original = _patched(audio_agent, "get_audio_graph", graph)
+    tmp = Path(tempfile.mkdtemp())
+    try:
+        audio_dir = _audio_session(tmp)
+        done, skipped, merged = _reanalyze_audio(audio_dir, force=True)
+    finally:
+        audio_agent.get_audio_graph = original
+        shutil.rmtree(tmp)
+
+    assert graph.calls == ["audio_0.flac", "audio_1.flac", "audio_2.flac"]
+    assert (done, skipped) == (2, 0)
+    assert [t["transcript"] for t, _ in merged] == ["你好", "新转写 audio_1.flac", "新转写 audio_2.flac"]
+    assert [t["start_s"] for t, _ in merged] == [0.0, 5.0, 10.0]
+
+
+def test_video_retry_failed():
+    """带 error 的视频结论视同缺失并重试，成功的沿用时间信息"""
+    graph = FakeGraph("video_path")
+    original = _patched(video_agent, "get_video_graph", graph)
+    tmp = Path(tempfile.mkdtemp())
+    try:
+        video_dir = _video_session(tmp)
+        done, skipped, merged = _reanalyze_video(video_dir)
+    finally:
+        video_agent.get_video_graph = original
+        shutil.rmtree(tmp)
+
+    print(f"调用: {graph.calls}")
+    assert graph.calls == ["video_1.mp4"]
+    assert (done, skipped) == (1, 1)
+    assert merged[0]["video_analysis"]["video_analysis"] == "旧结论"
+    assert merged[1]["video_analysis"]["video_analysis"] == "新结论 video_1.mp4"
+    assert (merged[1]["start_s"], merged[1]["end_s"]) == (5.0, 10.0)
+    # 旧结果未记录分析方式：按在线默认的关键帧配置重跑，而不是上传整段视频
+    assert graph.kwargs == ONLINE_VIDEO_CONFIG and merged[1]["analysis_config"] == ONLINE_VIDEO_CONFIG
+
+
+def test_video_reuses_recorded_config():
+    """结果中记录了分析方式时，离线重分析沿用同一配置"""
+    config = {"input_mode": "keyframes", "keyframe_strategy": "motion", "num_keyframes": 5}
+    graph = FakeGraph("video_path")
+    original = _patched(video_agent, "get_video_graph", graph)
+    tmp = Path(tempfile.mkdtemp())
+    try:
+        _reanalyze_video(_video_session(tmp, config))
+    finally:
+        video_agent.get_video_graph = original
+        shutil.rmtree(tmp)
+
+    assert graph.kwargs == config
+
+
+if __name__ == "__main__":
+    print("开始测试离线批量重分析...\n")
+    test_audio_retry_failed_and_carry_over()
+    test_audio_force_keeps_old_on_failure()
+    test_video_retry_failed()
+    test_video_reuses_recorded_config()
+    print("\n离线批量重分析测试通过!")
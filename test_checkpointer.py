@@ -0,0 +1,74 @@
+# test_checkpointer.py
+"""测试 SQLite 检查点：崩溃后从最近完成的一轮继续、只保留最近 N 个检查点（不调用 API）"""
+
+import sys
+import tempfile
+from pathlib import Path
+from typing import Annotated, List, TypedDict
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from langchain_core.messages import AIMessage
+from langgraph.graph import StateGraph, START, END
+from langgraph.graph.message import add_messages
+from graph.checkpointer import SqliteCheckpointSaver
+
+
+class RoundState(TypedDict):
+    messages: Annotated[list, add_messages]
+    round: int
+    qa_pairs: List[tuple]
+
+
+def _build(crash_round: dict):
+    """assistant → tools → process 循环 4 轮，tools 在 crash_round["at"] 轮抛异常模拟进程崩溃"""
+    def assistant(state):
+        return {"messages": [AIMessage(content="问题" * 300)], "round": state["round"] + 1}
+
+    def tools(state):
+        if state["round"] == crash_round["at"]:
+            raise RuntimeError("录制中崩溃")
+        return {}
+
+    def process(state):
+        return {"qa_pairs": state["qa_pairs"] + [(f"Q{state['round']}", "A")]}
+
+    g = StateGraph(RoundState)
+    g.add_node("assistant", assistant)
+    g.add_node("tools", tools)
+    g.add_node("process", process)
+    g.add_edge(START, "assistant")
+    g.add_edge("assistant", "tools")
+    g.add_edge("tools", "process")
+    g.add_conditional_edges("process", lambda s: END if s["round"] >= 4 else "assistant")
+    return g
+
+
+def test_resume_from_last_completed_round():
+    """第 3 轮录制时崩溃，重新打开数据库后从第 2 轮结束处继续，前两轮结果保留"""
+    db = str(Path(tempfile.mkdtemp()) / "checkpoints.db")
+    config = {"configurable": {"thread_id": "interview-1"}}
+    crash = {"at": 3}
+    app = _build(crash).compile(checkpointer=SqliteCheckpointSaver(db, keep_last=6))
+    try:
+        app.invoke({"round": 0, "messages": [], "qa_pairs": []}, config)
+    except RuntimeError:
+        pass
+
+    saver = SqliteCheckpointSaver(db, keep_last=6)
+    app = _build(crash).compile(checkpointer=saver)
+    rows = saver.conn.execute("SELECT COUNT(*) FROM checkpoints").fetchone()[0]
+    print(f"崩溃后检查点数: {rows}")
+    assert rows <= 6
+
+    resume = next(s.config for s in app.get_state_history(config) if s.next == ("assistant",))
+    assert app.get_state(resume).values["round"] == 2
+    crash["at"] = None
+    final = app.invoke(None, resume)
+    print(f"继续后的问答: {final['qa_pairs']}")
+    assert [q for q, _ in final["qa_pairs"]] == ["Q1", "Q2", "Q3", "Q4"]
+
+
+if __name__ == "__main__":
+    print("开始测试检查点存储...\n")
+    test_resume_from_last_completed_round()
+    print("\n检查点存储测试通过!")
@@ -0,0 +1,75 @@
+# test_codecs.py
+"""测试音频片段编码：生成的 WAV 经 FLAC/Opus/WAV 写盘后读回，内容、韵律指标与字节统计一致"""
+
+import json
+import sys
+import tempfile
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import numpy as np
+import soundfile as sf
+
+from tools.audio_analysis import RecorderController, AUDIO_SR, AUDIO_CODECS
+from tools.sources import WavFileSource
+
+SECONDS = 6  # 一个完整 5 秒片段加 1 秒尾部
+
+
+def _tone(path: str) -> np.ndarray:
+    """200 Hz 断续音，量化到 16 位后写盘，便于与无损编码逐样本比较"""
+    t = np.arange(AUDIO_SR * SECONDS) / AUDIO_SR
+    gate = (np.floor(t * 2) % 2 == 0).astype(np.float32)
+    pcm = np.round(0.3 * np.sin(2 * np.pi * 200 * t) * gate * 32767).astype(np.int16)
+    sf.write(path, pcm, AUDIO_SR, subtype="PCM_16")
+    return pcm
+
+
+def _record(tmp: str, codec: str) -> RecorderController:
+    controller = RecorderController(codec=codec, analysis_mode="local",
+                                    source=WavFileSource(f"{tmp}/tone.wav", realtime=False),
+                                    output_dir=f"{tmp}/{codec}")
+    controller.start()
+    controller.source.finished.wait(10)
+    controller.stop()
+    return controller
+
+
+def test_codec_round_trip():
+    """FLAC/WAV 逐样本无损，Opus 时长与音高保持；raw_pcm_bytes 与磁盘字节、压缩比正确统计"""
+    with tempfile.TemporaryDirectory() as tmp:
+        pcm = _tone(f"{tmp}/tone.wav")
+        sizes = {}
+        for codec in ("wav", "flac", "opus"):
+            controller = _record(tmp, codec)
+            stats = controller.get_stats()
+            suffix = AUDIO_CODECS[codec]["suffix"]
+            paths = [Path(tmp) / codec / f"audio_{i}{suffix}" for i in range(2)]
+            analyses = json.loads((Path(tmp) / codec / "audio_analysis.json").read_text(encoding="utf-8"))
+            print(f"{codec}: {stats}")
+
+            assert stats["segments"] == 2 and stats["codec"] == codec
+            assert stats["raw_pcm_bytes"] == len(pcm) * 2
+            assert stats["bytes_on_disk"] == sum(p.stat().st_size for p in paths)
+            assert stats["compression_ratio"] == round(stats["raw_pcm_bytes"] / stats["bytes_on_disk"], 2)
+            assert stats["upload_bytes"] == 0  # local 模式不上传
+            sizes[codec] = stats["bytes_on_disk"]
+
+            decoded = np.concatenate([sf.read(str(p), dtype="int16")[0] for p in paths])
+            if codec == "opus":
+                assert abs(len(decoded) - len(pcm)) <= AUDIO_SR * 0.1
+            else:
+                assert np.array_equal(decoded, pcm)
+
+            prosody = analyses[0]["prosody"]
+            assert prosody["duration_s"] == 5.0 or codec == "opus"
+            assert abs(prosody["pitch_median_hz"] - 200) < 10
+            assert 0.3 < prosody["voiced_ratio"] < 0.7
+
+        assert sizes["flac"] < sizes["wav"] / 4 and sizes["opus"] < sizes["wav"] / 4
+
+
+if __name__ == "__main__":
+    print("开始测试音频编码...\n")
+    test_codec_round_trip()
+    print("\n音频编码测试通过!")
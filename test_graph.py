@@ -5,7 +5,12 @@ import sys
 from pathlib import Path
 sys.path.insert(0, str(Path(__file__).resolve().parent))
 
-from graph.graph import InterviewState, analyze_interview_performance
+from langchain_core.messages import AIMessage
+from langchain_core.tools import tool
+from langgraph.graph import StateGraph, START, END
+from langgraph.prebuilt import ToolNode
+
+from graph.graph import InterviewState, analyze_interview_performance, process_tool_results
 from agents.analysis_agent import InterviewAnalysisInput
 
 def test_analysis_node():
@@ -56,11 +61,43 @@ def test_analysis_node():
         print(f"分析节点测试失败: {e}")
         return False
 
+def test_tool_artifact_passthrough():
+    """ToolMessage.artifact 原样进入 structured_results，不经过 JSON 序列化往返"""
+    print("\n测试工具结果传递...")
+
+    marker = object()  # 无法 JSON 序列化，往返后必然丢失
+
+    @tool(response_format="content_and_artifact")
+    def fake_av_tool(question: str):
+        """假的音视频工具"""
+        return "本轮回答已记录", {"question": question, "audio_summary": "语音内容: 你好",
+                                 "video_summary": "", "marker": marker, "speakers": {"A", "B"}}
+
+    g = StateGraph(InterviewState)
+    g.add_node("tools", ToolNode([fake_av_tool]))
+    g.add_node("process_results", process_tool_results)
+    g.add_edge(START, "tools")
+    g.add_edge("tools", "process_results")
+    g.add_edge("process_results", END)
+    call = AIMessage(content="", tool_calls=[{"name": "fake_av_tool", "args": {"question": "请自我介绍"}, "id": "call_1"}])
+    state = g.compile().invoke({"messages": [call], "round": 2, "qa_pairs": [], "audio_summaries": [],
+                                "video_summaries": [], "structured_results": []})
+
+    result = state["structured_results"][0]
+    assert result["marker"] is marker and result["speakers"] == {"A", "B"}
+    assert result["round"] == 2
+    assert state["qa_pairs"] == [("请自我介绍", "语音内容: 你好")]
+
+    # 面试正常结束时最后一条是 AI 消息：直接返回，不更新状态
+    assert process_tool_results({"messages": [AIMessage(content="面试结束")]}) == {}
+    print("工具结果传递测试通过!")
+    return True
+
 def test_route_logic():
     """测试路由逻辑"""
     print("\n测试路由逻辑...")
     
-    from graph.graph import route_after_tools
+    from graph.graph import route_after_tools, route_after_process
     
     # 测试继续面试的路由
     state1 = {"should_continue": True, "interview_completed": False}
@@ -77,8 +114,13 @@ def test_route_logic():
     route3 = route_after_tools(state3)
     print(f"直接结束路由: {route3}")
     
-    expected_routes = ["process_results", "analyze_performance", "__end__"]
-    actual_routes = [route1, route2, route3]
+    # 最后一题的结果先经过 process_results 记录，再进入分析
+    route4 = route_after_process(state1)
+    route5 = route_after_process(state2)
+    print(f"结果处理后路由: {route4}, {route5}")
+    
+    expected_routes = ["process_results", "process_results", "__end__", "assistant", "analyze_performance"]
+    actual_routes = [route1, route2, route3, route4, route5]
     
     if actual_routes == expected_routes:
         print("路由逻辑测试通过!")
@@ -91,7 +133,10 @@ if __name__ == "__main__":
     print("开始测试graph流程...\n")
     
     success_count = 0
-    total_tests = 2
+    total_tests = 3
+    
+    if test_tool_artifact_passthrough():
+        success_count += 1
     
     if test_route_logic():
         success_count += 1
@@ -0,0 +1,40 @@
+# test_live_store.py
+"""测试实时转写存储的有序发布与订阅"""
+
+import sys
+import threading
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from tools.live_store import LiveSegmentStore
+
+
+def test_out_of_order_put():
+    """乱序写入时只发布连续前缀"""
+    store = LiveSegmentStore()
+    store.put(1, {"index": 1})
+    assert store.snapshot() == []
+    store.put(0, {"index": 0})
+    print(f"发布结果: {store.snapshot()}")
+    assert [item["index"] for item in store.snapshot()] == [0, 1]
+
+
+def test_iter_items_until_closed():
+    """订阅者在录制过程中增量收到片段，关闭后迭代结束"""
+    store = LiveSegmentStore()
+    received = []
+    reader = threading.Thread(target=lambda: received.extend(i["index"] for i in store.iter_items()))
+    reader.start()
+    for index in [2, 0, 1, 3]:
+        store.put(index, {"index": index})
+    store.close()
+    reader.join(timeout=2)
+    print(f"订阅结果: {received}")
+    assert received == [0, 1, 2, 3]
+
+
+if __name__ == "__main__":
+    print("开始测试实时转写存储...\n")
+    test_out_of_order_put()
+    test_iter_items_until_closed()
+    print("\n实时转写存储测试通过!")
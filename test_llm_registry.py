@@ -0,0 +1,48 @@
+# test_llm_registry.py
+"""测试模型客户端注册表的懒加载与线程安全（不调用 API）"""
+
+import sys
+import threading
+import time
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from agents import llm_registry
+
+
+def test_lazy_single_instance():
+    """登记时不构建；多线程同时首次获取也只构建一次"""
+    built = []
+
+    def factory():
+        time.sleep(0.05)
+        built.append(object())
+        return built[-1]
+
+    llm_registry.register("test:lazy", factory)
+    assert built == []
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(llm_registry.get("test:lazy"))) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    print(f"构建次数: {len(built)}")
+    assert len(built) == 1
+    assert all(r is built[0] for r in results)
+
+
+def test_warm_up_reports_failures():
+    """预热时单个实例构建失败不影响其他实例"""
+    llm_registry.register("test:ok", lambda: "ok")
+    llm_registry.register("test:broken", lambda: 1 / 0)
+    timings = llm_registry.warm_up(["test:ok", "test:broken"])
+    assert "test:ok" in timings and "test:broken" not in timings
+    assert llm_registry.get("test:ok") == "ok"
+
+
+if __name__ == "__main__":
+    print("开始测试模型注册表...\n")
+    test_lazy_single_instance()
+    test_warm_up_reports_failures()
+    print("\n模型注册表测试通过!")
@@ -0,0 +1,49 @@
+# test_motion_gate.py
+"""测试视频片段场景变化门控（不依赖摄像头和 API）"""
+
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import numpy as np
+from tools.motion_gate import ChangeGate, segment_signature
+
+
+def _frames(value: int, n: int = 20, noise: int = 2, seed: int = 0) -> list:
+    rng = np.random.default_rng(seed)
+    base = np.full((240, 320, 3), value, dtype=np.int16)
+    return [np.clip(base + rng.integers(-noise, noise + 1, base.shape), 0, 255).astype(np.uint8) for _ in range(n)]
+
+
+def test_static_scene_is_reused():
+    """画面几乎不变时第一个片段分析，后续片段复用"""
+    gate = ChangeGate(threshold=6.0)
+    decisions = [gate.check(segment_signature(_frames(100, seed=i)))[0] for i in range(3)]
+    print(f"是否分析: {decisions}")
+    assert decisions == [True, False, False]
+
+
+def test_scene_change_triggers_analysis():
+    """亮度/内容明显变化时重新分析，并以新片段为参考"""
+    gate = ChangeGate(threshold=6.0)
+    gate.check(segment_signature(_frames(100)))
+    changed, score = gate.check(segment_signature(_frames(160)))
+    print(f"变化分: {score:.1f}")
+    assert changed
+    assert not gate.check(segment_signature(_frames(160, seed=1)))[0]
+
+
+def test_max_reuse_forces_refresh():
+    """连续复用达到上限后强制重新分析"""
+    gate = ChangeGate(threshold=6.0, max_reuse=2)
+    decisions = [gate.check(segment_signature(_frames(100, seed=i)))[0] for i in range(5)]
+    print(f"是否分析: {decisions}")
+    assert decisions == [True, False, False, True, False]
+
+
+if __name__ == "__main__":
+    print("开始测试场景变化门控...\n")
+    test_static_scene_is_reused()
+    test_scene_change_triggers_analysis()
+    test_max_reuse_forces_refresh()
+    print("\n场景变化门控测试通过!")
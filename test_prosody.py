@@ -0,0 +1,52 @@
+# test_prosody.py
+"""测试本地韵律特征提取（不依赖 API）"""
+
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import numpy as np
+from tools.prosody import extract_prosody, describe_prosody
+
+SR = 16000
+
+
+def _syllable(f0: float, seconds: float = 0.18) -> np.ndarray:
+    t = np.arange(int(seconds * SR)) / SR
+    envelope = np.sin(np.pi * t / seconds) ** 2
+    return (0.3 * envelope * np.sin(2 * np.pi * f0 * t)).astype(np.float32)
+
+
+def _speech(f0: float, count: int) -> np.ndarray:
+    gap = np.zeros(int(0.07 * SR), dtype=np.float32)
+    return np.concatenate([np.concatenate([_syllable(f0), gap]) for _ in range(count)])
+
+
+def test_prosody_features():
+    """两句话中间一次停顿：音节数、停顿、基频都应被识别"""
+    pause = np.zeros(int(0.6 * SR), dtype=np.float32)
+    signal = np.concatenate([pause, _speech(150, 10), pause, _speech(150, 8), pause])
+    features = extract_prosody(signal, SR)
+    print(f"韵律特征: {features}")
+
+    assert features["pause_count"] == 1
+    assert abs(features["speaking_rate_sps"] * features["duration_s"] - 18) <= 2
+    assert abs(features["pitch_median_hz"] - 150) < 10
+    assert 0.3 < features["voiced_ratio"] < 0.8
+
+
+def test_continuous_tone_is_voiced():
+    """整段持续发声时不应被当成噪声"""
+    t = np.arange(SR * 2) / SR
+    features = extract_prosody((0.3 * np.sin(2 * np.pi * 200 * t)).astype(np.float32), SR)
+    print(f"持续发声: voiced_ratio={features['voiced_ratio']}, pitch={features['pitch_median_hz']}")
+    assert features["voiced_ratio"] > 0.9
+    assert abs(features["pitch_median_hz"] - 200) < 10
+    assert describe_prosody(features)["音高"].startswith("中位")
+
+
+if __name__ == "__main__":
+    print("开始测试韵律特征...\n")
+    test_prosody_features()
+    test_continuous_tone_is_voiced()
+    print("\n韵律特征测试通过!")
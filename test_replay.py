@@ -0,0 +1,80 @@
+# test_replay.py
+"""测试文件回放的完整采集与分析流水线（无设备、无显示器，VL 模型用本地假图代替）"""
+
+import json
+import sys
+import tempfile
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import cv2
+import numpy as np
+import soundfile as sf
+
+import tools.video_analysis as video_analysis
+from tools.analysis import replay_av_files
+
+SR = 16000
+SECONDS = 7  # 5 秒一段，最后留 2 秒不足一段的尾部
+
+
+class FakeVideoGraph:
+    def invoke(self, state):
+        return {"video_analysis": f"分析 {Path(state['video_path']).name}", "upload_bytes": 0}
+
+
+def _write_assets(root: Path) -> tuple[str, str]:
+    t = np.arange(SR * SECONDS) / SR
+    audio_path = root / "answer.wav"
+    sf.write(str(audio_path), (0.3 * np.sin(2 * np.pi * 200 * t)).astype(np.float32), SR)
+
+    video_path = root / "answer.mp4"
+    fps = 10
+    writer = cv2.VideoWriter(str(video_path), cv2.VideoWriter_fourcc(*"mp4v"), fps, (160, 120))
+    for i in range(fps * SECONDS):
+        frame = np.full((120, 160, 3), (i * 3) % 255, np.uint8)
+        writer.write(frame)
+    writer.release()
+    return str(audio_path), str(video_path)
+
+
+def test_replay_files():
+    """回放结果：音视频片段数与顺序正确，尾部不足一段也保留，时间轴与统计写入会话目录"""
+    original = video_analysis.get_video_graph
+    video_analysis.get_video_graph = lambda **kwargs: FakeVideoGraph()
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            audio_file, video_file = _write_assets(Path(tmp))
+            result = replay_av_files(audio_file, video_file, audio_analysis_mode="local",
+                                     output_root=f"{tmp}/session")
+
+            audio_items = json.loads((Path(result["audio_dir"]) / "audio_analysis.json").read_text(encoding="utf-8"))
+            video_items = json.loads((Path(result["video_dir"]) / "video_analysis.json").read_text(encoding="utf-8"))
+            print(f"音频片段: {[(a['start_s'], a['end_s']) for a in audio_items]}")
+            print(f"视频片段: {[(v['start_s'], v['end_s']) for v in video_items]}")
+
+            assert result["replay_stats"]["audio_segments"] == 2
+            assert [Path(a["audio_path"]).name for a in audio_items] == ["audio_0.flac", "audio_1.flac"]
+            assert len(video_items) == 2
+            for items in (audio_items, video_items):
+                starts = [item["start_s"] for item in items]
+                assert starts == sorted(starts)
+                assert all(item["end_s"] > item["start_s"] for item in items)
+            assert audio_items[-1]["end_s"] - audio_items[-1]["start_s"] < 5
+
+            timeline_path = Path(result["timeline_path"])
+            assert timeline_path.exists() and timeline_path.parent == Path(tmp) / "session"
+            records = json.loads(timeline_path.read_text(encoding="utf-8"))
+            assert records and records[-1]["audio_index"] == 1
+
+            stats = json.loads(Path(result["stats_path"]).read_text(encoding="utf-8"))
+            assert Path(result["stats_path"]).parent == timeline_path.parent
+            assert stats["audio"]["segments"] == 2 and stats["video"]["segments"] == 2
+    finally:
+        video_analysis.get_video_graph = original
+
+
+if __name__ == "__main__":
+    print("开始测试文件回放...\n")
+    test_replay_files()
+    print("\n文件回放测试通过!")
@@ -0,0 +1,63 @@
+# test_ring_buffer.py
+"""测试采集环形缓冲区（不依赖麦克风和 API）"""
+
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import numpy as np
+from tools.ring_buffer import RingBuffer
+
+
+def test_wraparound_views():
+    """跨越尾部的区间返回两段视图，内容与写入顺序一致"""
+    ring = RingBuffer(10, (1,), np.float32)
+    ring.write(np.arange(8, dtype=np.float32).reshape(-1, 1))
+    ring.release(6)
+    ring.write(np.arange(8, 14, dtype=np.float32).reshape(-1, 1))
+
+    views = ring.views(6, 14)
+    print(f"视图段数: {len(views)}")
+    assert len(views) == 2
+    assert all(np.shares_memory(v, ring.buffer) for v in views)
+    assert np.concatenate(views)[:, 0].tolist() == list(range(6, 14))
+
+
+def test_overrun_drops_new_data():
+    """缓冲区满时丢弃新数据并计数，不覆盖未释放的数据"""
+    ring = RingBuffer(4, (1,), np.float32)
+    written = ring.write(np.ones((6, 1), dtype=np.float32))
+    print(f"写入: {written}, 丢弃: {ring.overruns}")
+    assert written == 4
+    assert ring.overruns == 2
+
+
+def test_frame_items():
+    """视频帧作为条目写入：按帧计数，满时整帧丢弃"""
+    ring = RingBuffer(3, (4, 6, 3), np.uint8)
+    for i in range(5):
+        ring.write(np.full((1, 4, 6, 3), i, dtype=np.uint8))
+    frames = np.concatenate(ring.views(0, ring.write_pos))
+    print(f"保留帧: {frames[:, 0, 0, 0].tolist()}, 丢帧: {ring.overruns}")
+    assert frames[:, 0, 0, 0].tolist() == [0, 1, 2]
+    assert ring.overruns == 2
+
+
+def test_reserve_reports_free_space():
+    """reserve 返回可写行数；满时为 0，释放后恢复，生产者据此决定是否写入附属信息"""
+    ring = RingBuffer(2, (1,), np.float32)
+    assert ring.reserve() == 2
+    ring.write(np.ones((2, 1), dtype=np.float32))
+    assert ring.reserve() == 0
+    ring.release(1)
+    assert ring.reserve(1, blocking=True) == 1
+    assert ring.overruns == 0
+
+
+if __name__ == "__main__":
+    print("开始测试环形缓冲区...\n")
+    test_wraparound_views()
+    test_overrun_drops_new_data()
+    test_frame_items()
+    test_reserve_reports_free_space()
+    print("\n环形缓冲区测试通过!")
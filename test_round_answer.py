@@ -0,0 +1,96 @@
+# test_round_answer.py
+"""测试每轮返回给提问节点的回答：停止时才写出的尾部片段也已转写，视频分析仍留在后台"""
+
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import cv2
+import numpy as np
+import soundfile as sf
+
+import tools.audio_analysis as audio_analysis
+import tools.video_analysis as video_analysis
+from tools.analysis import AVSessionRegistry
+from tools.sources import WavFileSource, VideoFileSource
+from graph.av_workflow import to_round_result
+
+
+class SlowAudioGraph:
+    """每段 0.5 秒才返回转写，模拟远程音频模型"""
+
+    def invoke(self, state):
+        time.sleep(0.5)
+        return {"transcript": f"第{Path(state['audio_path']).stem.split('_')[1]}段", "audio_analysis": {}}
+
+
+class BlockedVideoGraph:
+    """直到测试放行才返回，用来确认工具结果不等待 VL 分析"""
+
+    def __init__(self):
+        self.release = threading.Event()
+
+    def invoke(self, state):
+        self.release.wait(10)
+        return {"video_analysis": "ok", "upload_bytes": 0}
+
+
+def _write_assets(root: str, seconds: float):
+    sr = audio_analysis.AUDIO_SR
+    t = np.arange(int(sr * seconds)) / sr
+    sf.write(f"{root}/answer.wav", (0.3 * np.sin(2 * np.pi * 200 * t)).astype(np.float32), sr)
+    writer = cv2.VideoWriter(f"{root}/answer.mp4", cv2.VideoWriter_fourcc(*"mp4v"), 10, (64, 48))
+    for _ in range(int(10 * seconds)):
+        writer.write(np.full((48, 64, 3), 90, np.uint8))
+    writer.release()
+
+
+def _record_round(seconds: float):
+    video_graph = BlockedVideoGraph()
+    originals = audio_analysis.get_audio_graph, video_analysis.get_video_graph
+    audio_analysis.get_audio_graph = lambda **kwargs: SlowAudioGraph()
+    video_analysis.get_video_graph = lambda **kwargs: video_graph
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            _write_assets(tmp, seconds)
+            registry = AVSessionRegistry(output_root=tmp)
+            controller = registry.start_recording(
+                "round", audio_source=WavFileSource(f"{tmp}/answer.wav", realtime=False),
+                video_source=VideoFileSource(f"{tmp}/answer.mp4", realtime=False), video_headless=True)
+            controller.wait_sources_finished(10)
+            result = registry.stop_recording("round", wait_analysis=False)
+            video_pending = not controller.video.wait_analysis(0)
+            video_graph.release.set()
+            collected = registry.collect(result["pending_id"], "round", timeout=10)
+    finally:
+        audio_analysis.get_audio_graph, video_analysis.get_video_graph = originals
+    return to_round_result("请介绍一下你自己", result), video_pending, collected
+
+
+def test_answer_includes_tail_segment():
+    """7 秒回答切成 5 秒 + 2 秒尾部，两段转写都进入本轮回答，视频分析仍在后台"""
+    round_result, video_pending, collected = _record_round(7)
+    print(f"本轮结果: {round_result}")
+    assert round_result["transcript"] == "第0段 第1段"
+    assert "第1段" in round_result["audio_summary"]
+    assert round_result["pending_id"] and video_pending
+    assert collected["transcript"] == round_result["transcript"]
+    assert collected["video_summary"]
+
+
+def test_short_answer_not_empty():
+    """不足一个片段的短回答：唯一的片段在停止时才写出，回答也不能为空"""
+    round_result, _, _ = _record_round(1.5)
+    print(f"本轮结果: {round_result}")
+    assert round_result["transcript"] == "第0段"
+    assert round_result["audio_summary"] != "语音内容: "
+
+
+if __name__ == "__main__":
+    print("开始测试每轮回答...\n")
+    test_answer_includes_tail_segment()
+    test_short_answer_not_empty()
+    print("\n每轮回答测试通过!")
@@ -0,0 +1,48 @@
+# test_sessions.py
+"""测试多会话采集注册表（不打开设备，不调用 API）"""
+
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from concurrent.futures import Future
+
+from tools.analysis import AVSessionRegistry, new_output_root
+
+
+def test_output_roots_unique():
+    """同一秒内为同一会话生成的目录也互不相同，会话 id 中的路径字符被替换"""
+    roots = {new_output_root("output", "thread/1") for _ in range(50)}
+    print(f"示例目录: {next(iter(roots))}")
+    assert len(roots) == 50
+    assert all(r.startswith("output/") and "/" not in r[len("output/"):] for r in roots)
+
+
+def test_registry_without_recording():
+    """未开始录制的会话：停止返回错误，转写为空，不占用会话表"""
+    registry = AVSessionRegistry(max_sessions=1)
+    assert registry.stop_recording("a").get("error")
+    assert registry.get_live_transcript("a") == ""
+    assert registry.collect("missing", "a").get("error")
+    registry.close("a")
+    assert registry.sessions() == []
+
+
+def test_close_releases_uncollected_pending():
+    """最后一轮的后台分析未被收集时，关闭会话也要让出并发名额"""
+    registry = AVSessionRegistry(max_sessions=1)
+    registry._entry("a", create=True).pending["p"] = Future()
+    assert registry.sessions() == ["a"]
+    registry.close("a")
+    assert registry.sessions() == []
+    assert registry.collect("p", "a").get("error")
+    registry._entry("b", create=True)
+    assert registry.sessions() == ["b"]
+
+
+if __name__ == "__main__":
+    print("开始测试多会话注册表...\n")
+    test_output_roots_unique()
+    test_registry_without_recording()
+    test_close_releases_uncollected_pending()
+    print("\n多会话注册表测试通过!")
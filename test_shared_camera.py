@@ -0,0 +1,77 @@
+# test_shared_camera.py
+"""测试整场共用的摄像头：设备只打开一次，各轮挂上/摘下读取方，下一轮不会读到上一轮积压的帧"""
+
+import sys
+import tempfile
+import time
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import cv2
+import numpy as np
+
+from tools.sources import SharedCameraSource
+
+FRAMES = 3000
+
+
+def _write_indexed_video(path: str):
+    """每帧左右两半的亮度编码帧号"""
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"FFV1"), 30, (32, 32))  # 无损编码
+    for i in range(FRAMES):
+        frame = np.zeros((32, 32, 3), np.uint8)
+        frame[:, :16] = (i % 100) * 2 + 20
+        frame[:, 16:] = (i // 100) * 8 + 10
+        writer.write(frame)
+    writer.release()
+
+
+def _index(frame: np.ndarray) -> int:
+    left, right = float(frame[8:24, 4:12].mean()), float(frame[8:24, 20:28].mean())
+    return int(round((right - 10) / 8)) * 100 + int(round((left - 20) / 2))
+
+
+def _read(camera: SharedCameraSource, n: int) -> list:
+    indices = []
+    for _ in range(n):
+        ret, frame = camera.read()
+        assert ret
+        indices.append(_index(frame))
+    return indices
+
+
+def test_attach_detach_across_rounds():
+    """两轮之间设备与读帧线程保持不变；摘下后不再积压，新一轮只读到挂上之后的帧"""
+    with tempfile.TemporaryDirectory() as tmp:
+        _write_indexed_video(f"{tmp}/camera.avi")
+        camera = SharedCameraSource(device=f"{tmp}/camera.avi", max_pending=30, read_timeout=0.5)
+        try:
+            camera.open()
+            cap, thread = camera.cap, camera._thread
+            first = _read(camera, 10)
+            camera.release()
+            assert not camera.is_opened()
+            stale = [_index(f) for f in list(camera._frames.queue)]
+            backlog = camera._frames.qsize()
+            time.sleep(0.02)
+            assert camera._frames.qsize() == backlog  # 摘下后读到的帧直接丢弃
+
+            camera.open()
+            assert camera.is_opened()
+            assert camera.cap is cap and camera._thread is thread  # 没有重新打开设备
+            second = _read(camera, 10)
+            camera.release()
+        finally:
+            camera.close()
+
+    print(f"第一轮: {first}\n第二轮: {second}\n第一轮积压: {len(stale)} 帧")
+    assert first == sorted(first) and len(set(first)) == 10
+    assert second == sorted(second) and len(set(second)) == 10
+    assert min(second) > max(first + stale)
+    assert camera.cap is None and camera._thread is None
+
+
+if __name__ == "__main__":
+    print("开始测试共用摄像头...\n")
+    test_attach_detach_across_rounds()
+    print("\n共用摄像头测试通过!")
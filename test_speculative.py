@@ -0,0 +1,94 @@
+# test_speculative.py
+"""测试提问上下文构造与作答期间预生成下一题（用假模型代替 GPT-4o，不调用 API）"""
+
+import sys
+import time
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from agents.question_agent import (SpeculativeQuestioner, InterviewDecision, build_question_context,
+                                   context_tokens)
+
+
+class FakeAgent:
+    def invoke(self, inputs):
+        answer = inputs["messages"][-1].content
+        return InterviewDecision(next_question=f"关于「{answer[-4:]}」能展开说说吗？", should_round=True)
+
+
+def _speculate(partials: list[str]) -> SpeculativeQuestioner:
+    live = {"text": ""}
+    speculator = SpeculativeQuestioner({"resume": "", "messages": []}, "请先自我介绍一下。",
+                                       lambda: live["text"], interval_s=0.02, min_new_chars=4,
+                                       agent=FakeAgent()).start()
+    for text in partials:
+        live["text"] = text
+        time.sleep(0.1)
+    return speculator
+
+
+def test_confirm_when_answer_unchanged():
+    """最终回答与预生成所用转写接近时直接采用预生成的问题"""
+    speculator = _speculate(["我在阿里做推荐系统", "我在阿里做推荐系统，负责召回模块"])
+    decision, info = speculator.finish("我在阿里做推荐系统，负责召回模块。")
+    print(f"命中: {decision}, {info}")
+    assert decision is not None and "召回模块" in decision.next_question
+    assert info["speculative_calls"] == 2
+
+
+def test_regenerate_when_answer_changed():
+    """回答后半段与预生成时差别很大，返回 None 由调用方重新生成"""
+    speculator = _speculate(["我在阿里做推荐系统"])
+    decision, info = speculator.finish("我在阿里做推荐系统。后来转去做了两年的分布式存储和数据库内核开发，主要负责事务模块。")
+    print(f"未命中: {info}")
+    assert decision is None
+    assert info["similarity"] < 0.85
+
+
+def test_context_keeps_recent_rounds_within_budget():
+    """较早轮次压成摘要，最近 K 轮保留原文，prompt 不超过预算且不随轮数线性增长"""
+    qa_pairs = [(f"第{i}个问题：请介绍项目{i}", "我负责了模型训练和线上部署。" * 40) for i in range(1, 9)]
+    state = {"resume": "姓名：Alice\n技能：Python / PyTorch", "qa_pairs": qa_pairs}
+    context = build_question_context(state, last_k=3, token_budget=100000)
+    print(f"摘要: {context['history_summary']}")
+    assert len(context["messages"]) == 6
+    assert context["history_summary"].count("\n") == 4
+
+    tight = build_question_context(state, last_k=3, token_budget=800)
+    print(f"预算 800 时 prompt tokens: {context_tokens(tight)}")
+    assert context_tokens(tight) <= 800
+    assert len(tight["messages"]) >= 2
+    assert tight["messages"][-2].content == qa_pairs[-1][0]
+
+
+def test_context_budget_fallback_order():
+    """预算逐步收紧：先把最近轮次并入摘要（至少留一轮原文），再丢弃最早的摘要行，最后截断简历"""
+    qa_pairs = [(f"问题{i}：讲讲项目{i}", f"项目{i}中我负责召回与排序。" * 20) for i in range(1, 7)]
+    state = {"resume": "工作经历：在某电商公司负责推荐系统的召回、排序与线上实验平台建设。" * 30,
+             "qa_pairs": qa_pairs}
+    full = build_question_context(state, last_k=3, token_budget=100000)
+    last_round = build_question_context({"qa_pairs": qa_pairs[-1:]}, last_k=1, token_budget=100000)
+    base = context_tokens(full) - context_tokens(last_round)  # 简历与摘要部分的大致开销
+
+    merged = build_question_context(state, last_k=3, token_budget=context_tokens(full) - 1)
+    print(f"并入摘要后: {len(merged['messages']) // 2} 轮原文, {context_tokens(merged)} tokens")
+    assert len(merged["messages"]) < 6
+    assert merged["history_summary"].count("\n") > full["history_summary"].count("\n")
+    assert merged["resume"] == state["resume"]
+
+    budget = context_tokens(last_round) + base // 2
+    truncated = build_question_context(state, last_k=3, token_budget=budget)
+    print(f"预算 {budget} 时: {context_tokens(truncated)} tokens, 简历 {len(truncated['resume'])} 字")
+    assert context_tokens(truncated) <= budget
+    assert truncated["history_summary"] == "无"
+    assert truncated["resume"].endswith("…") and len(truncated["resume"]) < len(state["resume"])
+    assert [m.content for m in truncated["messages"]] == list(qa_pairs[-1])
+
+
+if __name__ == "__main__":
+    print("开始测试预生成下一题...\n")
+    test_confirm_when_answer_unchanged()
+    test_regenerate_when_answer_changed()
+    test_context_keeps_recent_rounds_within_budget()
+    test_context_budget_fallback_order()
+    print("\n预生成下一题测试通过!")
@@ -0,0 +1,36 @@
+# test_timeline.py
+"""测试音视频片段按会话时间对齐（不依赖设备和 API）"""
+
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from tools.timeline import Timeline
+
+
+def test_aligned_records():
+    """音频 5 秒一段、视频 4 秒一段：按边界切分并合并覆盖的片段"""
+    audio = [
+        {"index": 0, "start_s": 0.0, "end_s": 5.0, "transcript": "你好", "prosody": {"voiced_ratio": 0.8}},
+        {"index": 1, "start_s": 5.0, "end_s": 10.0, "transcript": "我是候选人", "prosody": {}},
+    ]
+    video = [
+        {"index": 0, "start_s": 0.02, "end_s": 4.0, "video_analysis": {"video_analysis": "微笑"}, "visual_metrics": {}},
+        {"index": 1, "start_s": 4.0, "end_s": 8.0, "video_analysis": {"video_analysis": "专注"}, "visual_metrics": {}},
+    ]
+    timeline = Timeline.from_segments(audio, video)
+    spans = [(r["start_s"], r["end_s"], r["audio_index"], r["video_index"]) for r in timeline.records]
+    print(f"区间: {spans}")
+    # 0 与 0.02 的起点抖动被合并为同一边界
+    assert spans == [(0.0, 4.0, 0, 0), (4.0, 5.0, 0, 1), (5.0, 8.0, 1, 1), (8.0, 10.0, 1, None)]
+
+    assert timeline.at(4.5)["video_analysis"] == "专注"
+    assert timeline.at(9.0)["transcript"] == "我是候选人"
+    assert timeline.at(12.0) is None
+    assert [r["start_s"] for r in timeline.between(3.0, 6.0)] == [0.0, 4.0, 5.0]
+
+
+if __name__ == "__main__":
+    print("开始测试会话时间轴...\n")
+    test_aligned_records()
+    print("\n会话时间轴测试通过!")
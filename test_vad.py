@@ -0,0 +1,78 @@
+# test_vad.py
+"""测试 VAD 语音切分（不依赖麦克风和 API）"""
+
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import numpy as np
+from tools.vad import VADSegmenter, SilenceWatch
+
+SR = 16000
+
+
+def _tone(seconds: float, amp: float = 0.3) -> np.ndarray:
+    t = np.arange(int(seconds * SR)) / SR
+    return (amp * np.sin(2 * np.pi * 220 * t)).astype(np.float32)
+
+
+def _silence(seconds: float) -> np.ndarray:
+    return (np.random.default_rng(0).standard_normal(int(seconds * SR)) * 1e-4).astype(np.float32)
+
+
+def _run(signal: np.ndarray, block: int = 1024, **kwargs) -> list:
+    vad = VADSegmenter(sample_rate=SR, **kwargs)
+    segments = []
+    for i in range(0, len(signal), block):
+        segments.extend(vad.feed(signal[i:i + block].reshape(-1, 1)))
+    segments.extend(vad.flush())
+    return segments
+
+
+def test_split_at_pauses():
+    """两段语音之间有 1 秒停顿，应切成两段"""
+    signal = np.concatenate([_silence(1), _tone(2), _silence(1), _tone(1.5), _silence(1)])
+    segments = _run(signal)
+    print(f"切分结果: {[(s / SR, e / SR) for s, e in segments]}")
+    assert len(segments) == 2
+    assert abs(segments[0][0] / SR - 0.8) < 0.1
+    assert abs(segments[1][1] / SR - 5.7) < 0.1
+
+
+def test_drop_silence_only():
+    """纯静音和极短噪声不产生任何片段"""
+    signal = np.concatenate([_silence(3), _tone(0.1), _silence(3)])
+    segments = _run(signal)
+    print(f"静音切分结果: {segments}")
+    assert segments == []
+
+
+def test_max_segment_length():
+    """持续讲话超过上限时强制切分"""
+    segments = _run(_tone(10), max_segment_s=4.0)
+    lengths = [(e - s) / SR for s, e in segments]
+    print(f"强制切分长度: {lengths}")
+    assert len(segments) == 3
+    assert max(lengths) <= 4.0 + 0.03  # 以帧为粒度切分
+
+
+def test_silence_watch_after_answer():
+    """开口前的静音不触发；回答结束后静音达到时长只触发一次"""
+    fired = []
+    watch = SilenceWatch(1.0, lambda: fired.append(pos), sample_rate=SR)
+    signal = np.concatenate([_silence(3), _tone(2), _silence(3)])
+    block = 1600
+    for pos in range(0, len(signal), block):
+        watch.feed(signal[pos:pos + block].reshape(-1, 1))
+    print(f"静音触发位置: {[p / SR for p in fired]}")
+    assert len(fired) == 1
+    assert abs(fired[0] / SR - 5.9) < 0.15
+
+
+if __name__ == "__main__":
+    print("开始测试VAD切分...\n")
+    test_split_at_pauses()
+    test_drop_silence_only()
+    test_max_segment_length()
+    test_silence_watch_after_answer()
+    print("\nVAD切分测试通过!")
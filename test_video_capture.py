@@ -0,0 +1,122 @@
+# test_video_capture.py
+"""测试视频采集：无界面模式、低频预览与采集/分析流的分辨率和帧率上限（用 VideoFileSource 代替摄像头）"""
+
+import sys
+import tempfile
+import time
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import cv2
+import numpy as np
+
+import tools.video_analysis as video_analysis
+from tools.sources import VideoFileSource
+from tools.video_analysis import VideoController
+
+
+class FakeVideoGraph:
+    def invoke(self, state):
+        return {"video_analysis": "ok", "upload_bytes": 0}
+
+
+def _write_video(path: str, seconds: float, fps: int = 20, size=(320, 240)):
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), fps, size)
+    for i in range(int(seconds * fps)):
+        writer.write(np.full((size[1], size[0], 3), (i * 5) % 255, np.uint8))
+    writer.release()
+
+
+def _probe(path: Path) -> tuple:
+    cap = cv2.VideoCapture(str(path))
+    try:
+        return (int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+                round(cap.get(cv2.CAP_PROP_FPS)), int(cap.get(cv2.CAP_PROP_FRAME_COUNT)))
+    finally:
+        cap.release()
+
+
+def _run(controller: VideoController):
+    original = video_analysis.get_video_graph
+    video_analysis.get_video_graph = lambda **kwargs: FakeVideoGraph()
+    try:
+        controller.start()
+        controller.source.finished.wait(10)
+        controller.stop()
+    finally:
+        video_analysis.get_video_graph = original
+
+
+class _PreviewSpy:
+    """替换 cv2 的窗口函数，记录预览刷新次数而不真正打开窗口"""
+
+    def __init__(self):
+        self.shown = 0
+        self._saved = {}
+
+    def __enter__(self):
+        for name in ("imshow", "waitKey", "destroyAllWindows"):
+            self._saved[name] = getattr(cv2, name)
+        cv2.imshow = lambda *args: setattr(self, "shown", self.shown + 1)
+        cv2.waitKey = lambda ms: time.sleep(ms / 1000) or -1
+        cv2.destroyAllWindows = lambda: None
+        return self
+
+    def __exit__(self, *exc):
+        for name, func in self._saved.items():
+            setattr(cv2, name, func)
+
+
+def test_headless_captures_every_frame():
+    """headless：不启动预览线程、不调用任何窗口函数，尽快回放时不丢帧"""
+    with tempfile.TemporaryDirectory() as tmp, _PreviewSpy() as spy:
+        _write_video(f"{tmp}/in.mp4", seconds=3)
+        controller = VideoController(source=VideoFileSource(f"{tmp}/in.mp4", realtime=False), headless=True,
+                                     output_dir=f"{tmp}/video")
+        _run(controller)
+        stats = controller.get_stats()
+        threads = len(controller.video_threads)
+
+    print(f"统计: {stats}")
+    assert spy.shown == 0 and threads == 3
+    assert stats["frames_captured"] == 60 and stats["frames_dropped"] == 0
+
+
+def test_preview_rate_is_decoupled():
+    """有预览时按 preview_fps 刷新窗口，采集仍按源帧率读取全部帧"""
+    with tempfile.TemporaryDirectory() as tmp, _PreviewSpy() as spy:
+        _write_video(f"{tmp}/in.mp4", seconds=2)
+        controller = VideoController(source=VideoFileSource(f"{tmp}/in.mp4", realtime=True), headless=False,
+                                     preview_fps=5.0, output_dir=f"{tmp}/video")
+        _run(controller)
+        stats = controller.get_stats()
+
+    print(f"预览刷新 {spy.shown} 次，统计: {stats}")
+    assert 3 <= spy.shown <= 12
+    assert stats["frames_captured"] == 40
+
+
+def test_capture_and_analysis_caps():
+    """采集流按 capture_size/capture_fps 缩放抽帧，分析副本再降到 analysis_size/analysis_fps"""
+    with tempfile.TemporaryDirectory() as tmp:
+        _write_video(f"{tmp}/in.mp4", seconds=4)
+        controller = VideoController(source=VideoFileSource(f"{tmp}/in.mp4", realtime=False), headless=True,
+                                     capture_size=(160, 160), capture_fps=10,
+                                     analysis_size=(80, 80), analysis_fps=5, output_dir=f"{tmp}/video")
+        _run(controller)
+        stats = controller.get_stats()
+        archive = _probe(Path(tmp) / "video" / "video_0.mp4")
+        analysis = _probe(Path(tmp) / "video" / "video_0_analysis.mp4")
+
+    print(f"存档: {archive}, 分析副本: {analysis}, 统计: {stats}")
+    assert stats["nominal_fps"] == 10.0 and stats["frames_captured"] == 40
+    assert archive == (160, 120, 10, 40)   # 等比缩放，不超过 160x160
+    assert analysis == (80, 60, 5, 20)
+
+
+if __name__ == "__main__":
+    print("开始测试视频采集...\n")
+    test_headless_captures_every_frame()
+    test_preview_rate_is_decoupled()
+    test_capture_and_analysis_caps()
+    print("\n视频采集测试通过!")
@@ -1,14 +1,58 @@
 # tools/av_tools.py
 
 from langchain.tools import tool
-from tools.audio_analysis import RecorderController
+from tools.audio_analysis import RecorderController, AUDIO_SR
 from tools.video_analysis import VideoController
+from tools.sources import WavFileSource, VideoFileSource, SharedMicrophoneSource, SharedCameraSource
+from tools.timeline import SessionClock, Timeline
+from tools.stop_channel import StopChannel
+from tools.vad import SilenceWatch
+from pathlib import Path
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from datetime import datetime
+import json
+import re
+import uuid
 import threading
+import time
+
+# 停止录制时等待音频转写的上限（秒）：尾部片段停止时才写出，不等它转写完回答总会缺最后一段
+AUDIO_WAIT_S = 15.0
+
+
+def new_output_root(root: str = "output", session_id: str = None) -> str:
+    """
+    生成 <root>/<时间戳>[_<会话>]_<随机后缀> 目录名。
+    只用秒级时间戳时，同一秒启动的两个会话会写进同一个目录。
+    """
+    parts = [datetime.now().strftime("%Y%m%d_%H%M%S")]
+    if session_id:
+        parts.append(re.sub(r"[^0-9A-Za-z_-]+", "-", str(session_id))[:32])
+    parts.append(uuid.uuid4().hex[:6])
+    return f"{root}/{'_'.join(parts)}"
+
 
 class AVController:
-    def __init__(self):
-        self.audio = RecorderController()
-        self.video = VideoController()
+    def __init__(self, audio_segment_mode: str = "fixed", audio_workers: int = 4, audio_codec: str = "flac",
+                 audio_analysis_mode: str = "full", audio_source=None, video_source=None,
+                 video_headless: bool = False, video_workers: int = 3,
+                 video_capture_size: tuple = (1280, 720), video_capture_fps: float = None,
+                 output_root: str = None, clock=None):
+        # 音视频共用一个时钟，片段的 start_s/end_s 可以直接对齐
+        self.clock = clock or SessionClock()
+        # 音视频写进同一个会话目录，未指定时生成不会与其他会话冲突的目录
+        output_root = output_root or new_output_root()
+        self.audio = RecorderController(segment_mode=audio_segment_mode, analysis_workers=audio_workers,
+                                        codec=audio_codec, analysis_mode=audio_analysis_mode,
+                                        source=audio_source,
+                                        output_dir=f"{output_root}/audio",
+                                        clock=self.clock)
+        self.video = VideoController(source=video_source, headless=video_headless,
+                                     analysis_workers=video_workers,
+                                     capture_size=video_capture_size, capture_fps=video_capture_fps,
+                                     output_dir=f"{output_root}/video",
+                                     clock=self.clock)
+        self.timeline = None
         self.threads = []
 
     def start(self):
@@ -18,37 +62,405 @@ class AVController:
         t_video.start()
         self.threads = [t_audio, t_video]
 
-    def stop(self):
-        audio_path = self.audio.stop()
-        video_path = self.video.stop()
+    def stop(self, wait_analysis: bool = True, audio_timeout: float = AUDIO_WAIT_S) -> dict:
+        """
+        结束采集。wait_analysis=False 时只等待音频转写（最多 audio_timeout 秒）就返回：
+        停止时才写出的尾部片段也已转写，下一题能看到完整回答；VL 视频分析留在后台，
+        "pending" 为 Future，全部完成后得到与 wait_analysis=True 相同的完整结果。
+        """
+        self.video.exit_flag.set()  # 音视频同时停止采集
+        audio_path = self.audio.stop(wait_analysis=False)
+        video_path = self.video.stop(wait_analysis=False)
         for t in self.threads:
             t.join()
+        if wait_analysis:
+            return self._collect_results()
 
+        audio_done = self.audio.wait_analysis(audio_timeout)
+        if not audio_done:
+            print(f"⚠️ 音频转写 {audio_timeout}s 内未完成，本轮回答先用已完成的部分")
+
+        pending = Future()
+
+        def collect():
+            try:
+                pending.set_result(self._collect_results())
+            except Exception as e:
+                pending.set_exception(e)
+
+        threading.Thread(target=collect, daemon=True).start()
+        transcript = self.get_live_transcript()
         return {
             "audio_dir": audio_path,
             "video_dir": video_path,
+            "transcript": transcript,
+            "audio_summary": self.audio.get_summary() if audio_done else f"语音内容: {transcript}",
+            "audio_complete": audio_done,
+            "video_summary": "",
+            "analysis_pending": True,
+            "pending": pending,
+        }
+
+    def _collect_results(self) -> dict:
+        """等待音视频分析线程结束并汇总结果"""
+        self.audio.wait_analysis()
+        self.video.wait_analysis()
+        self.timeline = Timeline.from_segments(self.audio.transcripts.snapshot(), self.video.results.snapshot())
+        session_dir = Path(self.audio.output_dir).parent
+        timeline_path = session_dir / "timeline.json"
+        self.timeline.save(timeline_path)
+        # 采集与分析统计与时间轴放在同一会话目录，面试状态里只保留路径
+        audio_stats, video_stats = self.audio.get_stats(), self.video.get_stats()
+        stats_path = session_dir / "stats.json"
+        with open(stats_path, "w", encoding="utf-8") as f:
+            json.dump({"audio": audio_stats, "video": video_stats}, f, ensure_ascii=False, indent=2)
+        return {
+            "audio_dir": str(self.audio.output_dir),
+            "video_dir": str(self.video.output_dir),
+            "timeline_path": str(timeline_path),
+            "stats_path": str(stats_path),
+            "transcript": self.get_live_transcript(),
             "audio_summary": self.audio.get_summary(),
-            "video_summary": self.video.get_summary()
+            "video_summary": self.video.get_summary(),
+            "audio_stats": audio_stats,
+            "video_stats": video_stats,
+            "visual_metrics": self.video.get_visual_metrics(),
         }
 
-global_av_controller = None
+    def get_live_transcript(self) -> str:
+        """录制进行中即可读取已完成分析的转写文本"""
+        return self.audio.get_live_transcript()
+
+    def wait_sources_finished(self, timeout: float = None) -> bool:
+        """文件回放时等待音视频源都读完"""
+        done_audio = self.audio.source.finished.wait(timeout)
+        done_video = self.video.source.finished.wait(timeout)
+        return done_audio and done_video
+
+class AVSession:
+    """
+    整场面试共用一套持续打开的麦克风和摄像头，省去每轮 1-3 秒的设备预热。
+    每轮只是在连续流上的一对开始/暂停标记：start_round 挂上新的 AVController，
+    stop_round 摘下并返回该轮结果，轮与轮之间的音视频直接丢弃。
+    """
+
+    def __init__(self, output_root: str = "output", session_id: str = None, **controller_options):
+        self.session_id = session_id
+        # 各轮目录为 <会话前缀>_r<n>，前缀带随机后缀，并发会话互不覆盖
+        self.output_prefix = new_output_root(output_root, session_id)
+        self.controller_options = controller_options
+        self.microphone = SharedMicrophoneSource(sample_rate=AUDIO_SR)
+        # 摄像头整场只打开一次，按会话级的采集参数向设备请求分辨率与帧率
+        capture_size = controller_options.get("video_capture_size", (1280, 720))
+        self.camera = SharedCameraSource(
+            width=capture_size[0] if capture_size else None,
+            height=capture_size[1] if capture_size else None,
+            fps=controller_options.get("video_capture_fps"),
+        )
+        self.controller = None
+        self.rounds = []  # 每轮的开始/结束时间（会话时钟秒数）
+        self.clock = None
+
+    def open(self):
+        """打开设备，面试开始时调用一次"""
+        t0 = time.monotonic()
+        self.microphone.open()
+        self.camera.start()
+        self.clock = SessionClock()
+        print(f"🎙️🎥 设备已就绪，耗时 {self.clock.t0 - t0:.2f}s")
+        return self
+
+    def start_round(self, **options) -> "AVController":
+        """开始新一轮；options 覆盖本轮的 AVController 参数（如 audio_segment_mode）"""
+        if self.clock is None:
+            self.open()
+        if self.controller is not None:
+            raise RuntimeError("上一轮录制尚未结束")
+        n = len(self.rounds) + 1
+        # 与单轮录制相同的 output/<会话>_r<n>/{audio,video} 结构，批量重分析可直接识别
+        self.controller = AVController(
+            audio_source=self.microphone,
+            video_source=self.camera,
+            output_root=f"{self.output_prefix}_r{n}",
+            clock=self.clock,
+            **{**self.controller_options, **options},
+        )
+        self.rounds.append({"round": n, "start_s": round(self.clock.now(), 3), "end_s": None})
+        self.controller.start()
+        return self.controller
+
+    def stop_round(self, wait_analysis: bool = True) -> dict:
+        if self.controller is None:
+            return {"error": "当前没有正在采集的任务"}
+        result = self.controller.stop(wait_analysis=wait_analysis)
+        self.controller = None
+        self.rounds[-1]["end_s"] = round(self.clock.now(), 3)
+        result["round"] = dict(self.rounds[-1])
+        return result
+
+    def get_live_transcript(self) -> str:
+        return self.controller.get_live_transcript() if self.controller else ""
+
+    def close(self):
+        """面试结束时关闭设备；仍在录制的轮次会先被结束"""
+        if self.controller is not None:
+            self.stop_round()
+        self.microphone.close()
+        self.camera.close()
+        self.clock = None
+
+
+DEFAULT_SESSION = "default"
+
+
+class _SessionEntry:
+    """一个会话的采集状态：持续打开设备的 AVSession，或单轮独立打开设备的 AVController"""
+
+    def __init__(self, session_id: str, options: dict):
+        self.session_id = session_id
+        self.options = options
+        self.session = None
+        self.controller = None
+        self.pending = {}  # pending_id -> Future，由 collect 取回
+        self.stop_channel = None  # 当前轮的停止信号
+        self.lock = threading.Lock()
+
+    @property
+    def active_controller(self):
+        if self.controller is not None:
+            return self.controller
+        return self.session.controller if self.session is not None else None
+
+    @property
+    def recording(self) -> bool:
+        return self.active_controller is not None
+
+
+class AVSessionRegistry:
+    """
+    按 session_id（即 LangGraph 的 thread_id）隔离的采集会话表，一个进程可同时进行多场面试。
+    max_sessions: 同时存在的会话数上限
+    max_pending: 每个会话中尚未收集的后台分析数上限，超出时 stop 改为等待分析完成
+    session_options: 每个会话的默认 AVController 参数，如 audio_workers / video_workers 限制单场面试占用的线程
+    """
+
+    def __init__(self, max_sessions: int = 8, max_pending: int = 16, output_root: str = "output",
+                 **session_options):
+        self.max_sessions = max_sessions
+        self.max_pending = max_pending
+        self.output_root = output_root
+        self.session_options = session_options
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def _entry(self, session_id: str, create: bool = False, **options) -> _SessionEntry:
+        with self._lock:
+            entry = self._entries.get(session_id)
+            if entry is None and create:
+                if len(self._entries) >= self.max_sessions:
+                    raise RuntimeError(f"并发会话数已达上限 {self.max_sessions}")
+                entry = _SessionEntry(session_id, {**self.session_options, **options})
+                self._entries[session_id] = entry
+            return entry
 
+    def sessions(self) -> list[str]:
+        with self._lock:
+            return list(self._entries)
 
-def start_av_recording() -> str:
-    """启动音视频采集"""
-    global global_av_controller
-    global_av_controller = AVController()
-    global_av_controller.start()
+    def open(self, session_id: str = DEFAULT_SESSION, **options) -> AVSession:
+        """为会话打开一套持续使用的设备；已打开时直接返回"""
+        entry = self._entry(session_id, create=True, **options)
+        with entry.lock:
+            if entry.session is None:
+                entry.session = AVSession(output_root=self.output_root, session_id=session_id,
+                                          **entry.options).open()
+            return entry.session
+
+    def close(self, session_id: str = DEFAULT_SESSION):
+        """
+        关闭会话的设备并移出会话表。未收集的后台分析随之丢弃（分析线程仍会把结果写入输出目录），
+        需要这些结果时应先 collect 再 close
+        """
+        entry = self._entry(session_id)
+        if entry is None:
+            return
+        with entry.lock:
+            if entry.controller is not None:
+                entry.controller.stop()
+                entry.controller = None
+            if entry.session is not None:
+                entry.session.close()
+                entry.session = None
+            if entry.pending:
+                print(f"⚠️ 会话 {session_id} 关闭时仍有 {len(entry.pending)} 个分析未收集，已丢弃")
+                entry.pending.clear()
+        self._release_if_idle(entry)
+
+    def start_recording(self, session_id: str = DEFAULT_SESSION, silence_stop_s: float = None,
+                        **options) -> AVController:
+        """
+        开始本会话的一轮采集。会话已 open 时复用其设备，
+        否则本轮单独打开设备；options 可传 audio_source/video_source 用文件或流代替本机设备。
+        silence_stop_s: 候选人开口后连续静音超过该秒数时，向本轮停止通道发出 "silence" 信号
+        """
+        entry = self._entry(session_id, create=True)
+        with entry.lock:
+            if entry.recording:
+                raise RuntimeError(f"会话 {session_id} 上一轮录制尚未结束")
+            channel = entry.stop_channel = StopChannel()
+            if entry.session is not None:
+                controller = entry.session.start_round(**options)
+            else:
+                controller = entry.controller = AVController(
+                    output_root=new_output_root(self.output_root, session_id), **{**entry.options, **options})
+                controller.start()
+            if silence_stop_s:
+                controller.audio.silence_watch = SilenceWatch(
+                    silence_stop_s, lambda: channel.signal("silence"), sample_rate=AUDIO_SR,
+                    threshold_db=controller.audio.vad_options.get("threshold_db", -45.0))
+            return controller
+
+    def stop_channel(self, session_id: str = DEFAULT_SESSION):
+        """当前轮的停止通道；会话未在录制时返回 None"""
+        entry = self._entry(session_id)
+        return entry.stop_channel if entry is not None and entry.recording else None
+
+    def request_stop(self, session_id: str = DEFAULT_SESSION, reason: str = "external") -> bool:
+        """请求结束当前轮：唤醒等待停止信号的一方，由其调用 stop_recording 收尾"""
+        channel = self.stop_channel(session_id)
+        return channel.signal(reason) if channel is not None else False
+
+    def stop_recording(self, session_id: str = DEFAULT_SESSION, wait_analysis: bool = True) -> dict:
+        entry = self._entry(session_id)
+        if entry is None:
+            return {"error": "当前没有正在采集的任务"}
+        with entry.lock:
+            if not entry.recording:
+                return {"error": "当前没有正在采集的任务"}
+            # 待收集的分析过多时退回同步等待，避免单个会话无限堆积后台任务
+            wait_analysis = wait_analysis or len(entry.pending) >= self.max_pending
+            # 直接调用 stop 时同样唤醒仍在等待停止信号的一方
+            entry.stop_channel.signal("stopped")
+            if entry.session is not None and entry.session.controller is not None:
+                result = entry.session.stop_round(wait_analysis=wait_analysis)
+            else:
+                result = entry.controller.stop(wait_analysis=wait_analysis)
+                entry.controller = None
+
+            pending = result.pop("pending", None)
+            if pending is not None:
+                pending_id = uuid.uuid4().hex
+                entry.pending[pending_id] = pending
+                result["pending_id"] = pending_id
+        self._release_if_idle(entry)
+        return result
+
+    def get_live_transcript(self, session_id: str = DEFAULT_SESSION) -> str:
+        entry = self._entry(session_id)
+        if entry is None:
+            return ""
+        controller = entry.active_controller
+        return controller.get_live_transcript() if controller else ""
+
+    def collect(self, pending_id: str, session_id: str = DEFAULT_SESSION, timeout: float = None) -> dict:
+        """取回 stop_recording(wait_analysis=False) 之后仍在进行的分析结果，阻塞至完成或超时"""
+        entry = self._entry(session_id)
+        pending = entry.pending.get(pending_id) if entry else None
+        if pending is None:
+            return {"error": f"未找到待收集的分析任务: {pending_id}"}
+        try:
+            result = pending.result(timeout)
+        except FutureTimeoutError:
+            return {"error": f"分析任务 {pending_id} 尚未完成"}
+        except Exception as e:
+            result = {"error": f"分析任务失败: {e}"}
+        with entry.lock:
+            entry.pending.pop(pending_id, None)
+        self._release_if_idle(entry)
+        return result
+
+    def _release_if_idle(self, entry: _SessionEntry):
+        """没有打开的设备、正在录制的轮次和待收集的分析时，释放会话表中的位置"""
+        with entry.lock:
+            idle = entry.session is None and entry.controller is None and not entry.pending
+        if idle:
+            with self._lock:
+                if self._entries.get(entry.session_id) is entry:
+                    self._entries.pop(entry.session_id)
+
+
+av_sessions = AVSessionRegistry()
+
+
+def open_av_session(session_id: str = DEFAULT_SESSION, **options) -> AVSession:
+    """面试开始时打开一次设备，之后本会话每轮 start/stop_av_recording 复用"""
+    return av_sessions.open(session_id, **options)
+
+
+def close_av_session(session_id: str = DEFAULT_SESSION):
+    av_sessions.close(session_id)
+
+
+def replay_av_files(audio_file: str, video_file: str, realtime: bool = False, **options) -> dict:
+    """
+    用已有的 WAV/MP4 文件代替麦克风和摄像头跑完整条采集与分析流水线。
+    realtime=False 时尽快推送，可在无设备的 CI 机器上测吞吐。默认不打开预览窗口。
+    """
+    options.setdefault("video_headless", True)
+    controller = AVController(
+        audio_source=WavFileSource(audio_file, realtime=realtime),
+        video_source=VideoFileSource(video_file, realtime=realtime),
+        **options
+    )
+    t0 = time.monotonic()
+    controller.start()
+    controller.wait_sources_finished()
+    capture_s = time.monotonic() - t0
+    result = controller.stop()
+    total_s = time.monotonic() - t0
+
+    stats = result.get("audio_stats", {})
+    result["replay_stats"] = {
+        "capture_seconds": round(capture_s, 2),
+        "total_seconds": round(total_s, 2),
+        "audio_segments": stats.get("segments", 0),
+        "segments_per_second": round(stats.get("segments", 0) / total_s, 2) if total_s else 0.0,
+    }
+    print(f"[回放] 完成: {result['replay_stats']}")
+    return result
+
+
+def start_av_recording(audio_segment_mode: str = "fixed", session_id: str = DEFAULT_SESSION,
+                       silence_stop_s: float = None) -> str:
+    """
+    启动音视频采集；audio_segment_mode="vad" 时按语音停顿切分音频。
+    会话已通过 open_av_session 打开时复用其设备，否则本轮单独打开设备。
+    silence_stop_s 非空时，回答后连续静音该秒数即通过停止通道请求结束本轮。
+    """
+    av_sessions.start_recording(session_id, silence_stop_s=silence_stop_s, audio_segment_mode=audio_segment_mode)
     return "🎙️🎥 正在采集音视频..."
 
-def stop_av_recording() -> dict:
+def get_stop_channel(session_id: str = DEFAULT_SESSION):
+    """会话当前轮的 StopChannel，未在录制时返回 None"""
+    return av_sessions.stop_channel(session_id)
+
+def request_av_stop(session_id: str = DEFAULT_SESSION, reason: str = "external") -> bool:
+    """从任意线程或接口请求结束会话的当前轮录制"""
+    return av_sessions.request_stop(session_id, reason)
+
+def get_live_transcript(session_id: str = DEFAULT_SESSION) -> str:
+    """会话当前采集任务到目前为止的转写文本（无任务时返回空串）"""
+    return av_sessions.get_live_transcript(session_id)
+
+def stop_av_recording(wait_analysis: bool = True, session_id: str = DEFAULT_SESSION) -> dict:
+    """
+    停止音视频采集并返回分析结果摘要。
+    wait_analysis=False 时采集结束即返回，结果带 pending_id，完整分析稍后用 collect_av_analysis 取回
+    """
     print("🟥 stop_record 节点被触发")
-    """停止音视频采集并返回分析结果摘要"""
-    global global_av_controller
-    if global_av_controller:
-        result = global_av_controller.stop()
-        return result
-    else:
-        return {
-            "error": "当前没有正在采集的任务"
-        }
+    return av_sessions.stop_recording(session_id, wait_analysis=wait_analysis)
+
+
+def collect_av_analysis(pending_id: str, timeout: float = None, session_id: str = DEFAULT_SESSION) -> dict:
+    """取回 stop_av_recording(wait_analysis=False) 之后仍在进行的分析结果，阻塞至完成或超时"""
+    return av_sessions.collect(pending_id, session_id, timeout)
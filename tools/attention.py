@@ -0,0 +1,129 @@
+# tools/attention.py
+"""本地视觉注意力指标：用 OpenCV 自带的人脸/人眼级联检测抽样帧，统计在镜比例、头部移动与视线偏离"""
+import cv2
+import numpy as np
+
+from tools.keyframes import _get_face_cascade
+
+_eye_cascade = None
+
+
+def _get_eye_cascade():
+    """OpenCV 自带的人眼 Haar 级联；不可用时返回 None"""
+    global _eye_cascade
+    if _eye_cascade is None:
+        try:
+            _eye_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + "haarcascade_eye.xml")
+        except AttributeError as e:
+            print(f"人眼检测器不可用: {e}")
+            _eye_cascade = False
+    return _eye_cascade or None
+
+
+def _largest_face(cascade, gray: np.ndarray):
+    faces = cascade.detectMultiScale(gray, scaleFactor=1.1, minNeighbors=4, minSize=(40, 40))
+    if len(faces) == 0:
+        return None
+    return max(faces, key=lambda f: f[2] * f[3])
+
+
+def _eyes_visible(cascade, gray: np.ndarray, face) -> bool:
+    """在人脸上半部分找到两只眼睛视为正视镜头"""
+    x, y, w, h = face
+    roi = gray[y:y + h // 2 + h // 8, x:x + w]
+    eyes = cascade.detectMultiScale(roi, scaleFactor=1.1, minNeighbors=5, minSize=(max(8, w // 8),) * 2)
+    return len(eyes) >= 2
+
+
+def extract_attention(frames: list, fps: float) -> dict:
+    """
+    frames: 按时间顺序抽样的 BGR 帧，fps 为抽样后的帧率。
+    face_present_ratio: 检测到正脸的帧比例
+    gaze_away_ratio: 有正脸但看不到双眼（低头、侧视、闭眼）的帧占有脸帧的比例，一帧人脸都没有时为 None
+    head_movement: 相邻有脸帧之间人脸中心位移，以脸宽为单位折算到每秒
+    级联检测器不可用时返回空字典。
+    """
+    face_cascade, eye_cascade = _get_face_cascade(), _get_eye_cascade()
+    if face_cascade is None or eye_cascade is None or not frames:
+        return {}
+
+    present = away = 0
+    moves = []
+    prev = None  # 上一个有脸帧的 (下标, 中心, 脸宽)
+    for i, frame in enumerate(frames):
+        gray = cv2.equalizeHist(cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY))
+        face = _largest_face(face_cascade, gray)
+        if face is None:
+            continue
+        present += 1
+        if not _eyes_visible(eye_cascade, gray, face):
+            away += 1
+        x, y, w, h = face
+        center = np.array([x + w / 2, y + h / 2])
+        if prev is not None:
+            gap_s = (i - prev[0]) / fps
+            moves.append(float(np.linalg.norm(center - prev[1])) / ((w + prev[2]) / 2) / gap_s)
+        prev = (i, center, w)
+
+    n = len(frames)
+    return {
+        "frames_sampled": n,
+        "face_present_ratio": round(present / n, 3),
+        "gaze_away_ratio": round(away / present, 3) if present else None,
+        "head_movement": round(float(np.mean(moves)), 3) if moves else 0.0,
+        "head_movement_max": round(float(np.max(moves)), 3) if moves else 0.0,
+    }
+
+
+def extract_attention_file(video_path: str, sample_fps: float = 5.0) -> dict:
+    """按 sample_fps 抽帧读取视频片段并计算注意力指标"""
+    cap = cv2.VideoCapture(str(video_path))
+    try:
+        fps = cap.get(cv2.CAP_PROP_FPS) or sample_fps
+        step = max(1, int(round(fps / sample_fps)))
+        frames, i = [], 0
+        while True:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            if i % step == 0:
+                frames.append(frame)
+            i += 1
+    finally:
+        cap.release()
+    return extract_attention(frames, fps / step)
+
+
+def aggregate_attention(metrics: list[dict]) -> dict:
+    """按抽样帧数加权合并多个片段的指标"""
+    metrics = [m for m in metrics if m and m.get("frames_sampled")]
+    if not metrics:
+        return {}
+    frames = np.array([m["frames_sampled"] for m in metrics], dtype=float)
+    face_frames = frames * np.array([m["face_present_ratio"] for m in metrics])
+    face_total = face_frames.sum()
+
+    def face_weighted(key, empty=0.0):
+        if not face_total:
+            return empty
+        # 无人脸片段的权重为 0，其 None 值不影响结果
+        return round(float(np.dot(face_frames, [m[key] or 0.0 for m in metrics]) / face_total), 3)
+
+    return {
+        "frames_sampled": int(frames.sum()),
+        "face_present_ratio": round(float(face_total / frames.sum()), 3),
+        "gaze_away_ratio": face_weighted("gaze_away_ratio", empty=None),
+        "head_movement": face_weighted("head_movement"),
+        "head_movement_max": max(m["head_movement_max"] for m in metrics),
+    }
+
+
+def describe_attention(metrics: dict) -> dict:
+    """把数值指标整理成与 video_analysis 同风格的中文描述"""
+    if not metrics or not metrics.get("frames_sampled"):
+        return {}
+    return {
+        "人脸在镜": f"{metrics['face_present_ratio']:.0%}",
+        "视线偏离": "未检测到人脸" if metrics["gaze_away_ratio"] is None else f"{metrics['gaze_away_ratio']:.0%}",
+        "头部移动": f"平均 {metrics['head_movement']:.2f} 脸宽/秒，最大 {metrics['head_movement_max']:.2f}",
+    }
@@ -1,86 +1,258 @@
 # audio_analysis.py
-import sounddevice as sd
 import soundfile as sf
 import numpy as np
 import threading
 import queue
 import time
+from concurrent.futures import ThreadPoolExecutor
 import json
 from pathlib import Path
 from datetime import datetime
 import sys
 sys.path.append(str(Path(__file__).resolve().parent.parent))
 
-from agents.audio_agent import build_audio_graph
+from agents.audio_agent import get_audio_graph
+from tools.vad import VADSegmenter
+from tools.ring_buffer import RingBuffer
+from tools.live_store import LiveSegmentStore
+from tools.prosody import extract_prosody_file, describe_prosody
+from tools.sources import MicrophoneSource
+from tools.timeline import SessionClock
+
+AUDIO_SR = 16000
+CHUNK_DURATION = 5
+
+# 片段编码方式：FLAC 无损压缩为默认，Opus 有损但体积最小，WAV 保留兼容
+AUDIO_CODECS = {
+    "wav": {"format": "WAV", "subtype": "PCM_16", "suffix": ".wav"},
+    "flac": {"format": "FLAC", "subtype": "PCM_16", "suffix": ".flac"},
+    "opus": {"format": "OGG", "subtype": "OPUS", "suffix": ".ogg"},
+}
 
 class RecorderController:
-    def __init__(self):
+    def __init__(self, segment_mode: str = "fixed", vad_options: dict = None, ring_seconds: int = 30,
+                 analysis_workers: int = 4, codec: str = "flac", analysis_mode: str = "full", source=None,
+                 output_dir: str = None, clock=None):
+        """
+        segment_mode: "fixed" 每 5 秒切一段；"vad" 按语音活动在自然停顿处切分，丢弃纯静音
+        vad_options: 透传给 VADSegmenter 的参数（阈值、最短静音时长等）
+        ring_seconds: 采集环形缓冲区容量（秒），写盘线程落后超过该时长才会丢数据
+        analysis_workers: 并发调用音频 agent 的线程数
+        codec: 片段编码格式，可选 "flac"（默认）/ "opus" / "wav"
+        analysis_mode: "full" 远程完整分析；"transcript" 远程只做转写和情绪，表达指标用本地韵律特征；
+                       "local" 不调用远程模型，只输出本地韵律特征
+        source: 音频源，默认麦克风；传入 WavFileSource 可回放已有录音
+        output_dir: 片段与结果的输出目录，默认 output/<时间戳>/audio
+        clock: 会话时钟（SessionClock），与视频共用时片段的 start_s/end_s 可直接对齐
+        """
+        if codec not in AUDIO_CODECS:
+            raise ValueError(f"不支持的音频编码: {codec}，可选 {list(AUDIO_CODECS)}")
+        self.segment_mode = segment_mode
+        self.vad_options = vad_options or {}
+        self.ring_seconds = ring_seconds
+        self.analysis_workers = max(1, analysis_workers)
+        self.codec = codec
+        self.analysis_mode = analysis_mode
+        self.source = source or MicrophoneSource(sample_rate=AUDIO_SR)
+        self.clock = clock or SessionClock()
+        self._stream_t0 = None  # 第 0 个采样对应的会话时间
+        self.silence_watch = None  # 可选的 SilenceWatch，在采集回调中判断回答是否结束
         self.exit_flag = threading.Event()
         self.audio_queue = queue.Queue()
         self.recording_threads = []
+        self.analysis_thread = None
+        self.ring = None
+        self.transcripts = LiveSegmentStore()
+        self.stats = {
+            "input_overflows": 0, "ring_overruns": 0, "segments": 0,
+            "codec": codec, "raw_pcm_bytes": 0, "bytes_on_disk": 0, "upload_bytes": 0,
+        }
+        self._stats_lock = threading.Lock()
         self.timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        self.output_dir = Path(f"output/{self.timestamp}/audio")
+        self.output_dir = Path(output_dir or f"output/{self.timestamp}/audio")
         self.output_dir.mkdir(parents=True, exist_ok=True)
 
     def audio_stream_worker(self):
-        AUDIO_SR = 16000
-        CHUNK_DURATION = 5
-        AUDIO_FRAME_COUNT = AUDIO_SR * CHUNK_DURATION
-        idx = 0
-        current_audio = []
-        accumulated_frames = 0
+        """采集线程：音频源回调只把数据拷进环形缓冲区"""
+
+        # 非实时回放时允许回调等待写盘线程，避免尽快推送把缓冲区撑爆丢数据
+        blocking = not getattr(self.source, "realtime", True)
 
         def callback(indata, frames, time_info, status):
-            nonlocal current_audio, idx, accumulated_frames
-            current_audio.append(indata.copy())
-            accumulated_frames += frames
-
-            if accumulated_frames >= AUDIO_FRAME_COUNT:
-                audio_chunk = np.concatenate(current_audio, axis=0)
-                audio_path = self.output_dir / f"audio_{idx}.wav"
-                sf.write(str(audio_path), audio_chunk, AUDIO_SR)
-                self.audio_queue.put(str(audio_path))
-                print(f"[录音线程] 保存音频：{audio_path}")
-                current_audio.clear()
-                accumulated_frames = 0
-                idx += 1
+            if self._stream_t0 is None:
+                # 片段时间按采样数推算，锚定在第一个回调块的起点；
+                # 麦克风回调在块录完后触发，文件回放则在推送前触发
+                latency = frames / AUDIO_SR if isinstance(self.source, MicrophoneSource) else 0.0
+                self._stream_t0 = self.clock.now() - latency
+            if status.input_overflow:
+                self.stats["input_overflows"] += 1
+            self.ring.write(indata, blocking=blocking)
+            watch = self.silence_watch
+            if watch is not None:
+                watch.feed(indata)
 
         print("[录音线程] 启动")
-        with sd.InputStream(samplerate=AUDIO_SR, channels=1, callback=callback):
-            while not self.exit_flag.is_set():
-                time.sleep(0.1)
-        print("[录音线程] 停止")
-        self.audio_queue.put("DONE")
+        try:
+            with self.source.stream(callback):
+                # 实时设备等待停止信号；文件回放读完即结束采集
+                while not self.exit_flag.is_set() and not self.source.finished.is_set():
+                    time.sleep(0.1)
+        finally:
+            self.ring.close()
+            print("[录音线程] 停止")
+
+    def _save_segment(self, idx: int, start: int, end: int) -> str:
+        """从环形缓冲区切出 [start, end) 并逐段编码写盘，不拼接数组"""
+        codec = AUDIO_CODECS[self.codec]
+        audio_path = self.output_dir / f"audio_{idx}{codec['suffix']}"
+        with sf.SoundFile(str(audio_path), "w", samplerate=AUDIO_SR, channels=1,
+                          format=codec["format"], subtype=codec["subtype"]) as f:
+            for view in self.ring.views(start, end):
+                f.write(view)
+        with self._stats_lock:
+            self.stats["segments"] += 1
+            self.stats["raw_pcm_bytes"] += (end - start) * 2
+            self.stats["bytes_on_disk"] += audio_path.stat().st_size
+        print(f"[写盘线程] 保存音频：{audio_path}")
+        return str(audio_path)
+
+    def segment_writer_worker(self):
+        """写盘线程：从环形缓冲区切分片段、编码并送入分析队列"""
+        AUDIO_FRAME_COUNT = AUDIO_SR * CHUNK_DURATION
+        ring = self.ring
+        segmenter = VADSegmenter(sample_rate=AUDIO_SR, **self.vad_options) if self.segment_mode == "vad" else None
+        idx = 0
+        seen = 0      # 已观察到的写入位置
+        consumed = 0  # 已交给切分逻辑的样本位置
+
+        def emit(start, end):
+            nonlocal idx
+            self.audio_queue.put({
+                "audio_path": self._save_segment(idx, start, end),
+                "start_s": round(self._stream_t0 + start / AUDIO_SR, 3),
+                "end_s": round(self._stream_t0 + end / AUDIO_SR, 3),
+            })
+            idx += 1
+
+        print("[写盘线程] 启动")
+        try:
+            while True:
+                ring.wait(seen, timeout=0.1)
+                available = ring.write_pos
+                if available == seen and ring.closed:
+                    break
+                seen = available
+
+                if segmenter is None:
+                    while available - consumed >= AUDIO_FRAME_COUNT:
+                        emit(consumed, consumed + AUDIO_FRAME_COUNT)
+                        consumed += AUDIO_FRAME_COUNT
+                        ring.release(consumed)
+                    continue
+
+                segments = []
+                for view in ring.views(consumed, available):
+                    segments.extend(segmenter.feed(view))
+                consumed = available
+                for start, end in segments:
+                    emit(start, end)
+                # 丢弃不会再被任何片段用到的静音采样
+                ring.release(segmenter.retain_from())
+
+            if segmenter is not None:
+                for start, end in segmenter.flush():
+                    emit(start, end)
+            elif ring.write_pos > consumed:
+                # 固定切分时把不足一段的尾部也写出，避免丢掉最后几秒回答
+                emit(consumed, ring.write_pos)
+                consumed = ring.write_pos
+                ring.release(consumed)
+        finally:
+            self.stats["ring_overruns"] = ring.overruns
+            self.audio_queue.put("DONE")
+            print(f"[写盘线程] 停止，统计：{self.stats}")
+
+    def _analyze_segment(self, graph, audio_path: str) -> dict:
+        """在线程池中执行：提取本地韵律特征，再按 analysis_mode 调用音频 agent"""
+        print(f"[分析线程] 处理：{audio_path}")
+        try:
+            prosody = extract_prosody_file(audio_path)
+        except Exception as e:
+            print(f"[分析线程] 韵律特征提取失败 {audio_path}: {e}")
+            prosody = {}
+
+        if self.analysis_mode == "local":
+            return {"transcript": "", "audio_analysis": describe_prosody(prosody), "prosody": prosody}
+
+        with self._stats_lock:
+            self.stats["upload_bytes"] += Path(audio_path).stat().st_size
+        try:
+            result = graph.invoke({"audio_path": audio_path})
+        except Exception as e:
+            print(f"[分析线程] 分析失败 {audio_path}: {e}")
+            result = {"transcript": "", "audio_analysis": "", "error": str(e)}
+
+        if self.analysis_mode == "transcript":
+            analysis = result.get("audio_analysis")
+            result["audio_analysis"] = {
+                **describe_prosody(prosody),
+                **(analysis if isinstance(analysis, dict) else {}),
+            }
+        return {**result, "prosody": prosody}
 
     def audio_analysis_worker(self):
-        print("[分析线程] 启动")
-        graph = build_audio_graph()
-        transcripts = []
-        analyses = []
+        """分析调度线程：把片段并发分发给 agent，结果按片段顺序进入实时存储"""
+        print(f"[分析线程] 启动，并发数 {self.analysis_workers}")
+        graph = get_audio_graph(mode=self.analysis_mode) if self.analysis_mode != "local" else None
+        store = self.transcripts
 
-        while True:
+        def publish(index, item, future):
+            # 无论分析是否抛出异常都要写入该下标，否则实时存储出现空洞，之后的片段全部无法发布
             try:
-                audio_path = self.audio_queue.get(timeout=1)
-                if audio_path == "DONE":
+                result = future.result()
+            except Exception as e:
+                print(f"[分析线程] 片段处理异常 {item['audio_path']}: {e}")
+                result = {"transcript": "", "audio_analysis": {}, "error": str(e)}
+            record = {
+                "index": index,
+                "audio_path": item["audio_path"],
+                "start_s": item["start_s"],
+                "end_s": item["end_s"],
+                "transcript": result.get("transcript", ""),
+                "audio_analysis": result.get("audio_analysis", {}),
+                "prosody": result.get("prosody", {})
+            }
+            if result.get("error"):
+                # 保留失败标记，与真正的静音片段区分，离线重分析据此重试
+                record["error"] = result["error"]
+            store.put(index, record)
+
+        with ThreadPoolExecutor(max_workers=self.analysis_workers, thread_name_prefix="audio-analysis") as pool:
+            index = 0
+            while True:
+                item = self.audio_queue.get()
+                if item == "DONE":
                     print("[分析线程] 收到结束标志")
                     break
+                future = pool.submit(self._analyze_segment, graph, item["audio_path"])
+                future.add_done_callback(lambda f, i=index, it=item: publish(i, it, f))
+                index += 1
+        store.close()
 
-                print(f"[分析线程] 处理：{audio_path}")
-                result = graph.invoke({"audio_path": audio_path})
-                transcripts.append({
-                    "audio_path": audio_path,
-                    "transcript": result.get("transcript", "")
-                })
-                analyses.append({
-                    "audio_path": audio_path,
-                    "audio_analysis": result.get("audio_analysis", {})
-                })
-            except queue.Empty:
-                if self.exit_flag.is_set():
-                    break
-                else:
-                    continue
+        items = store.snapshot()
+        def failed(t):
+            return {"error": t["error"]} if t.get("error") else {}
 
+        transcripts = [
+            {"audio_path": t["audio_path"], "start_s": t["start_s"], "end_s": t["end_s"], "transcript": t["transcript"],
+             **failed(t)}
+            for t in items
+        ]
+        analyses = [
+            {"audio_path": t["audio_path"], "start_s": t["start_s"], "end_s": t["end_s"],
+             "audio_analysis": t["audio_analysis"], "prosody": t["prosody"], **failed(t)}
+            for t in items
+        ]
         with open(self.output_dir / "transcripts.json", "w", encoding="utf-8") as f:
             json.dump(transcripts, f, ensure_ascii=False, indent=2)
         with open(self.output_dir / "audio_analysis.json", "w", encoding="utf-8") as f:
@@ -91,40 +263,76 @@ class RecorderController:
     def start(self):
         self.exit_flag.clear()
         self.recording_threads = []
+        self.transcripts = LiveSegmentStore()
+        self._stream_t0 = None
+        # 缓冲区至少容纳两个最长片段，保证写盘线程总能切出完整片段
+        if self.segment_mode == "vad":
+            longest = self.vad_options.get("max_segment_s", 15.0)
+        else:
+            longest = CHUNK_DURATION
+        self.ring = RingBuffer(int(AUDIO_SR * max(self.ring_seconds, 2 * longest)), (1,), np.float32)
         t1 = threading.Thread(target=self.audio_stream_worker)
-        t2 = threading.Thread(target=self.audio_analysis_worker)
+        t2 = threading.Thread(target=self.segment_writer_worker)
+        t3 = threading.Thread(target=self.audio_analysis_worker)
         t1.start()
         t2.start()
-        self.recording_threads.extend([t1, t2])
+        t3.start()
+        self.recording_threads.extend([t1, t2, t3])
+        self.analysis_thread = t3
 
-    def stop(self):
+    def stop(self, wait_analysis: bool = True):
+        """
+        结束采集并等待最后一个片段写盘；wait_analysis=False 时不等待分析线程，
+        随后可用 wait_analysis() 等待剩余片段分析完成
+        """
         self.exit_flag.set()
         for t in self.recording_threads:
-            t.join()
-        print("✅ 所有线程结束")
+            if t is not self.analysis_thread:
+                t.join()
+        if wait_analysis:
+            self.wait_analysis()
+            print("✅ 所有线程结束")
+        else:
+            print("✅ 录音结束，剩余片段后台分析中")
         return str(self.output_dir)
-    def get_summary(self) -> str:
-        """把全部 transcript 拼成一段；把全部 emotion 拼成一段"""
 
-        transcript_path = self.output_dir / "transcripts.json"
-        analysis_path   = self.output_dir / "audio_analysis.json"
+    def wait_analysis(self, timeout: float = None) -> bool:
+        """等待分析线程处理完全部片段，返回是否已完成"""
+        if self.analysis_thread is not None:
+            self.analysis_thread.join(timeout)
+            return not self.analysis_thread.is_alive()
+        return True
 
-        if not transcript_path.exists():
-            return "未找到语音转录结果"
-
-        # 1. 读取文件
-        with open(transcript_path, "r", encoding="utf-8") as f:
-            transcripts = json.load(f)
-        with open(analysis_path, "r", encoding="utf-8") as f:
-            analyses = json.load(f)
+    def get_stats(self) -> dict:
+        """采集统计：回调溢出次数、环形缓冲区丢弃样本数、片段数、磁盘与上传字节数"""
+        with self._stats_lock:
+            stats = dict(self.stats)
+        if stats["bytes_on_disk"]:
+            stats["compression_ratio"] = round(stats["raw_pcm_bytes"] / stats["bytes_on_disk"], 2)
+        return stats
 
-        # 2. 拼接所有文字
-        full_text = " ".join(
-            t.get("transcript", "").strip() for t in transcripts if t.get("transcript", "").strip()
+    def get_live_transcript(self) -> str:
+        """录制过程中随时可调用：返回目前已按序完成的全部转写文本"""
+        return " ".join(
+            t["transcript"].strip() for t in self.transcripts.snapshot() if t.get("transcript", "").strip()
         )
 
+    def iter_transcripts(self, start: int = 0, timeout: float = None):
+        """订阅新完成的片段（含 transcript 和 audio_analysis），录制结束后迭代终止"""
+        return self.transcripts.iter_items(start=start, timeout=timeout)
+
+    def get_summary(self) -> str:
+        """把全部 transcript 拼成一段；把全部 emotion 拼成一段（直接读内存，无需回读文件）"""
+        items = self.transcripts.snapshot()
+        if not items and not self.transcripts.closed:
+            return "未找到语音转录结果"
+
+        # 1. 拼接所有文字
+        full_text = self.get_live_transcript()
+
+        # 2. 拼接情绪分析
         emotion_items = []
-        for a in analyses:
+        for a in items:
             emo = a.get("audio_analysis", {})
             if isinstance(emo, dict):
                 emotion_items.extend(f"{k}:{v}" for k, v in emo.items())
@@ -133,7 +341,7 @@ class RecorderController:
 
         emotion_summary = "；".join(emotion_items) if emotion_items else "无"
 
-    # 4. 返回两段式摘要
+        # 3. 返回两段式摘要
         return f"语音内容: {full_text}\n情绪分析: {emotion_summary}"
 
 
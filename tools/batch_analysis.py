@@ -0,0 +1,267 @@
+# tools/batch_analysis.py
+"""
+离线批量重分析：扫描 output/<timestamp>/{audio,video} 会话目录，
+用进程池并发重跑音视频 agent 与面试分析，可断点续跑：缺失、失败（带 error）或结果为空的片段会被重新分析。
+
+用法:
+    python tools/batch_analysis.py output --workers 4
+    python tools/batch_analysis.py output --force-report   # 片段结果复用，只重算面试报告
+    python tools/batch_analysis.py output --force          # 修改 prompt 后全部片段重跑
+"""
+import argparse
+import json
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+AUDIO_PATTERN = re.compile(r"^audio_(\d+)\.(wav|flac|ogg)$")
+VIDEO_PATTERN = re.compile(r"^video_(\d+)\.mp4$")
+REPORT_NAME = "analysis.json"
+TIMING_KEYS = ("index", "start_s", "end_s")
+# 旧结果未记录分析方式时按在线 VideoController 的默认配置（压缩关键帧，不上传整段）
+ONLINE_VIDEO_CONFIG = {"input_mode": "keyframes", "keyframe_strategy": "uniform", "num_keyframes": 3}
+
+
+def discover_sessions(root: str) -> list[Path]:
+    """找出所有包含 audio/ 或 video/ 子目录的会话目录"""
+    root = Path(root)
+    if not root.exists():
+        return []
+    return sorted(
+        d for d in root.iterdir()
+        if d.is_dir() and ((d / "audio").is_dir() or (d / "video").is_dir())
+    )
+
+
+def _segments(directory: Path, pattern: re.Pattern) -> list[Path]:
+    if not directory.is_dir():
+        return []
+    found = [(int(m.group(1)), p) for p in directory.iterdir() if (m := pattern.match(p.name))]
+    return [p for _, p in sorted(found)]
+
+
+def _load_json(path: Path) -> list:
+    if not path.exists():
+        return []
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _dump_json(path: Path, data):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+
+
+def _carry_over(old: dict, fresh: dict) -> dict:
+    """重新分析的片段沿用原记录的时间信息，时间轴对齐依赖这些字段"""
+    return {**{k: old[k] for k in TIMING_KEYS if k in old}, **fresh}
+
+
+def _audio_complete(transcript: dict, analysis: dict) -> bool:
+    """在线分析失败的片段带 error；旧版本不记录 error，失败时转写与分析都为空"""
+    if transcript.get("error") or analysis.get("error"):
+        return False
+    return bool(transcript.get("transcript", "").strip() or analysis.get("audio_analysis"))
+
+
+def _video_complete(record: dict) -> bool:
+    result = record.get("video_analysis")
+    return isinstance(result, dict) and not result.get("error") and bool(result.get("video_analysis"))
+
+
+def _invoke(graph, state: dict, path: Path):
+    """调用片段 agent；失败时返回 None，该片段不落盘，下次运行会重试"""
+    try:
+        result = graph.invoke(state)
+    except Exception as e:
+        print(f"[批量分析] 片段分析失败 {path}: {e}")
+        return None
+    if result.get("error"):
+        print(f"[批量分析] 片段分析失败 {path}: {result['error']}")
+        return None
+    return result
+
+
+def _reanalyze_audio(audio_dir: Path, force: bool = False) -> tuple[int, int, list]:
+    """补齐缺失的音频片段结果，返回 (新分析数, 跳过数, 按序结果)"""
+    from agents.audio_agent import get_audio_graph
+    from tools.prosody import extract_prosody_file
+
+    # --force 时也读入旧结果：沿用时间信息，重新分析失败的片段保留旧记录
+    transcripts = {Path(t["audio_path"]).name: t for t in _load_json(audio_dir / "transcripts.json")}
+    analyses = {Path(a["audio_path"]).name: a for a in _load_json(audio_dir / "audio_analysis.json")}
+
+    graph = None
+    done, skipped = 0, 0
+    merged = []
+    for path in _segments(audio_dir, AUDIO_PATTERN):
+        name = path.name
+        old = (transcripts[name], analyses[name]) if name in transcripts and name in analyses else None
+        # 失败或结果为空的旧记录视同缺失，断点续跑时会重试
+        if old and not force and _audio_complete(*old):
+            skipped += 1
+            merged.append(old)
+            continue
+
+        graph = graph or get_audio_graph()
+        result = _invoke(graph, {"audio_path": str(path)}, path)
+        if result is None:
+            if old:
+                merged.append(old)
+            continue
+        try:
+            prosody = extract_prosody_file(str(path))
+        except Exception as e:
+            print(f"[批量分析] 韵律特征提取失败 {path}: {e}")
+            prosody = {}
+        merged.append((
+            _carry_over(transcripts.get(name, {}),
+                        {"audio_path": str(path), "transcript": result.get("transcript", "")}),
+            _carry_over(analyses.get(name, {}),
+                        {"audio_path": str(path), "audio_analysis": result.get("audio_analysis", {}), "prosody": prosody}),
+        ))
+        done += 1
+
+    if done:
+        _dump_json(audio_dir / "transcripts.json", [t for t, _ in merged])
+        _dump_json(audio_dir / "audio_analysis.json", [a for _, a in merged])
+    return done, skipped, merged
+
+
+def _reanalyze_video(video_dir: Path, force: bool = False) -> tuple[int, int, list]:
+    """补齐缺失的视频片段结果，返回 (新分析数, 跳过数, 按序结果)"""
+    from agents.video_agent import get_video_graph
+    from tools.attention import extract_attention_file
+
+    existing = {Path(r["video_path"]).name: r for r in _load_json(video_dir / "video_analysis.json")}
+
+    graphs = {}  # 分析配置 -> 视频分析图
+    done, skipped = 0, 0
+    merged = []
+    for path in _segments(video_dir, VIDEO_PATTERN):
+        old = existing.get(path.name)
+        if old and not force and _video_complete(old):
+            skipped += 1
+            merged.append(old)
+            continue
+
+        # 有降采样分析副本时优先用它，与在线分析保持一致
+        analysis_path = path.with_name(f"{path.stem}_analysis.mp4")
+        if not analysis_path.exists():
+            analysis_path = path
+        config = (old or {}).get("analysis_config") or ONLINE_VIDEO_CONFIG
+        key = tuple(sorted(config.items()))
+        if key not in graphs:
+            graphs[key] = get_video_graph(**config)
+        result = _invoke(graphs[key], {"video_path": str(analysis_path)}, path)
+        if result is None:
+            if old:
+                merged.append(old)
+            continue
+        try:
+            visual_metrics = extract_attention_file(str(analysis_path))
+        except Exception as e:
+            print(f"[批量分析] 视觉指标计算失败 {path}: {e}")
+            visual_metrics = {}
+        merged.append(_carry_over(old or {}, {
+            "video_path": str(path),
+            "analysis_path": str(analysis_path),
+            "video_analysis": result,
+            "visual_metrics": visual_metrics,
+            "analysis_config": config,
+        }))
+        done += 1
+
+    if done:
+        _dump_json(video_dir / "video_analysis.json", merged)
+    return done, skipped, merged
+
+
+def process_session(session_dir: str, force_report: bool = False, force: bool = False) -> dict:
+    """在子进程中执行：补齐一个会话的片段分析并重算面试报告"""
+    session = Path(session_dir)
+    t0 = time.monotonic()
+
+    audio_done, audio_skipped, audio = _reanalyze_audio(session / "audio", force)
+    video_done, video_skipped, video = _reanalyze_video(session / "video", force)
+
+    report_path = session / REPORT_NAME
+    report_updated = False
+    if force_report or audio_done or video_done or not report_path.exists():
+        from agents.analysis_agent import get_analysis_agent
+
+        full_text = " ".join(t.get("transcript", "").strip() for t, _ in audio if t.get("transcript", "").strip())
+        audio_summaries = [str(a.get("audio_analysis", "")) for _, a in audio if a.get("audio_analysis")]
+        video_summaries = [
+            v["video_analysis"].get("video_analysis", "") for v in video
+            if isinstance(v.get("video_analysis"), dict) and v["video_analysis"].get("video_analysis")
+        ]
+        result = get_analysis_agent().analyze_interview({
+            "resume": "",
+            "qa_pairs": [("（离线重分析，未记录题目）", full_text)] if full_text else [],
+            "audio_summaries": audio_summaries,
+            "video_summaries": video_summaries,
+            "structured_results": [{"visual_metrics": v["visual_metrics"]} for v in video if v.get("visual_metrics")],
+        })
+        _dump_json(report_path, result.model_dump())
+        report_updated = True
+
+    elapsed = time.monotonic() - t0
+    analysed = audio_done + video_done
+    return {
+        "session": session.name,
+        "audio_analysed": audio_done,
+        "audio_skipped": audio_skipped,
+        "video_analysed": video_done,
+        "video_skipped": video_skipped,
+        "report_updated": report_updated,
+        "seconds": round(elapsed, 2),
+        "segments_per_second": round(analysed / elapsed, 2) if elapsed and analysed else 0.0,
+    }
+
+
+def run_batch(root: str = "output", workers: int = 4, force_report: bool = False, force: bool = False) -> list[dict]:
+    sessions = discover_sessions(root)
+    print(f"[批量分析] 发现 {len(sessions)} 个会话，进程数 {workers}")
+    if not sessions:
+        return []
+
+    t0 = time.monotonic()
+    results = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(process_session, str(s), force_report, force): s for s in sessions}
+        for n, future in enumerate(as_completed(futures), 1):
+            session = futures[future]
+            try:
+                stats = future.result()
+            except Exception as e:
+                stats = {"session": session.name, "error": str(e)}
+            results.append(stats)
+            print(f"[批量分析] ({n}/{len(sessions)}) {stats}")
+
+    elapsed = time.monotonic() - t0
+    analysed = sum(r.get("audio_analysed", 0) + r.get("video_analysed", 0) for r in results)
+    failed = sum(1 for r in results if "error" in r)
+    print(
+        f"[批量分析] 完成：{len(results)} 个会话（失败 {failed}），新分析 {analysed} 个片段，"
+        f"耗时 {elapsed:.1f}s，{len(results) / elapsed:.2f} 会话/秒，{analysed / elapsed:.2f} 片段/秒"
+    )
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="离线批量重分析 output/ 下的面试会话")
+    parser.add_argument("root", nargs="?", default="output", help="会话根目录，默认 output")
+    parser.add_argument("--workers", type=int, default=4, help="并发进程数")
+    parser.add_argument("--force-report", action="store_true", help="即使片段无变化也重算面试报告")
+    parser.add_argument("--force", action="store_true", help="忽略已有结果，重跑全部片段")
+    args = parser.parse_args(argv)
+    run_batch(args.root, workers=args.workers, force_report=args.force_report, force=args.force)
+
+
+if __name__ == "__main__":
+    main()
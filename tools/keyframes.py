@@ -0,0 +1,127 @@
+# tools/keyframes.py
+"""视频片段关键帧采样：均匀 / 运动峰值 / 人脸优先，输出压缩 JPEG 供 VL 模型一次性分析"""
+from pathlib import Path
+import cv2
+import numpy as np
+
+KEYFRAME_STRATEGIES = ("uniform", "motion", "face")
+THUMB_WIDTH = 160  # 打分用缩略图宽度
+
+_face_cascade = None
+
+
+def _get_face_cascade():
+    """OpenCV 自带的人脸 Haar 级联；不可用时返回 None，调用方退化为均匀采样"""
+    global _face_cascade
+    if _face_cascade is None:
+        try:
+            _face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + "haarcascade_frontalface_default.xml")
+        except AttributeError as e:
+            print(f"人脸检测器不可用: {e}")
+            _face_cascade = False
+    return _face_cascade or None
+
+
+def _thumbnail(frame: np.ndarray) -> np.ndarray:
+    h, w = frame.shape[:2]
+    scale = THUMB_WIDTH / w
+    small = cv2.resize(frame, (THUMB_WIDTH, max(1, int(h * scale))), interpolation=cv2.INTER_AREA)
+    return cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+
+
+def _spread_top(scores: np.ndarray, count: int, min_gap: int) -> list[int]:
+    """按分数从高到低挑选，且相互间隔不少于 min_gap 帧"""
+    chosen = []
+    for i in np.argsort(scores)[::-1]:
+        if scores[i] <= 0:
+            break
+        if all(abs(int(i) - c) >= min_gap for c in chosen):
+            chosen.append(int(i))
+        if len(chosen) == count:
+            break
+    return sorted(chosen)
+
+
+def score_frames(thumbs: list[np.ndarray], strategy: str) -> np.ndarray:
+    """为每帧打分：motion 用相邻帧差，face 用检测到的人脸面积"""
+    if strategy == "motion":
+        stack = np.stack(thumbs).astype(np.int16)
+        diffs = np.abs(np.diff(stack, axis=0)).mean(axis=(1, 2))
+        return np.concatenate(([0.0], diffs))
+    if strategy == "face":
+        cascade = _get_face_cascade()
+        if cascade is None:
+            return np.zeros(len(thumbs))
+        scores = []
+        for gray in thumbs:
+            faces = cascade.detectMultiScale(gray, scaleFactor=1.1, minNeighbors=4, minSize=(20, 20))
+            scores.append(float(max((w * h for _, _, w, h in faces), default=0)))
+        return np.array(scores)
+    return np.zeros(len(thumbs))
+
+
+def select_keyframes(thumbs: list[np.ndarray], count: int = 3, strategy: str = "uniform") -> list[int]:
+    """返回选中帧的下标；打分策略选不满时用均匀采样补齐"""
+    n = len(thumbs)
+    if n == 0:
+        return []
+    count = min(count, n)
+    uniform = [int(i) for i in np.linspace(0, n - 1, count).round()]
+    if strategy == "uniform":
+        return sorted(set(uniform))
+
+    chosen = _spread_top(score_frames(thumbs, strategy), count, max(1, n // (count * 2)))
+    for i in uniform:
+        if len(chosen) >= count:
+            break
+        if i not in chosen:
+            chosen.append(i)
+    return sorted(chosen)
+
+
+def extract_keyframes(
+    video_path: str,
+    count: int = 3,
+    strategy: str = "uniform",
+    max_side: int = 512,
+    quality: int = 80,
+) -> list[str]:
+    """
+    从视频片段中选出 count 帧，缩放到最长边 max_side 并编码为 JPEG，
+    保存在视频旁边（video_0_kf0.jpg ...），返回按时间排序的图片路径。
+    """
+    if strategy not in KEYFRAME_STRATEGIES:
+        raise ValueError(f"不支持的关键帧策略: {strategy}，可选 {KEYFRAME_STRATEGIES}")
+
+    path = Path(video_path)
+    cap = cv2.VideoCapture(str(path))
+    selected = {}
+    try:
+        # 第一遍只保留缩略图用于打分，不在内存中堆积原始帧
+        thumbs = []
+        while True:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            thumbs.append(_thumbnail(frame))
+
+        # 第二遍按下标定位读取选中的原始帧
+        for i in select_keyframes(thumbs, count, strategy):
+            cap.set(cv2.CAP_PROP_POS_FRAMES, i)
+            ret, frame = cap.read()
+            if ret:
+                selected[i] = frame
+    finally:
+        cap.release()
+
+    out_paths = []
+    for n, i in enumerate(sorted(selected)):
+        frame = selected[i]
+        h, w = frame.shape[:2]
+        scale = min(1.0, max_side / max(h, w))
+        if scale < 1.0:
+            frame = cv2.resize(frame, (int(w * scale), int(h * scale)), interpolation=cv2.INTER_AREA)
+        out_path = path.with_name(f"{path.stem}_kf{n}.jpg")
+        cv2.imwrite(str(out_path), frame, [cv2.IMWRITE_JPEG_QUALITY, quality])
+        out_paths.append(str(out_path))
+    return out_paths
@@ -0,0 +1,73 @@
+# tools/live_store.py
+"""线程安全的实时片段结果存储：乱序完成的分析结果按片段顺序发布给订阅者"""
+import threading
+from typing import Any, Callable, Dict, Iterator, List
+
+
+class LiveSegmentStore:
+    """
+    - put(index, item)：分析线程写入第 index 个片段的结果（可乱序）
+    - 只有前序片段全部到齐后才发布，保证订阅者看到的始终是连续前缀
+    - iter_items / subscribe：在录制过程中增量获取新片段
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._items: List[Dict[str, Any]] = []
+        self._pending: Dict[int, Dict[str, Any]] = {}
+        self._callbacks: List[Callable[[Dict[str, Any]], None]] = []
+        self.closed = False
+
+    def put(self, index: int, item: Dict[str, Any]):
+        published = []
+        with self._cond:
+            self._pending[index] = item
+            while len(self._items) in self._pending:
+                ready = self._pending.pop(len(self._items))
+                self._items.append(ready)
+                published.append(ready)
+            if published:
+                self._cond.notify_all()
+            callbacks = list(self._callbacks)
+
+        for ready in published:
+            for callback in callbacks:
+                try:
+                    callback(ready)
+                except Exception as e:
+                    print(f"[实时存储] 订阅回调失败: {e}")
+
+    def close(self):
+        """所有片段写入完毕后调用，结束订阅迭代"""
+        with self._cond:
+            self.closed = True
+            self._cond.notify_all()
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        with self._cond:
+            return list(self._items)
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def subscribe(self, callback: Callable[[Dict[str, Any]], None]):
+        """注册回调，每发布一个新片段调用一次（在分析线程中执行）"""
+        with self._cond:
+            self._callbacks.append(callback)
+
+    def iter_items(self, start: int = 0, timeout: float = None) -> Iterator[Dict[str, Any]]:
+        """
+        从第 start 个片段开始依次产出结果，新片段到达前阻塞。
+        存储关闭且已全部产出，或等待超过 timeout 秒时结束。
+        """
+        pos = start
+        while True:
+            with self._cond:
+                if pos >= len(self._items) and not self.closed:
+                    self._cond.wait(timeout)
+                if pos >= len(self._items):
+                    return
+                batch = self._items[pos:]
+            for item in batch:
+                yield item
+            pos += len(batch)
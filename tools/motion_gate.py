@@ -0,0 +1,72 @@
+# tools/motion_gate.py
+"""场景变化门控：用缩小的灰度帧判断视频片段是否与上次分析的片段基本相同"""
+import cv2
+import numpy as np
+
+SIGNATURE_SIZE = (64, 48)  # 签名帧尺寸 (宽, 高)
+SIGNATURE_FRAMES = 4       # 每个片段取几帧做签名
+
+
+def signature_frame(frame: np.ndarray) -> np.ndarray:
+    """单帧缩成 64x48 灰度图；已是该尺寸的灰度图原样返回"""
+    if frame.ndim == 2 and frame.shape[::-1] == SIGNATURE_SIZE:
+        return frame
+    small = cv2.resize(frame, SIGNATURE_SIZE, interpolation=cv2.INTER_AREA)
+    return cv2.cvtColor(small, cv2.COLOR_BGR2GRAY) if small.ndim == 3 else small
+
+
+def segment_signature(frames: list) -> np.ndarray:
+    """
+    从片段中均匀取 SIGNATURE_FRAMES 帧，缩成小灰度图作为签名，形状 (k, 48, 64)。
+    frames 可以是原始帧，也可以是 signature_frame 预先缩好的小图。
+    """
+    if not frames:
+        return np.zeros((0, SIGNATURE_SIZE[1], SIGNATURE_SIZE[0]), dtype=np.uint8)
+    picks = np.linspace(0, len(frames) - 1, min(SIGNATURE_FRAMES, len(frames))).round().astype(int)
+    return np.stack([signature_frame(frames[i]) for i in picks])
+
+
+def _histogram(thumbs: np.ndarray) -> np.ndarray:
+    hist = np.bincount((thumbs >> 3).ravel(), minlength=32).astype(np.float64)
+    return hist / max(hist.sum(), 1.0)
+
+
+class ChangeGate:
+    """
+    与最近一次真正分析过的片段比较：
+    - 帧差：对应签名帧的平均绝对灰度差（0-255）
+    - 片段内运动：签名帧之间的平均帧差
+    - 直方图差：灰度分布变化（光照、换人等），换算到同一量纲
+    三者取最大作为变化分，低于 threshold 则复用上次结果；
+    连续复用 max_reuse 次后强制重新分析，避免结论长期不更新。
+    """
+
+    def __init__(self, threshold: float = 6.0, max_reuse: int = 6):
+        self.threshold = threshold
+        self.max_reuse = max_reuse
+        self.reference = None
+        self.reuse_count = 0
+
+    def reset(self):
+        self.reference = None
+        self.reuse_count = 0
+
+    def change_score(self, signature: np.ndarray) -> float:
+        sig = signature.astype(np.int16)
+        intra = float(np.abs(np.diff(sig, axis=0)).mean()) if len(sig) > 1 else 0.0
+        if self.reference is None or self.reference.shape != signature.shape:
+            return float("inf")
+        ref = self.reference.astype(np.int16)
+        frame_diff = float(np.abs(sig - ref).mean())
+        hist_diff = float(np.abs(_histogram(signature) - _histogram(self.reference)).sum()) * 50.0
+        return max(frame_diff, intra, hist_diff)
+
+    def check(self, signature: np.ndarray) -> tuple[bool, float]:
+        """返回 (是否需要重新分析, 变化分)；需要分析时更新参考签名"""
+        score = self.change_score(signature)
+        if score >= self.threshold or self.reuse_count >= self.max_reuse:
+            self.reference = signature
+            self.reuse_count = 0
+            return True, score
+        self.reuse_count += 1
+        return False, score
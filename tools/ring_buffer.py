@@ -0,0 +1,84 @@
+# tools/ring_buffer.py
+"""预分配的单生产者/单消费者环形缓冲区，供实时采集回调与写盘线程解耦"""
+import threading
+import numpy as np
+
+
+class RingBuffer:
+    """
+    沿第 0 维存放数据（音频采样行或视频帧）的环形缓冲区。
+
+    - 生产者（采集回调）只做一次切片拷贝，不分配内存、不做 IO
+    - 消费者通过绝对下标取出零拷贝视图，处理完后调用 release 归还空间
+    - 缓冲区写满时丢弃新数据并计入 overruns，绝不阻塞实时生产者
+    - 文件回放等非实时生产者可用 blocking=True 等待消费者腾出空间
+    """
+
+    def __init__(self, capacity: int, item_shape: tuple = (), dtype=np.float32):
+        self.capacity = int(capacity)
+        self.buffer = np.zeros((self.capacity, *item_shape), dtype=dtype)
+        self.write_pos = 0   # 已写入的总行数（绝对下标）
+        self.read_pos = 0    # 已释放的总行数（绝对下标）
+        self.overruns = 0    # 因缓冲区满而丢弃的行数
+        self.closed = False
+        self._cond = threading.Condition()
+
+    def reserve(self, n: int = 1, blocking: bool = False) -> int:
+        """
+        返回当前可写入的行数；blocking=True 时先等待至少 n 行空间（或缓冲区关闭）。
+        单生产者下空间在写入前只会增加，生产者可据此在 write 之前写入与数据同下标的附属信息
+        """
+        if blocking:
+            with self._cond:
+                while self.capacity - (self.write_pos - self.read_pos) < n and not self.closed:
+                    self._cond.wait(0.1)
+        return self.capacity - (self.write_pos - self.read_pos)
+
+    def write(self, block: np.ndarray, blocking: bool = False) -> int:
+        """写入一批数据，返回实际写入的行数"""
+        n = len(block)
+        free = self.reserve(n, blocking)
+        if n > free:
+            self.overruns += n - free
+            n = free
+        if n <= 0:
+            return 0
+
+        start = self.write_pos % self.capacity
+        first = min(n, self.capacity - start)
+        self.buffer[start:start + first] = block[:first]
+        if n > first:
+            self.buffer[:n - first] = block[first:n]
+
+        with self._cond:
+            self.write_pos += n
+            self._cond.notify_all()
+        return n
+
+    def views(self, start: int, end: int) -> list[np.ndarray]:
+        """返回绝对区间 [start, end) 的零拷贝视图（跨越尾部时为两段）"""
+        if start < self.read_pos or end > self.write_pos or start > end:
+            raise ValueError(f"区间越界: [{start}, {end}) 不在 [{self.read_pos}, {self.write_pos}) 内")
+        s = start % self.capacity
+        n = end - start
+        if s + n <= self.capacity:
+            return [self.buffer[s:s + n]]
+        return [self.buffer[s:], self.buffer[:s + n - self.capacity]]
+
+    def release(self, upto: int):
+        """释放 upto 之前的数据，供生产者复用"""
+        with self._cond:
+            self.read_pos = max(self.read_pos, min(upto, self.write_pos))
+            self._cond.notify_all()
+
+    def wait(self, pos: int, timeout: float = None) -> bool:
+        """等待写入位置超过 pos；缓冲区关闭或超时返回"""
+        with self._cond:
+            if self.write_pos <= pos and not self.closed:
+                self._cond.wait(timeout)
+            return self.write_pos > pos
+
+    def close(self):
+        with self._cond:
+            self.closed = True
+            self._cond.notify_all()
@@ -0,0 +1,289 @@
+# tools/sources.py
+"""采集数据源：实时设备（麦克风/摄像头）与文件回放（WAV/MP4），供采集控制器统一使用"""
+import queue
+import threading
+import time
+import numpy as np
+import soundfile as sf
+import cv2
+
+
+class _FileStatus:
+    """模拟 PortAudio 回调的 status 参数，文件回放不会溢出"""
+    input_overflow = False
+
+    def __bool__(self):
+        return False
+
+
+# ================= 音频源 =================
+
+class MicrophoneSource:
+    """默认麦克风，按 PortAudio 回调推送数据"""
+
+    def __init__(self, sample_rate: int = 16000, channels: int = 1):
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.finished = threading.Event()  # 实时设备不会自然结束
+
+    def stream(self, callback):
+        """返回一个上下文管理器，进入后开始以 callback(indata, frames, time_info, status) 推送数据"""
+        import sounddevice as sd  # 延迟导入：回放模式不需要 PortAudio
+        return sd.InputStream(samplerate=self.sample_rate, channels=self.channels, callback=callback)
+
+
+class SharedMicrophoneSource(MicrophoneSource):
+    """
+    整场面试只打开一次的麦克风。open() 后设备持续运行，
+    每轮 stream(callback) 只是把回调挂上/摘下，未挂回调时数据直接丢弃。
+    """
+
+    def __init__(self, sample_rate: int = 16000, channels: int = 1):
+        super().__init__(sample_rate, channels)
+        self._stream = None
+        self._callback = None
+        self._lock = threading.Lock()
+
+    def _dispatch(self, indata, frames, time_info, status):
+        callback = self._callback
+        if callback is not None:
+            callback(indata, frames, time_info, status)
+
+    def open(self):
+        if self._stream is None:
+            import sounddevice as sd
+            self._stream = sd.InputStream(samplerate=self.sample_rate, channels=self.channels,
+                                          callback=self._dispatch)
+            self._stream.start()
+        return self
+
+    def stream(self, callback):
+        self.open()
+        with self._lock:
+            if self._callback is not None:
+                raise RuntimeError("麦克风已被另一轮录制占用")
+            self._callback = callback
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        with self._lock:
+            self._callback = None
+        return False
+
+    def close(self):
+        self._callback = None
+        if self._stream is not None:
+            self._stream.stop()
+            self._stream.close()
+            self._stream = None
+
+
+class WavFileSource:
+    """
+    从音频文件回放，回调签名与麦克风一致。
+    realtime=True 按实际时长节拍推送；False 则尽快推送，用于测吞吐。
+    """
+
+    def __init__(self, path: str, sample_rate: int = 16000, realtime: bool = True, block_size: int = 1600):
+        self.path = str(path)
+        self.sample_rate = sample_rate
+        self.realtime = realtime
+        self.block_size = block_size
+        self.finished = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._callback = None
+
+    def stream(self, callback):
+        self._callback = callback
+        return self
+
+    def __enter__(self):
+        self.finished.clear()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        return False
+
+    def _read(self) -> np.ndarray:
+        samples, file_sr = sf.read(self.path, dtype="float32", always_2d=True)
+        samples = samples.mean(axis=1, keepdims=True)
+        if file_sr != self.sample_rate:
+            # 线性插值重采样，回放场景精度足够
+            n_out = int(len(samples) * self.sample_rate / file_sr)
+            positions = np.linspace(0, len(samples) - 1, n_out)
+            samples = np.interp(positions, np.arange(len(samples)), samples[:, 0]).astype(np.float32)[:, None]
+        return samples
+
+    def _run(self):
+        try:
+            samples = self._read()
+            status = _FileStatus()
+            t0 = time.monotonic()
+            for start in range(0, len(samples), self.block_size):
+                if self._stop.is_set():
+                    break
+                block = samples[start:start + self.block_size]
+                self._callback(block, len(block), None, status)
+                if self.realtime:
+                    delay = t0 + (start + len(block)) / self.sample_rate - time.monotonic()
+                    if delay > 0:
+                        time.sleep(delay)
+        except Exception as e:
+            print(f"[回放] 读取音频失败 {self.path}: {e}")
+        finally:
+            self.finished.set()
+
+
+# ================= 视频源 =================
+
+class CameraSource:
+    """本地摄像头；width/height/fps 为向设备请求的采集参数，设备不支持时沿用其原生值"""
+
+    def __init__(self, device: int = 0, width: int = None, height: int = None, fps: float = None):
+        self.device = device
+        self.width = width
+        self.height = height
+        self.request_fps = fps
+        self.cap = None
+        self.finished = threading.Event()
+
+    def open(self):
+        self.cap = cv2.VideoCapture(self.device)
+        if self.width and self.height:
+            self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, self.width)
+            self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, self.height)
+        if self.request_fps:
+            self.cap.set(cv2.CAP_PROP_FPS, self.request_fps)
+        self.finished.clear()
+        return self
+
+    @property
+    def fps(self) -> float:
+        return self.cap.get(cv2.CAP_PROP_FPS) or 20.0
+
+    @property
+    def frame_size(self) -> tuple:
+        return int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+
+    def is_opened(self) -> bool:
+        return self.cap is not None and self.cap.isOpened()
+
+    def read(self):
+        ret, frame = self.cap.read()
+        if not ret:
+            self.finished.set()
+        return ret, frame
+
+    def release(self):
+        if self.cap is not None:
+            self.cap.release()
+            self.cap = None
+
+
+class VideoFileSource(CameraSource):
+    """
+    从视频文件回放。
+    realtime=True 按文件帧率节拍读取；False 则尽快解码，用于测吞吐。
+    """
+
+    def __init__(self, path: str, realtime: bool = True):
+        super().__init__(device=0)
+        self.path = str(path)
+        self.realtime = realtime
+        self._t0 = None
+        self._frames = 0
+
+    def open(self):
+        self.cap = cv2.VideoCapture(self.path)
+        self.finished.clear()
+        self._t0 = time.monotonic()
+        self._frames = 0
+        return self
+
+    def read(self):
+        ret, frame = super().read()
+        if ret and self.realtime:
+            self._frames += 1
+            delay = self._t0 + self._frames / self.fps - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+        return ret, frame
+
+
+class SharedCameraSource(CameraSource):
+    """
+    整场面试只打开一次的摄像头。start() 后后台线程持续读帧，保持设备与曝光处于稳定状态；
+    每轮 open() 挂上读取方，release() 摘下，未挂读取方时帧直接丢弃，下一轮不会读到过期帧。
+    """
+
+    def __init__(self, device: int = 0, width: int = None, height: int = None, fps: float = None,
+                 max_pending: int = 60, read_timeout: float = 2.0):
+        super().__init__(device, width, height, fps)
+        self.read_timeout = read_timeout
+        self.dropped = 0  # 读取方跟不上时丢弃的帧数
+        self._frames = queue.Queue(maxsize=max_pending)
+        self._attached = threading.Event()
+        self._closed = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """打开设备并启动后台读帧线程，整场面试只调用一次"""
+        if self._thread is None:
+            super().open()
+            self._closed.clear()
+            self._thread = threading.Thread(target=self._grab_loop, daemon=True)
+            self._thread.start()
+        return self
+
+    def _grab_loop(self):
+        while not self._closed.is_set():
+            ret, frame = self.cap.read()
+            if not ret:
+                print("[摄像头] 读帧失败，设备可能已断开")
+                self.finished.set()
+                break
+            if not self._attached.is_set():
+                continue
+            try:
+                self._frames.put_nowait(frame)
+            except queue.Full:
+                self.dropped += 1
+
+    def open(self):
+        """开始一轮读取：清空积压帧后挂上"""
+        self.start()
+        while not self._frames.empty():
+            self._frames.get_nowait()
+        self._attached.set()
+        return self
+
+    def is_opened(self) -> bool:
+        return super().is_opened() and self._attached.is_set()
+
+    def read(self):
+        try:
+            return True, self._frames.get(timeout=self.read_timeout)
+        except queue.Empty:
+            return False, None
+
+    def release(self):
+        """结束一轮读取，设备保持打开"""
+        self._attached.clear()
+
+    def close(self):
+        """面试结束时真正关闭设备"""
+        self._attached.clear()
+        self._closed.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.read_timeout)
+            self._thread = None
+        super().release()
@@ -0,0 +1,32 @@
+# tools/stop_channel.py
+"""一轮录制的停止信号：键盘、超时、静音检测或外部接口都通过同一个通道唤醒等待者"""
+import threading
+from typing import Optional
+
+
+class StopChannel:
+    """
+    - signal(reason)：任意线程调用即可请求停止，只有第一个原因生效
+    - wait(timeout)：阻塞至收到信号或超时，返回停止原因，超时返回 None
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self.reason: Optional[str] = None
+
+    def signal(self, reason: str = "external") -> bool:
+        """请求停止；已有停止原因时返回 False"""
+        with self._cond:
+            if self.reason is not None:
+                return False
+            self.reason = reason
+            self._cond.notify_all()
+            return True
+
+    def is_set(self) -> bool:
+        return self.reason is not None
+
+    def wait(self, timeout: float = None) -> Optional[str]:
+        with self._cond:
+            self._cond.wait_for(lambda: self.reason is not None, timeout)
+            return self.reason
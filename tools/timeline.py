@@ -0,0 +1,95 @@
+# tools/timeline.py
+"""会话时间轴：统一的单调时钟，以及按时间对齐的音频/视频片段记录"""
+import bisect
+import json
+import time
+from pathlib import Path
+
+
+class SessionClock:
+    """整场会话共用的单调时钟，所有片段的 start_s/end_s 都相对同一个起点"""
+
+    def __init__(self):
+        self.t0 = time.monotonic()
+
+    def now(self) -> float:
+        return time.monotonic() - self.t0
+
+
+def _covering(items: list[dict], t: float):
+    for item in items:
+        if item["start_s"] <= t < item["end_s"]:
+            return item
+    return None
+
+
+def build_timeline(audio_items: list[dict], video_items: list[dict], min_interval_s: float = 0.05) -> list[dict]:
+    """
+    以全部音视频片段的起止时间为边界切出互不重叠的区间，
+    每个区间合并覆盖它的音频片段（转写、韵律）与视频片段（VL 结论、视觉指标）。
+    相距不足 min_interval_s 的边界视为同一时刻（音视频起点的采集抖动）；两者都未覆盖的区间不输出。
+    """
+    audio = sorted((a for a in audio_items if a.get("start_s") is not None), key=lambda a: a["start_s"])
+    video = sorted((v for v in video_items if v.get("start_s") is not None), key=lambda v: v["start_s"])
+    bounds = []
+    for t in sorted({t for item in audio + video for t in (item["start_s"], item["end_s"])}):
+        if not bounds or t - bounds[-1] >= min_interval_s:
+            bounds.append(t)
+
+    records = []
+    for start, end in zip(bounds, bounds[1:]):
+        mid = (start + end) / 2
+        a = _covering(audio, mid)
+        v = _covering(video, mid)
+        if a is None and v is None:
+            continue
+        video_result = (v or {}).get("video_analysis") or {}
+        records.append({
+            "start_s": round(start, 3),
+            "end_s": round(end, 3),
+            "audio_index": a.get("index") if a else None,
+            "transcript": a.get("transcript", "") if a else "",
+            "prosody": a.get("prosody", {}) if a else {},
+            "video_index": v.get("index") if v else None,
+            "video_analysis": video_result.get("video_analysis", "") if isinstance(video_result, dict) else "",
+            "visual_metrics": v.get("visual_metrics", {}) if v else {},
+        })
+    return records
+
+
+class Timeline:
+    """按开始时间排序的对齐记录，支持按时刻/时间段查询"""
+
+    def __init__(self, records: list[dict]):
+        self.records = sorted(records, key=lambda r: r["start_s"])
+        self._starts = [r["start_s"] for r in self.records]
+
+    @classmethod
+    def from_segments(cls, audio_items: list[dict], video_items: list[dict]) -> "Timeline":
+        return cls(build_timeline(audio_items, video_items))
+
+    @classmethod
+    def load(cls, path: str) -> "Timeline":
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    def save(self, path: str):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.records, f, ensure_ascii=False, indent=2)
+
+    def at(self, t: float):
+        """返回覆盖时刻 t 的记录，没有则返回 None"""
+        i = bisect.bisect_right(self._starts, t) - 1
+        if i >= 0 and self.records[i]["end_s"] > t:
+            return self.records[i]
+        return None
+
+    def between(self, start: float, end: float) -> list[dict]:
+        """返回与 [start, end) 有重叠的记录"""
+        i = max(0, bisect.bisect_right(self._starts, start) - 1)
+        j = bisect.bisect_left(self._starts, end)
+        return [r for r in self.records[i:j] if r["end_s"] > start]
+
+    def __len__(self) -> int:
+        return len(self.records)
@@ -0,0 +1,172 @@
+# tools/vad.py
+"""基于短时能量的流式语音活动检测（VAD），用于在自然停顿处切分音频"""
+import numpy as np
+
+
+class VADSegmenter:
+    """
+    流式 VAD 切分器：持续喂入 16kHz 单声道采样，返回语音片段的样本区间。
+
+    - 按 frame_ms 分帧，向量化计算每帧能量（dBFS）
+    - 自适应噪声底：静音时快速下调、语音时缓慢上调
+    - 连续静音超过 min_silence_ms 视为自然停顿，切出一段
+    - 语音时长不足 min_speech_ms 的片段（咳嗽、点击声等）直接丢弃
+    - 单段超过 max_segment_s 时强制切分，避免一次上传过长音频
+
+    返回的区间为整条音频流上的绝对样本下标 (start, end)，调用方据此从缓冲区切片。
+    """
+
+    def __init__(
+        self,
+        sample_rate: int = 16000,
+        frame_ms: int = 30,
+        min_speech_ms: int = 300,
+        min_silence_ms: int = 600,
+        max_segment_s: float = 15.0,
+        pad_ms: int = 200,
+        threshold_db: float = -45.0,
+        noise_margin_db: float = 10.0,
+    ):
+        self.sample_rate = sample_rate
+        self.frame_len = sample_rate * frame_ms // 1000
+        self.min_speech_frames = max(1, min_speech_ms // frame_ms)
+        self.min_silence_frames = max(1, min_silence_ms // frame_ms)
+        self.max_segment_len = int(max_segment_s * sample_rate)
+        self.pad = sample_rate * pad_ms // 1000
+        self.threshold_db = threshold_db
+        self.noise_margin_db = noise_margin_db
+
+        self._remainder = np.zeros(0, dtype=np.float32)
+        self._pos = 0                # 已完成判定的样本数（帧对齐）
+        self._noise_db = threshold_db - noise_margin_db
+        self._in_speech = False
+        self._seg_start = 0
+        self._speech_frames = 0
+        self._silence_frames = 0
+        self._last_voice_end = 0
+        self._last_emit_end = 0
+
+    def _frame_db(self, frames: np.ndarray) -> np.ndarray:
+        rms = np.sqrt(np.mean(np.square(frames, dtype=np.float64), axis=1))
+        return 20.0 * np.log10(rms + 1e-10)
+
+    def _is_voiced(self, db: float) -> bool:
+        voiced = db > max(self.threshold_db, self._noise_db + self.noise_margin_db)
+        if not voiced:
+            # 噪声底向下跟踪要快，向上跟踪要慢，避免把持续语音学成噪声
+            alpha = 0.5 if db < self._noise_db else 0.02
+            self._noise_db += alpha * (db - self._noise_db)
+        return voiced
+
+    def _close_segment(self, end: int, segments: list):
+        if self._speech_frames >= self.min_speech_frames and end > self._seg_start:
+            segments.append((self._seg_start, end))
+            self._last_emit_end = end
+        self._in_speech = False
+        self._speech_frames = 0
+        self._silence_frames = 0
+
+    def feed(self, samples: np.ndarray) -> list[tuple[int, int]]:
+        """喂入一块采样，返回本次确定结束的语音片段区间列表"""
+        x = np.asarray(samples, dtype=np.float32)
+        if x.ndim > 1:
+            x = x[:, 0]
+        if self._remainder.size:
+            x = np.concatenate([self._remainder, x])
+
+        n_frames = x.size // self.frame_len
+        self._remainder = x[n_frames * self.frame_len:].copy()
+        if n_frames == 0:
+            return []
+
+        frames = x[:n_frames * self.frame_len].reshape(n_frames, self.frame_len)
+        segments = []
+        for db in self._frame_db(frames):
+            frame_start = self._pos
+            frame_end = frame_start + self.frame_len
+            self._pos = frame_end
+            voiced = self._is_voiced(float(db))
+
+            if not self._in_speech:
+                if voiced:
+                    self._in_speech = True
+                    self._seg_start = max(frame_start - self.pad, self._last_emit_end)
+                    self._speech_frames = 1
+                    self._silence_frames = 0
+                    self._last_voice_end = frame_end
+                continue
+
+            if voiced:
+                self._speech_frames += 1
+                self._silence_frames = 0
+                self._last_voice_end = frame_end
+            else:
+                self._silence_frames += 1
+                if self._silence_frames >= self.min_silence_frames:
+                    self._close_segment(min(self._last_voice_end + self.pad, frame_end), segments)
+                    continue
+
+            if frame_end - self._seg_start >= self.max_segment_len:
+                # 超长语音强制切分，下一段从当前位置继续
+                self._close_segment(frame_end, segments)
+                self._in_speech = True
+                self._seg_start = frame_end
+
+        return segments
+
+    def flush(self) -> list[tuple[int, int]]:
+        """音频流结束时调用，输出仍未闭合的最后一段"""
+        segments = []
+        if self._in_speech:
+            self._close_segment(min(self._last_voice_end + self.pad, self._pos), segments)
+        return segments
+
+    def retain_from(self) -> int:
+        """后续片段可能用到的最早样本下标，更早的缓冲可以丢弃"""
+        if self._in_speech:
+            return self._seg_start
+        return max(self._pos - self.pad, self._last_emit_end)
+
+
+class SilenceWatch:
+    """
+    回答结束检测：听到语音后，连续 silence_s 秒块电平低于阈值时调用一次 on_silence。
+    噪声底跟踪与 VADSegmenter 相同；按采样数计时，文件回放时同样按媒体时间判断。
+    在采集回调中调用，每块只算一次 RMS。
+    """
+
+    def __init__(self, silence_s: float, on_silence, sample_rate: int = 16000,
+                 threshold_db: float = -45.0, noise_margin_db: float = 10.0):
+        self.silence_len = int(silence_s * sample_rate)
+        self.sample_rate = sample_rate
+        self.on_silence = on_silence
+        self.threshold_db = threshold_db
+        self.noise_margin_db = noise_margin_db
+        self._noise_db = threshold_db - noise_margin_db
+        self._quiet = 0
+        self.heard_speech = False
+        self.fired = False
+
+    @property
+    def silence_seconds(self) -> float:
+        """听到语音之后的连续静音时长（秒）"""
+        return self._quiet / self.sample_rate
+
+    def feed(self, samples: np.ndarray):
+        if self.fired:
+            return
+        x = np.asarray(samples, dtype=np.float32).reshape(-1)
+        if x.size == 0:
+            return
+        db = 20.0 * np.log10(np.sqrt(np.mean(np.square(x, dtype=np.float64))) + 1e-10)
+        if db > max(self.threshold_db, self._noise_db + self.noise_margin_db):
+            self.heard_speech = True
+            self._quiet = 0
+            return
+        alpha = 0.5 if db < self._noise_db else 0.02
+        self._noise_db += alpha * (db - self._noise_db)
+        if self.heard_speech:
+            self._quiet += x.size
+            if self._quiet >= self.silence_len:
+                self.fired = True
+                self.on_silence()
@@ -1,4 +1,5 @@
 import cv2
+import numpy as np
 import threading
 import queue
 import time
@@ -6,90 +7,379 @@ import json
 from pathlib import Path
 from datetime import datetime
 import sys
+from concurrent.futures import ThreadPoolExecutor
 
 sys.path.append(str(Path(__file__).resolve().parent.parent))
-from agents.video_agent import build_video_graph  # 你已有的分析函数
+from agents.video_agent import get_video_graph  # 你已有的分析函数
+from tools.sources import CameraSource
+from tools.motion_gate import ChangeGate, segment_signature, signature_frame
+from tools.ring_buffer import RingBuffer
+from tools.attention import extract_attention_file, aggregate_attention, describe_attention
+from tools.live_store import LiveSegmentStore
+from tools.timeline import SessionClock
+
+CLIP_SECONDS = 5  # 每个视频片段的时长（秒）
+
+
+def _fit_size(width: int, height: int, max_size) -> tuple[int, int]:
+    """等比缩放到不超过 max_size=(宽, 高)，不放大；尺寸取偶数以兼容常见编码器"""
+    if not max_size:
+        return width, height
+    scale = min(1.0, max_size[0] / width, max_size[1] / height)
+    return max(2, int(width * scale) // 2 * 2), max(2, int(height * scale) // 2 * 2)
+
+
+class _Decimator:
+    """按帧计数把 src_fps 的帧流抽稀到不超过 dst_fps，均匀保留"""
+
+    def __init__(self, src_fps: float, dst_fps: float = None):
+        self.ratio = min(1.0, dst_fps / src_fps) if dst_fps else 1.0
+        # 首帧总是保留，之后每 1/ratio 帧保留一帧；初值取 1.0 会让第二帧也被保留，多出一帧
+        self._acc = 1.0 - self.ratio
+
+    def keep(self) -> bool:
+        self._acc += self.ratio
+        if self._acc >= 1.0 - 1e-9:
+            self._acc -= 1.0
+            return True
+        return False
+
 
 class VideoController:
-    def __init__(self):
+    def __init__(self, source=None, analysis_input: str = "keyframes", keyframe_strategy: str = "uniform",
+                 num_keyframes: int = 3, change_threshold: float = 6.0, max_reuse: int = 6,
+                 ring_seconds: float = 2.0, headless: bool = False, preview_fps: float = 5.0,
+                 capture_size: tuple = (1280, 720), capture_fps: float = None,
+                 analysis_size: tuple = (480, 360), analysis_fps: float = 5.0, analysis_workers: int = 3,
+                 output_dir: str = None, clock=None):
+        """
+        source: 视频源，默认摄像头；传入 VideoFileSource 可回放已有录像
+        analysis_input: 送给 VL 模型的内容，"keyframes" 只传压缩关键帧，"video" 上传完整片段
+        keyframe_strategy / num_keyframes: 关键帧采样方式（uniform / motion / face）与张数
+        change_threshold: 与上次分析片段的画面变化分（0-255 灰度差）低于此值时复用上次结论，设为 0 关闭门控
+        max_reuse: 最多连续复用几个片段后强制重新分析
+        ring_seconds: 采集与编码之间预分配帧环的时长；编码线程边收边写，无需容纳整个片段
+        headless: 无显示器的服务器上使用，不创建任何窗口，只能通过 exit_flag（stop）结束
+        preview_fps: 非 headless 时预览窗口的刷新率，预览在独立线程中运行，不拖慢采集
+        capture_size / capture_fps: 存档录像的分辨率与帧率上限，None 表示沿用设备原生值；
+            默认摄像头会按此向设备请求，设备不支持时在采集线程中缩放/抽帧
+        analysis_size / analysis_fps: 仅供分析的降采样副本（video_{i}_analysis.mp4）的分辨率与帧率上限，
+            关键帧与整段上传都基于该副本
+        analysis_workers: 并发调用 VL 模型的最大线程数，结果仍按片段顺序汇总
+        output_dir: 片段与结果的输出目录，默认 output/<时间戳>/video
+        clock: 会话时钟（SessionClock），与音频共用时片段的 start_s/end_s 可直接对齐
+        """
+        self.source = source or CameraSource(
+            width=capture_size[0] if capture_size else None,
+            height=capture_size[1] if capture_size else None,
+            fps=capture_fps,
+        )
+        self.analysis_input = analysis_input
+        self.keyframe_strategy = keyframe_strategy
+        self.num_keyframes = num_keyframes
+        self.change_threshold = change_threshold
+        self.max_reuse = max_reuse
+        self.ring_seconds = ring_seconds
+        self.headless = headless
+        self.preview_fps = preview_fps
+        self.capture_size = capture_size
+        self.capture_fps = capture_fps
+        self.analysis_size = analysis_size
+        self.analysis_fps = analysis_fps
+        self.analysis_workers = analysis_workers
+        self.clock = clock or SessionClock()
+        self.frame_times = None  # 与帧环同下标的采集时间（会话秒）
+        self._latest_frame = None  # 最新一帧，仅供预览线程读取
+        self.stats = {
+            "segments": 0, "reused": 0, "clip_bytes": 0, "analysis_clip_bytes": 0, "upload_bytes": 0,
+            "frames_captured": 0, "frames_dropped": 0, "nominal_fps": 0.0, "capture_fps": 0.0,
+            "queue_depth": 0, "queue_depth_max": 0, "vl_calls": 0, "vl_latency_total_s": 0.0,
+            "vl_latency_max_s": 0.0, "segment_latency_total_s": 0.0,
+        }
+        self._stats_lock = threading.Lock()
         self.exit_flag = threading.Event()
         self.video_queue = queue.Queue()
         self.video_threads = []
+        self.analysis_thread = None
+        self.frame_ring = None
+        self.fps = None
+        self._ring_ready = threading.Event()
+        self.results = LiveSegmentStore()
         self.timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        self.output_dir = Path(f"output/{self.timestamp}/video")
+        self.output_dir = Path(output_dir or f"output/{self.timestamp}/video")
         self.output_dir.mkdir(parents=True, exist_ok=True)
 
     def video_stream_worker(self):
-        cap = cv2.VideoCapture(0)
-        idx = 0
-        frame_buffer = []
+        """采集线程：只读帧并拷贝进预分配帧环，不做编码和磁盘 IO"""
+        cap = self.source.open()
+        # 文件尽快回放时等待编码线程腾出空间，实时设备则丢帧计数
+        blocking = not getattr(self.source, "realtime", True)
+        captured = dropped = 0
+
+        print("[视频线程] 启动")
+        try:
+            decimator = _Decimator(cap.fps, self.capture_fps)
+            self.fps = cap.fps * decimator.ratio
+            with self._stats_lock:
+                self.stats["nominal_fps"] = round(float(self.fps), 2)
+            size = None
+            media_t0 = None
+            t0 = time.monotonic()
+            while cap.is_opened() and not self.exit_flag.is_set():
+                ret, frame = cap.read()
+                if not ret:
+                    break
+                if not decimator.keep():
+                    continue
+                if size is None:
+                    size = _fit_size(frame.shape[1], frame.shape[0], self.capture_size)
+                if size != (frame.shape[1], frame.shape[0]):
+                    frame = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+                if self.frame_ring is None:
+                    # 首帧确定实际分辨率后一次性分配，之后不再为帧分配内存
+                    capacity = max(2, int(self.fps * self.ring_seconds))
+                    self.frame_ring = RingBuffer(capacity, frame.shape, np.uint8)
+                    self.frame_times = np.zeros(capacity, dtype=np.float64)
+                    self._ring_ready.set()
+
+                # 实时设备用会话时钟打时间戳；尽快回放时按帧率推算媒体时间
+                if blocking:
+                    media_t0 = self.clock.now() if media_t0 is None else media_t0
+                    stamp = media_t0 + captured / self.fps
+                else:
+                    stamp = self.clock.now()
+                captured += 1
+                # 时间戳须在帧对编码线程可见之前写好；环满时该槽位仍属于最旧的未释放帧，不能覆盖
+                if self.frame_ring.reserve(1, blocking=blocking) >= 1:
+                    self.frame_times[self.frame_ring.write_pos % self.frame_ring.capacity] = stamp
+                if not self.frame_ring.write(frame[None]):
+                    dropped += 1
+                with self._stats_lock:
+                    self.stats["frames_captured"] = captured
+                    self.stats["frames_dropped"] = dropped
+                    self.stats["capture_fps"] = round(captured / max(time.monotonic() - t0, 1e-6), 2)
+                self._latest_frame = frame
+        finally:
+            cap.release()
+            if self.frame_ring is not None:
+                self.frame_ring.close()
+            self._ring_ready.set()
+            print("[视频线程] 结束")
+
+    def video_preview_worker(self):
+        """预览线程：按 preview_fps 显示最新一帧，按 q 结束录制"""
+        interval = 1.0 / max(self.preview_fps, 0.1)
+        print("[预览线程] 启动")
+        try:
+            while not self.exit_flag.is_set() and not self.source.finished.is_set():
+                frame = self._latest_frame
+                if frame is not None:
+                    cv2.imshow("🎥", frame)
+                if cv2.waitKey(max(1, int(interval * 1000))) & 0xFF == ord('q'):
+                    self.exit_flag.set()
+            cv2.destroyAllWindows()
+        except cv2.error as e:
+            print(f"[预览线程] 无法打开预览窗口，继续无界面采集: {e}")
+        print("[预览线程] 结束")
+
+    def video_encoder_worker(self):
+        """
+        编码线程：从帧环取帧，同时写存档片段 video_{i}.mp4 与降采样分析副本 video_{i}_analysis.mp4，
+        每满 CLIP_SECONDS 秒切一个片段送去分析
+        """
+        self._ring_ready.wait()
+        ring = self.frame_ring
+        if ring is None:
+            self.video_queue.put("DONE")
+            return
+
         fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-        width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-        height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-        fps = cap.get(cv2.CAP_PROP_FPS) or 20.0
-        frame_target = int(fps * 5)  # 5秒一个片段
-
-        def save_video_callback(frames, idx):
-            video_path = self.output_dir / f"video_{idx}.mp4"
-            out = cv2.VideoWriter(str(video_path), fourcc, fps, (width, height))
-            for f in frames:
-                out.write(f)
-            out.release()
-            self.video_queue.put(str(video_path))
+        height, width = ring.buffer.shape[1:3]
+        analysis_size = _fit_size(width, height, self.analysis_size)
+        analysis_fps = min(self.fps, self.analysis_fps or self.fps)
+        frame_target = int(self.fps * CLIP_SECONDS)
+        idx, pos, count = 0, 0, 0
+        writer = analysis_writer = decimator = None
+        video_path = analysis_path = None
+        thumbs = []
+        seg_start = seg_last = 0.0
+
+        def finish_segment():
+            writer.release()
+            analysis_writer.release()
+            # 签名用的小灰度图在编码时顺手生成，分析线程据此决定是否需要调用模型
+            self.video_queue.put({
+                "video_path": str(video_path),
+                "analysis_path": str(analysis_path),
+                "signature": segment_signature(thumbs),
+                "saved_at": time.monotonic(),
+                "start_s": round(seg_start, 3),
+                "end_s": round(seg_last + 1.0 / self.fps, 3),
+            })
             print(f"🎬 保存视频段 {idx}: {video_path}")
 
-        print("[视频线程] 启动")
-        while cap.isOpened():
-            ret, frame = cap.read()
-            if not ret:
-                break
-
-            frame_buffer.append(frame)
-            cv2.imshow("🎥", frame)
-
-            # ✅ 每一帧都判断是否被终止
-            if self.exit_flag.is_set():
-                if frame_buffer:
-                    save_video_callback(frame_buffer, idx)
-                break
-
-            if len(frame_buffer) >= frame_target:
-                save_video_callback(frame_buffer, idx)
-                frame_buffer.clear()
-                idx += 1
-
-            if cv2.waitKey(1) & 0xFF == ord('q'):
-                self.exit_flag.set()
-                break
-
-        cap.release()
-        cv2.destroyAllWindows()
-        self.video_queue.put("DONE")
-        print("[视频线程] 结束")
+        print("[编码线程] 启动")
+        try:
+            while True:
+                if not ring.wait(pos, timeout=0.5):
+                    if ring.closed and ring.write_pos <= pos:
+                        break
+                    continue
+                end = ring.write_pos
+                i = pos
+                for view in ring.views(pos, end):
+                    for frame in view:
+                        stamp = float(self.frame_times[i % ring.capacity])
+                        i += 1
+                        if writer is None:
+                            seg_start = stamp
+                            video_path = self.output_dir / f"video_{idx}.mp4"
+                            analysis_path = self.output_dir / f"video_{idx}_analysis.mp4"
+                            writer = cv2.VideoWriter(str(video_path), fourcc, self.fps, (width, height))
+                            analysis_writer = cv2.VideoWriter(str(analysis_path), fourcc, analysis_fps, analysis_size)
+                            decimator = _Decimator(self.fps, analysis_fps)
+                            count, thumbs = 0, []
+                        writer.write(frame)
+                        seg_last = stamp
+                        count += 1
+                        if decimator.keep():
+                            small = frame
+                            if analysis_size != (width, height):
+                                small = cv2.resize(frame, analysis_size, interpolation=cv2.INTER_AREA)
+                            analysis_writer.write(small)
+                            thumbs.append(signature_frame(small))
+                        if count >= frame_target:
+                            finish_segment()
+                            writer = None
+                            idx += 1
+                ring.release(end)
+                pos = end
+            if writer is not None:
+                # 停止或文件读完时保存最后不足 CLIP_SECONDS 的片段
+                finish_segment()
+        finally:
+            self.video_queue.put("DONE")
+            print("[编码线程] 结束")
+
+    def _analyze_segment(self, graph, analysis_path: str) -> dict:
+        """在线程池中执行：计算本地视觉指标；graph 不为 None 时再调用 VL 模型"""
+        try:
+            visual_metrics = extract_attention_file(analysis_path, sample_fps=self.analysis_fps or 5.0)
+        except Exception as e:
+            print(f"[分析线程] 视觉指标计算失败 {analysis_path}: {e}")
+            visual_metrics = {}
+        if graph is None:
+            return {"visual_metrics": visual_metrics}
+
+        print(f"[分析线程] 分析视频：{analysis_path}")
+        t0 = time.monotonic()
+        try:
+            result = graph.invoke({"video_path": analysis_path})
+        except Exception as e:
+            print(f"[分析线程] 分析失败 {analysis_path}: {e}")
+            result = {"video_analysis": "", "error": str(e)}
+        latency = time.monotonic() - t0
+        with self._stats_lock:
+            self.stats["upload_bytes"] += result.get("upload_bytes", 0)
+            self.stats["vl_calls"] += 1
+            self.stats["vl_latency_total_s"] += latency
+            self.stats["vl_latency_max_s"] = max(self.stats["vl_latency_max_s"], latency)
+        return {"video_analysis": result, "visual_metrics": visual_metrics}
 
     def video_analysis_worker(self):
-        print("[分析线程] 启动")
-        graph = build_video_graph()
-        results = []
-
-        while True:
-            try:
-                video_path = self.video_queue.get(timeout=1)
-                if video_path == "DONE":
+        """
+        分析调度线程：按到达顺序做场景变化门控，需要调用模型的片段并发提交给线程池，
+        结果按片段顺序进入实时存储。复用结论的片段只算本地指标，等参考片段完成后一并发布。
+        """
+        print(f"[分析线程] 启动，并发数 {self.analysis_workers}")
+        graph = get_video_graph(
+            input_mode=self.analysis_input,
+            keyframe_strategy=self.keyframe_strategy,
+            num_keyframes=self.num_keyframes,
+        )
+        # 随结果记录分析方式，离线重分析按同样的配置重跑，结论才可比
+        analysis_config = {"input_mode": self.analysis_input, "keyframe_strategy": self.keyframe_strategy,
+                           "num_keyframes": self.num_keyframes}
+        gate = ChangeGate(self.change_threshold, self.max_reuse)
+        gate_lock = threading.Lock()
+        reference = {}  # 最近一次调用模型的片段：{"video_path", "future"}
+        store = self.results
+
+        def finish(index, item, score, reused_from, future, ref_future):
+            local = future.result()
+            result = (ref_future or future).result()["video_analysis"]
+            if reused_from is not None and result.get("error"):
+                # 参考片段的 VL 调用失败：已挂在它上面的片段不能沿用失败结论，在当前线程中自行分析
+                print(f"[分析线程] 参考片段 {reused_from} 分析失败，重新分析 {item['video_path']}")
+                result = self._analyze_segment(graph, item["analysis_path"])["video_analysis"]
+                reused_from = None
+                with self._stats_lock:
+                    self.stats["reused"] -= 1
+            with self._stats_lock:
+                self.stats["queue_depth"] -= 1
+                self.stats["segment_latency_total_s"] += time.monotonic() - item["saved_at"]
+            store.put(index, {
+                "index": index,
+                "video_path": item["video_path"],
+                "analysis_path": item["analysis_path"],
+                "start_s": item["start_s"],
+                "end_s": item["end_s"],
+                "video_analysis": result,
+                "reused": reused_from is not None,
+                "reused_from": reused_from,
+                "change_score": None if score == float("inf") else round(score, 2),
+                "visual_metrics": local["visual_metrics"],
+                "analysis_config": analysis_config,
+            })
+
+        def on_reference_done(video_path, future):
+            if future.result()["video_analysis"].get("error"):
+                # 失败的结论不作为复用参考，后续片段重新分析
+                with gate_lock:
+                    gate.reset()
+                    if reference.get("video_path") == video_path:
+                        reference.clear()
+
+        with ThreadPoolExecutor(max_workers=self.analysis_workers, thread_name_prefix="video-analysis") as pool:
+            index = 0
+            while True:
+                item = self.video_queue.get()
+                if item == "DONE":
+                    # 只以编码线程的结束标志退出，保证停止前已保存的片段都被分析
                     print("[分析线程] 收到结束标志")
                     break
 
-                print(f"[分析线程] 分析视频：{video_path}")
-                result = graph.invoke({"video_path": video_path})
-                results.append({
-                    "video_path": video_path,
-                    "video_analysis": result
-                })
-            except queue.Empty:
-                if self.exit_flag.is_set():
-                    break
-                continue
+                video_path, analysis_path = item["video_path"], item["analysis_path"]
+                with gate_lock:
+                    changed, score = gate.check(item["signature"])
+                    ref = dict(reference)
+                with self._stats_lock:
+                    self.stats["segments"] += 1
+                    self.stats["clip_bytes"] += Path(video_path).stat().st_size
+                    self.stats["analysis_clip_bytes"] += Path(analysis_path).stat().st_size
+                    self.stats["queue_depth"] += 1
+                    self.stats["queue_depth_max"] = max(self.stats["queue_depth_max"], self.stats["queue_depth"])
 
+                if changed or not ref:
+                    future = pool.submit(self._analyze_segment, graph, analysis_path)
+                    with gate_lock:
+                        reference.update(video_path=video_path, future=future)
+                    future.add_done_callback(lambda f, p=video_path: on_reference_done(p, f))
+                    future.add_done_callback(
+                        lambda f, i=index, it=item, sc=score: finish(i, it, sc, None, f, None))
+                else:
+                    print(f"[分析线程] 画面无明显变化（{score:.1f}），复用 {ref['video_path']} 的结论")
+                    with self._stats_lock:
+                        self.stats["reused"] += 1
+                    future = pool.submit(self._analyze_segment, None, analysis_path)
+                    # 本地指标算完后挂到参考片段上，参考片段已完成时立即发布
+                    future.add_done_callback(
+                        lambda f, i=index, it=item, sc=score, r=ref: r["future"].add_done_callback(
+                            lambda rf: finish(i, it, sc, r["video_path"], f, rf)))
+                index += 1
+        store.close()
+
+        results = [{k: v for k, v in d.items() if k != "index"} for d in store.snapshot()]
         with open(self.output_dir / "video_analysis.json", "w", encoding="utf-8") as f:
             json.dump(results, f, ensure_ascii=False, indent=2)
 
@@ -98,33 +388,77 @@ class VideoController:
     def start(self):
         self.exit_flag.clear()
         self.video_threads = []
-        t1 = threading.Thread(target=self.video_stream_worker)
-        t2 = threading.Thread(target=self.video_analysis_worker)
-        t1.start()
-        t2.start()
-        self.video_threads.extend([t1, t2])
+        self.analysis_thread = None
+        self.frame_ring = None
+        self._ring_ready.clear()
+        self._latest_frame = None
+        self.results = LiveSegmentStore()
+        targets = [self.video_stream_worker, self.video_encoder_worker, self.video_analysis_worker]
+        if not self.headless:
+            targets.append(self.video_preview_worker)
+        for target in targets:
+            t = threading.Thread(target=target)
+            t.start()
+            self.video_threads.append(t)
+            if target == self.video_analysis_worker:
+                self.analysis_thread = t
 
-    def stop(self):
+    def stop(self, wait_analysis: bool = True):
+        """
+        结束采集并等待最后一个片段编码完成；wait_analysis=False 时不等待 VL 分析，
+        随后可用 wait_analysis() 等待剩余片段分析完成
+        """
         self.exit_flag.set()
         for t in self.video_threads:
-            t.join()
-        print("✅ 视频录制和分析结束")
+            if t is not self.analysis_thread:
+                t.join()
+        if wait_analysis:
+            self.wait_analysis()
+            print("✅ 视频录制和分析结束")
+        else:
+            print("✅ 视频录制结束，剩余片段后台分析中")
         return str(self.output_dir)
-    
+
+    def wait_analysis(self, timeout: float = None) -> bool:
+        """等待分析线程处理完全部片段，返回是否已完成"""
+        if self.analysis_thread is not None:
+            self.analysis_thread.join(timeout)
+            return not self.analysis_thread.is_alive()
+        return True
+
+    def get_stats(self) -> dict:
+        """
+        片段数、复用数、存档/分析副本/上传字节数，采集帧数、丢帧数、目标与实际帧率，
+        以及分析积压（queue_depth 为已保存但未出结果的片段数）与 VL 调用/片段端到端延迟
+        """
+        with self._stats_lock:
+            stats = dict(self.stats)
+        done = stats["segments"] - stats["queue_depth"]
+        stats["vl_latency_avg_s"] = round(stats["vl_latency_total_s"] / stats["vl_calls"], 2) if stats["vl_calls"] else 0.0
+        stats["segment_latency_avg_s"] = round(stats["segment_latency_total_s"] / done, 2) if done else 0.0
+        stats["vl_latency_max_s"] = round(stats["vl_latency_max_s"], 2)
+        for key in ("vl_latency_total_s", "segment_latency_total_s"):
+            stats.pop(key)
+        return stats
+
+    def get_visual_metrics(self) -> dict:
+        """本次录制所有片段按帧数加权汇总的视觉注意力指标"""
+        return aggregate_attention([d.get("visual_metrics") for d in self.results.snapshot()])
+
     def get_summary(self) -> str:
-        analysis_path = self.output_dir / "video_analysis.json"
-        if not analysis_path.exists():
+        data = self.results.snapshot()
+        if not data:
             return "未找到视频分析结果"
 
-        with open(analysis_path, "r", encoding="utf-8") as f:
-            data = json.load(f)
-
         summary_lines = []
         for d in data:
             summary = d["video_analysis"].get("video_analysis", "无表情分析")
             video_path = d.get("video_path", "")
+            if d.get("reused"):
+                summary += f"（画面无明显变化，沿用 {Path(d['reused_from']).name} 的结论）"
+            described = describe_attention(d.get("visual_metrics"))
+            if described:
+                summary += "（" + "，".join(f"{k} {v}" for k, v in described.items()) + "）"
             summary_lines.append(f"🎥 {video_path}: {summary}")
 
         return "\n".join(summary_lines)
-
-    